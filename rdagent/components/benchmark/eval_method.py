@@ -9,6 +9,7 @@ from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
 from rdagent.components.coder.factor_coder.eva_utils import (
     FactorCorrelationEvaluator,
     FactorEqualValueRatioEvaluator,
+    FactorEvalContext,
     FactorEvaluator,
     FactorIndexEvaluator,
     FactorRowCountEvaluator,
@@ -121,10 +122,14 @@ class BaseEval:
                 If the evaluation run successfully, return the evaluate results.  Otherwise, return the exception.
         """
         eval_res = []
+        case_gen.raise_exception = True
+        # the evaluators share the executed dataframes instead of executing the implementations one by one
+        eval_context = FactorEvalContext(case_gen, case_gt)
         for ev in self.evaluator_l:
             try:
-                case_gen.raise_exception = True
-                eval_res.append((ev, ev.evaluate(implementation=case_gen, gt_implementation=case_gt)))
+                eval_res.append(
+                    (ev, ev.evaluate(implementation=case_gen, gt_implementation=case_gt, eval_context=eval_context))
+                )
                 # if the corr ev is successfully evaluated and achieve the best performance, then break
             except CoderError as e:
                 return e
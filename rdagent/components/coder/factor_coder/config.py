@@ -34,5 +34,17 @@ class FactorCoSTEERSettings(CoSTEERSettings):
     python_bin: str = "python"
     """Path to the Python binary"""
 
+    execution_pool_size: int = 0
+    """The number of warm workers (per process) executing the factor scripts; 0 (off) runs a new `python_bin` each"""
+
+    execution_pool_max_tasks: int = 100
+    """The number of factor scripts executed by a worker before it is replaced"""
+
+    execution_memory_limit: int = 0
+    """The limit of the address space of a worker in MB; 0 means no limit"""
+
+    mmap_data: bool = True
+    """Whether to prepare memory-mapped copies of the HDF5 data (loaded by `pv_loader.load_pv` in factor code)"""
+
 
 FACTOR_COSTEER_SETTINGS = FactorCoSTEERSettings()
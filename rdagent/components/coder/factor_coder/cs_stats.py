@@ -0,0 +1,201 @@
+"""
+Cross-sectional statistics of factor values.
+
+The statistics are computed for each date without a python call per date:
+- the rows are sorted by date once, so each date is a contiguous segment;
+- the per-date sums are segmented reductions (`np.add.reduceat`) over the sorted values.
+
+The results equal to the per-date `Series.corr` (pairwise complete, NaN for a date with less than 2 valid rows
+or a constant column). Infinite values are regarded as missing.
+"""
+
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+IC_BLOCK_ELEMENTS = 1 << 24
+
+
+@dataclass
+class DateSegments:
+    """The rows sorted by date; the rows of the i-th date are `order[starts[i]:starts[i] + counts[i]]`"""
+
+    dates: pd.Index
+    order: np.ndarray
+    codes: np.ndarray  # the date code of each sorted row
+    starts: np.ndarray
+    counts: np.ndarray
+
+    @classmethod
+    def from_index(cls, index: pd.Index, level: str = "datetime") -> DateSegments:
+        date_values = index.get_level_values(level) if isinstance(index, pd.MultiIndex) else index
+        codes, dates = pd.factorize(date_values, sort=True)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        counts = np.bincount(codes, minlength=len(dates))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        return cls(pd.Index(dates, name=level), order, codes, starts, counts)
+
+    def reduce_sum(self, values: np.ndarray) -> np.ndarray:
+        """The sum of the sorted `values` in each date"""
+        if len(values) == 0:
+            return np.zeros(len(self.dates))
+        # reduceat needs the starts of the non-empty segments only
+        sums = np.zeros(len(self.dates))
+        non_empty = self.counts > 0
+        sums[non_empty] = np.add.reduceat(values, self.starts[non_empty])
+        return sums
+
+
+def _segment_rank(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """The average rank (starts from 1, like `Series.rank()`) of each value within its date"""
+    order = np.lexsort((values, codes))
+    sorted_values, sorted_codes = values[order], codes[order]
+    n = len(values)
+    # the groups of tied values within a date
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (sorted_codes[1:] != sorted_codes[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    group_id = np.cumsum(new_group) - 1
+    group_start = np.flatnonzero(new_group)
+    group_size = np.diff(np.append(group_start, n))
+    new_date = np.ones(n, dtype=bool)
+    new_date[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    date_start = np.maximum.accumulate(np.where(new_date, np.arange(n), 0))
+    # the average of the positions `start + 1 ... start + size` of a tie group
+    first_rank = group_start - date_start[group_start] + 1
+    avg_rank = first_rank + (group_size - 1) / 2
+    ranks = np.empty(n)
+    ranks[order] = avg_rank[group_id]
+    return ranks
+
+
+def _segment_pearson(x: np.ndarray, y: np.ndarray, segments: DateSegments, valid: np.ndarray) -> np.ndarray:
+    """Pearson correlation of the valid rows of each date (x and y are sorted by date)"""
+    codes = segments.codes
+    valid_f = valid.astype(np.float64)
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+    n = segments.reduce_sum(valid_f)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = segments.reduce_sum(x) / n
+        mean_y = segments.reduce_sum(y) / n
+        # demean before multiplying to keep the precision of the two pass algorithm
+        dx = np.where(valid, x - mean_x[codes], 0.0)
+        dy = np.where(valid, y - mean_y[codes], 0.0)
+        var_x, var_y = segments.reduce_sum(dx * dx), segments.reduce_sum(dy * dy)
+        corr = segments.reduce_sum(dx * dy) / np.sqrt(var_x * var_y)
+    # a constant column may leave a rounding residual after demeaning, so check the range instead of the variance
+    constant = _segment_constant(x, valid, segments) | _segment_constant(y, valid, segments)
+    corr[(n < 2) | constant | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _segment_constant(values: np.ndarray, valid: np.ndarray, segments: DateSegments) -> np.ndarray:
+    non_empty = segments.counts > 0
+    max_v, min_v = np.full(len(segments.dates), -np.inf), np.full(len(segments.dates), np.inf)
+    if len(values):
+        max_v[non_empty] = np.maximum.reduceat(np.where(valid, values, -np.inf), segments.starts[non_empty])
+        min_v[non_empty] = np.minimum.reduceat(np.where(valid, values, np.inf), segments.starts[non_empty])
+    return max_v <= min_v
+
+
+def per_date_ic(
+    source: pd.Series, target: pd.Series, segments: DateSegments | None = None, level: str = "datetime"
+) -> tuple[pd.Series, pd.Series]:
+    """
+    The IC (Pearson) and RankIC (Spearman) between `source` and `target` on each date in one pass.
+
+    Parameters
+    ----------
+    source, target :
+        The values on the same rows; the rows don't need to be sorted.
+    segments :
+        The date segments of the rows if they are already built; built from the index of `source` otherwise.
+
+    Returns
+    -------
+    tuple[pd.Series, pd.Series]
+        IC and RankIC indexed by date; NaN on the dates without a valid correlation.
+    """
+    if segments is None:
+        segments = DateSegments.from_index(source.index, level)
+    x = np.asarray(source, dtype=np.float64)[segments.order]
+    y = np.asarray(target, dtype=np.float64)[segments.order]
+    valid = np.isfinite(x) & np.isfinite(y)
+
+    ic = _segment_pearson(x, y, segments, valid)
+    # the ranks are computed on the pairwise complete rows, like `Series.corr(method="spearman")`
+    codes = np.where(valid, segments.codes, -1)
+    rank_x, rank_y = _segment_rank(np.where(valid, x, 0.0), codes), _segment_rank(np.where(valid, y, 0.0), codes)
+    ric = _segment_pearson(rank_x, rank_y, segments, valid)
+    return pd.Series(ic, index=segments.dates, name="IC"), pd.Series(ric, index=segments.dates, name="RankIC")
+
+
+def mean_ic(source: pd.Series, target: pd.Series, segments: DateSegments | None = None) -> tuple[float, float]:
+    """The mean of the per-date IC and RankIC over the dates with a valid correlation"""
+    ic, ric = per_date_ic(source, target, segments)
+    return ic.mean(), ric.mean()
+
+
+def mean_ic_matrix(left: pd.DataFrame, right: pd.DataFrame, level: str = "datetime") -> pd.DataFrame:
+    """
+    The mean over dates of the IC between each column of `left` and each column of `right` (on the same rows).
+
+    The dates are processed in blocks:
+    - the rows of each date are padded into a (date, instrument, column) tensor;
+    - the values are demeaned within each date;
+    - the pairwise correlations of a block are derived from a few batched matrix products.
+
+    Returns
+    -------
+    pd.DataFrame
+        IC of shape (left columns, right columns); NaN if a pair is never valid.
+    """
+    p, q = left.shape[1], right.shape[1]
+    segments = DateSegments.from_index(left.index, level)
+    values = np.concatenate([left.to_numpy(dtype=np.float64), right.to_numpy(dtype=np.float64)], axis=1)
+    values = values[segments.order]
+    values[~np.isfinite(values)] = np.nan
+    date_codes, starts, counts = segments.codes, segments.starts, segments.counts
+    rows_in_date = np.arange(len(date_codes)) - starts[date_codes]
+
+    ic_sum = np.zeros((p, q))
+    ic_count = np.zeros((p, q))
+    n_max = int(counts.max()) if len(counts) else 0
+    block_size = max(1, IC_BLOCK_ELEMENTS // max(1, n_max * (p + q)))
+    for block_start in range(0, len(counts), block_size):
+        block_end = min(block_start + block_size, len(counts))
+        row_slice = slice(starts[block_start], starts[block_end - 1] + counts[block_end - 1])
+        block = np.full((block_end - block_start, n_max, p + q), np.nan)
+        block[date_codes[row_slice] - block_start, rows_in_date[row_slice]] = values[row_slice]
+
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices
+            # constant columns have no correlation on that date
+            constant = np.nanmax(block, axis=1) == np.nanmin(block, axis=1)
+            block[np.broadcast_to(constant[:, None, :], block.shape)] = np.nan
+            mask = ~np.isnan(block)
+            block = np.where(mask, block - np.nanmean(block, axis=1, keepdims=True), 0.0)
+            mask = mask.astype(np.float64)
+
+            a, b = block[..., :p], block[..., p:]
+            a_mask_t, b_mask = mask[..., :p].transpose(0, 2, 1), mask[..., p:]
+            a_t = a.transpose(0, 2, 1)
+            # the statistics on the rows where both columns are valid (like `Series.corr`)
+            n = a_mask_t @ b_mask
+            sum_a, sum_b = a_t @ b_mask, a_mask_t @ b
+            cov = a_t @ b - sum_a * sum_b / n
+            var_a = (a_t * a_t) @ b_mask - sum_a**2 / n
+            var_b = a_mask_t @ (b * b) - sum_b**2 / n
+            ic = cov / np.sqrt(var_a * var_b)
+        ic[(n < 2) | (var_a <= 0) | (var_b <= 0)] = np.nan
+
+        valid = ~np.isnan(ic)
+        ic_sum += np.where(valid, ic, 0.0).sum(axis=0)
+        ic_count += valid.sum(axis=0)
+
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame(ic_sum / ic_count, index=left.columns, columns=right.columns)
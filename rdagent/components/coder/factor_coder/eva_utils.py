@@ -1,11 +1,13 @@
 import io
 import json
 from abc import abstractmethod
+from functools import cached_property
 from typing import Dict, Tuple
 
 import pandas as pd
 
 from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+from rdagent.components.coder.factor_coder.cs_stats import DateSegments, mean_ic
 from rdagent.components.coder.factor_coder.factor import FactorTask
 from rdagent.core.experiment import Task, Workspace
 from rdagent.oai.llm_conf import LLM_SETTINGS
@@ -13,6 +15,86 @@ from rdagent.oai.llm_utils import APIBackend
 from rdagent.utils.agent.tpl import T
 
 
+class FactorEvalContext:
+    """
+    The dataframes shared by the checks of one evaluation.
+
+    The implementations are executed, normalized and sorted only once; the derived data (the aligned frame,
+    the NaN/inf masks and the date segments) is computed on first use and reused by every check.
+    The execution is lazy, so an exception raised by `execute` is raised by the first check that needs the
+    dataframe, like calling `execute` in each check.
+    """
+
+    def __init__(
+        self,
+        implementation: Workspace,
+        gt_implementation: Workspace | None = None,
+        gen_df: pd.DataFrame | pd.Series | None = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        gen_df :
+            The value returned by `implementation.execute()` if the caller has already executed it.
+        """
+        self.implementation = implementation
+        self.gt_implementation = gt_implementation
+        if gen_df is not None:
+            self.gen_df = self._normalize(gen_df, "source_factor")
+
+    @staticmethod
+    def _normalize(df: pd.DataFrame | pd.Series | None, name: str) -> pd.DataFrame | None:
+        if isinstance(df, pd.Series):
+            df = df.to_frame(name)
+        if isinstance(df, pd.DataFrame):
+            df = df.sort_index()
+        return df
+
+    @cached_property
+    def gt_df(self) -> pd.DataFrame | None:
+        if self.gt_implementation is None:
+            return None
+        _, gt_df = self.gt_implementation.execute()
+        return self._normalize(gt_df, "gt_factor")
+
+    @cached_property
+    def gen_df(self) -> pd.DataFrame | None:
+        _, gen_df = self.implementation.execute()
+        return self._normalize(gen_df, "source_factor")
+
+    @cached_property
+    def gen_na_mask(self) -> pd.DataFrame:
+        return self.gen_df.isna()
+
+    @cached_property
+    def gt_na_mask(self) -> pd.DataFrame:
+        return self.gt_df.isna()
+
+    @cached_property
+    def gen_inf_mask(self) -> pd.DataFrame:
+        return self.gen_df.isin([float("inf"), -float("inf")])
+
+    @cached_property
+    def gen_unique_index(self) -> pd.Index:
+        return self.gen_df.index.unique()
+
+    @cached_property
+    def gt_unique_index(self) -> pd.Index:
+        return self.gt_df.index.unique()
+
+    @cached_property
+    def aligned_df(self) -> pd.DataFrame:
+        """The generated and ground truth values aligned on the union of their index, named `source` and `gt`"""
+        aligned_df = pd.concat([self.gen_df, self.gt_df], axis=1)
+        aligned_df.columns = ["source", "gt"]
+        return aligned_df
+
+    @cached_property
+    def date_segments(self) -> DateSegments:
+        """The rows of `aligned_df` grouped by date"""
+        return DateSegments.from_index(self.aligned_df.index)
+
+
 class FactorEvaluator:
     """Although the init method is same to Evaluator, but we want to emphasize they are different"""
 
@@ -43,22 +125,18 @@ class FactorEvaluator:
         """
         raise NotImplementedError("Please implement the `evaluator` method")
 
-    def _get_df(self, gt_implementation: Workspace, implementation: Workspace):
-        if gt_implementation is not None:
-            _, gt_df = gt_implementation.execute()
-            if isinstance(gt_df, pd.Series):
-                gt_df = gt_df.to_frame("gt_factor")
-            if isinstance(gt_df, pd.DataFrame):
-                gt_df = gt_df.sort_index()
-        else:
-            gt_df = None
+    @staticmethod
+    def _get_context(
+        gt_implementation: Workspace, implementation: Workspace, eval_context: FactorEvalContext | None = None
+    ) -> FactorEvalContext:
+        """Reuse the context shared by the caller or build one for this evaluation only"""
+        return eval_context if eval_context is not None else FactorEvalContext(implementation, gt_implementation)
 
-        _, gen_df = implementation.execute()
-        if isinstance(gen_df, pd.Series):
-            gen_df = gen_df.to_frame("source_factor")
-        if isinstance(gen_df, pd.DataFrame):
-            gen_df = gen_df.sort_index()
-        return gt_df, gen_df
+    def _get_df(
+        self, gt_implementation: Workspace, implementation: Workspace, eval_context: FactorEvalContext | None = None
+    ):
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
+        return eval_context.gt_df, eval_context.gen_df
 
     def __str__(self) -> str:
         return self.__class__.__name__
@@ -122,14 +200,15 @@ class FactorInfEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
-        if gen_df is None:
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
+        if eval_context.gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        INF_count = gen_df.isin([float("inf"), -float("inf")]).sum().sum()
+        INF_count = eval_context.gen_inf_mask.sum().sum()
         if INF_count == 0:
             return "The source dataframe does not have any infinite values.", True
         else:
@@ -144,8 +223,9 @@ class FactorSingleColumnEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
+        _, gen_df = self._get_df(gt_implementation, implementation, eval_context)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -165,8 +245,9 @@ class FactorOutputFormatEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, eval_context)
         if gen_df is None:
             return (
                 "The source dataframe is None. Skip the evaluation of the output format.",
@@ -219,8 +300,9 @@ class FactorDatetimeDailyEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str | object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
+        _, gen_df = self._get_df(gt_implementation, implementation, eval_context)
         if gen_df is None:
             return "The source dataframe is None. Skip the evaluation of the datetime format.", False
 
@@ -249,8 +331,9 @@ class FactorRowCountEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, eval_context)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -273,15 +356,17 @@ class FactorIndexEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
-        if gen_df is None:
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
+        if eval_context.gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        gen_index_set, gt_index_set = set(gen_df.index), set(gt_df.index)
-        similarity = len(gen_index_set.intersection(gt_index_set)) / len(gen_index_set.union(gt_index_set))
+        gen_index, gt_index = eval_context.gen_unique_index, eval_context.gt_unique_index
+        n_shared = gen_index.isin(gt_index).sum()
+        similarity = float(n_shared / (len(gen_index) + len(gt_index) - n_shared))
         return (
             (
                 f"The source dataframe and the ground truth dataframe have different index with a similarity of {similarity:.2%}. The similarity is calculated by the number of shared indices divided by the union indices. "
@@ -298,18 +383,20 @@ class FactorMissingValuesEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
-        if gen_df is None:
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
+        if eval_context.gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        if gen_df.isna().sum().sum() == gt_df.isna().sum().sum():
+        gen_na_count, gt_na_count = eval_context.gen_na_mask.sum().sum(), eval_context.gt_na_mask.sum().sum()
+        if gen_na_count == gt_na_count:
             return "Both dataframes have the same missing values.", True
         else:
             return (
-                f"The dataframes do not have the same missing values. The source dataframe has {gen_df.isna().sum().sum()} missing values, while the ground truth dataframe has {gt_df.isna().sum().sum()} missing values. Please check the implementation.",
+                f"The dataframes do not have the same missing values. The source dataframe has {gen_na_count} missing values, while the ground truth dataframe has {gt_na_count} missing values. Please check the implementation.",
                 False,
             )
 
@@ -319,8 +406,9 @@ class FactorEqualValueRatioEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, eval_context)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -354,22 +442,16 @@ class FactorCorrelationEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        eval_context: FactorEvalContext | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
-        if gen_df is None:
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
+        if eval_context.gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        concat_df = pd.concat([gen_df, gt_df], axis=1)
-        concat_df.columns = ["source", "gt"]
-        ic = concat_df.groupby("datetime").apply(lambda df: df["source"].corr(df["gt"])).dropna().mean()
-        ric = (
-            concat_df.groupby("datetime")
-            .apply(lambda df: df["source"].corr(df["gt"], method="spearman"))
-            .dropna()
-            .mean()
-        )
+        aligned_df = eval_context.aligned_df
+        ic, ric = mean_ic(aligned_df["source"], aligned_df["gt"], eval_context.date_segments)
 
         if self.hard_check:
             if ic > 0.99 and ric > 0.99:
@@ -392,9 +474,12 @@ class FactorValueEvaluator(FactorEvaluator):
         implementation: Workspace,
         gt_implementation: Workspace,
         version: int = 1,  # 1 for qlib factors and 2 for kaggle factors
+        eval_context: FactorEvalContext | None = None,
         **kwargs,
     ) -> Tuple:
         conclusions = []
+        # all the checks share the executed and aligned dataframes
+        eval_context = self._get_context(gt_implementation, implementation, eval_context)
 
         # Initialize result variables
         row_result = 0
@@ -406,25 +491,31 @@ class FactorValueEvaluator(FactorEvaluator):
 
         # Check if both dataframe has only one columns Mute this since factor task might generate more than one columns now
         if version == 1:
-            feedback_str, _ = FactorSingleColumnEvaluator(self.scen).evaluate(implementation, gt_implementation)
+            feedback_str, _ = FactorSingleColumnEvaluator(self.scen).evaluate(
+                implementation, gt_implementation, eval_context
+            )
             conclusions.append(feedback_str)
         elif version == 2:
             input_shape = self.scen.input_shape
-            _, gen_df = self._get_df(gt_implementation, implementation)
+            _, gen_df = self._get_df(gt_implementation, implementation, eval_context)
             if gen_df.shape[-1] > input_shape[-1]:
                 conclusions.append(
                     "Output dataframe has more columns than input feature which is not acceptable in feature processing tasks. Please check the implementation to avoid generating too many columns. Consider this implementation as a failure."
                 )
 
-        feedback_str, inf_evaluate_res = FactorInfEvaluator(self.scen).evaluate(implementation, gt_implementation)
+        feedback_str, inf_evaluate_res = FactorInfEvaluator(self.scen).evaluate(
+            implementation, gt_implementation, eval_context
+        )
         conclusions.append(feedback_str)
 
         # Check if the index of the dataframe is ("datetime", "instrument")
-        feedback_str, _ = FactorOutputFormatEvaluator(self.scen).evaluate(implementation, gt_implementation)
+        feedback_str, _ = FactorOutputFormatEvaluator(self.scen).evaluate(
+            implementation, gt_implementation, eval_context
+        )
         conclusions.append(feedback_str)
         if version == 1:
             feedback_str, daily_check_result = FactorDatetimeDailyEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
+                implementation, gt_implementation, eval_context
             )
             conclusions.append(feedback_str)
         else:
@@ -432,26 +523,30 @@ class FactorValueEvaluator(FactorEvaluator):
 
         # Check dataframe format
         if gt_implementation is not None:
-            feedback_str, row_result = FactorRowCountEvaluator(self.scen).evaluate(implementation, gt_implementation)
+            feedback_str, row_result = FactorRowCountEvaluator(self.scen).evaluate(
+                implementation, gt_implementation, eval_context
+            )
             conclusions.append(feedback_str)
 
-            feedback_str, index_result = FactorIndexEvaluator(self.scen).evaluate(implementation, gt_implementation)
+            feedback_str, index_result = FactorIndexEvaluator(self.scen).evaluate(
+                implementation, gt_implementation, eval_context
+            )
             conclusions.append(feedback_str)
 
             feedback_str, output_format_result = FactorMissingValuesEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
+                implementation, gt_implementation, eval_context
             )
             conclusions.append(feedback_str)
 
             feedback_str, equal_value_ratio_result = FactorEqualValueRatioEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
+                implementation, gt_implementation, eval_context
             )
             conclusions.append(feedback_str)
 
             if index_result > 0.99:
                 feedback_str, high_correlation_result = FactorCorrelationEvaluator(
                     hard_check=True, scen=self.scen
-                ).evaluate(implementation, gt_implementation)
+                ).evaluate(implementation, gt_implementation, eval_context)
             else:
                 high_correlation_result = False
                 feedback_str = "The source dataframe and the ground truth dataframe have different index. Give up comparing the values and correlation because it's useless"
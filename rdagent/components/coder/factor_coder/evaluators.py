@@ -7,6 +7,7 @@ from rdagent.components.coder.CoSTEER.evaluators import (
 )
 from rdagent.components.coder.factor_coder.eva_utils import (
     FactorCodeEvaluator,
+    FactorEvalContext,
     FactorFinalDecisionEvaluator,
     FactorValueEvaluator,
 )
@@ -80,7 +81,10 @@ class FactorEvaluatorForCoder(CoSTEEREvaluator):
                     factor_feedback.value_feedback,
                     decision_from_value_check,
                 ) = self.value_evaluator.evaluate(
-                    implementation=implementation, gt_implementation=gt_implementation, version=target_task.version
+                    implementation=implementation,
+                    gt_implementation=gt_implementation,
+                    version=target_task.version,
+                    eval_context=FactorEvalContext(implementation, gt_implementation, gen_df=gen_df),
                 )
 
             factor_feedback.final_decision_based_on_gt = gt_implementation is not None
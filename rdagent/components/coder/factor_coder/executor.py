@@ -0,0 +1,197 @@
+"""
+A pool of warm worker processes executing the factor scripts.
+
+Running each `factor.py` in a new interpreter pays the startup, the import of pandas/numpy and the decoding of the
+price-volume data every time. The workers of the pool (see `factor_worker.py`) are started once with the data
+loaded; each task runs in a fresh namespace of a worker and the factor value is returned by shared memory.
+
+A worker preloads the source data read by the earlier tasks of the pool, the files no task reads are not loaded.
+
+The interface mirrors `subprocess.check_output` so the caller keeps its error handling:
+
+- a failed script raises `subprocess.CalledProcessError` with the output of the task;
+- a script running longer than the timeout raises `subprocess.TimeoutExpired` (and its worker is killed).
+"""
+
+from __future__ import annotations
+
+import atexit
+import io
+import json
+import os
+import pickle
+import select
+import struct
+import subprocess
+import threading
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+
+WORKER_PATH = Path(__file__).parent / "factor_worker.py"
+
+
+class _Worker:
+    def __init__(self, python_bin: str, preload: list[tuple[str, str]], memory_limit: int) -> None:
+        cmd = [python_bin, str(WORKER_PATH), "--preload", json.dumps(preload), "--memory-limit", str(memory_limit)]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.n_tasks = 0
+        self.ready = False
+
+    def send(self, message: dict) -> None:
+        data = pickle.dumps(message)
+        self.proc.stdin.write(struct.pack("<Q", len(data)) + data)
+        self.proc.stdin.flush()
+
+    def _read(self, size: int, timeout: float | None) -> bytes:
+        buf = io.BytesIO()
+        fd = self.proc.stdout.fileno()
+        while buf.tell() < size:
+            if timeout is not None and not select.select([fd], [], [], timeout)[0]:
+                raise subprocess.TimeoutExpired(WORKER_PATH.name, timeout)
+            chunk = os.read(fd, size - buf.tell())
+            if not chunk:
+                raise EOFError("The factor worker exited unexpectedly.")
+            buf.write(chunk)
+        return buf.getvalue()
+
+    def receive(self, timeout: float | None = None) -> dict:
+        (size,) = struct.unpack("<Q", self._read(8, timeout))
+        # the message is written at once after the header, so the timeout only applies to the header
+        return pickle.loads(self._read(size, None))
+
+    def kill(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            stream.close()
+
+
+def _load_value(response: dict) -> pd.DataFrame | pd.Series | None:
+    if response["shm"] is not None:
+        shm = shared_memory.SharedMemory(name=response["shm"])
+        try:
+            data = bytes(shm.buf[: response["size"]])
+        finally:
+            shm.close()
+            shm.unlink()
+        df = pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+    elif response["pickled"] is not None:
+        df = pickle.loads(response["pickled"])
+    else:
+        return None
+    return df.iloc[:, 0].rename(response["name"]) if response["series"] else df
+
+
+class FactorExecutorPool:
+    """
+    - A worker serves one task at a time and is recycled after `max_tasks` tasks (or a `MemoryError`).
+    - A new worker preloads `preload` and the HDF5 data (path, key) read by the earlier tasks.
+    - The workers are started lazily; a process forked from the owner (e.g. by `multiprocessing_wrapper`) starts
+      its own workers instead of sharing the pipes of the owner.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        python_bin: str = "python",
+        preload: list[tuple[str, str]] | None = None,
+        max_tasks: int = 100,
+        memory_limit: int = 0,
+    ) -> None:
+        self.size = size
+        self.python_bin = python_bin
+        self.preload = dict.fromkeys(tuple(item) for item in preload or [])
+        self.max_tasks = max_tasks
+        self.memory_limit = memory_limit
+        self.cond = threading.Condition()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pid = os.getpid()
+        self.idle: list[_Worker] = []
+        self.n_workers = 0
+
+    def _acquire(self) -> _Worker:
+        with self.cond:
+            if self.pid != os.getpid():
+                self._reset()
+            while not self.idle and self.n_workers >= self.size:
+                self.cond.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.n_workers += 1
+            preload = list(self.preload)
+        try:
+            return _Worker(self.python_bin, preload, self.memory_limit)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, worker: _Worker | None) -> None:
+        with self.cond:
+            if worker is not None and self.pid == os.getpid():
+                self.idle.append(worker)
+            else:
+                self.n_workers -= 1
+            self.cond.notify()
+
+    def run(self, script_path: str | Path, cwd: str | Path, timeout: float | None = None) -> pd.DataFrame | None:
+        """
+        Run `script_path` in `cwd` and return the value written to `result.h5` (None if it is not written
+        by `to_hdf`; the file may still be written in other ways).
+        """
+        worker = self._acquire()
+        reusable = False
+        try:
+            if not worker.ready:
+                # the startup (including the preloading) is not part of the timeout of the task
+                worker.receive()
+                worker.ready = True
+            worker.send({"script": str(Path(script_path).absolute()), "cwd": str(Path(cwd).absolute())})
+            response = worker.receive(timeout)
+            with self.cond:
+                self.preload.update(dict.fromkeys(tuple(item) for item in response["read"]))
+            worker.n_tasks += 1
+            reusable = not response["recycle"] and worker.n_tasks < self.max_tasks
+        except (EOFError, OSError, struct.error) as e:
+            raise subprocess.CalledProcessError(1, str(script_path), output=str(e).encode()) from e
+        finally:
+            if not reusable:
+                worker.kill()
+            self._release(worker if reusable else None)
+
+        if not response["success"]:
+            raise subprocess.CalledProcessError(1, str(script_path), output=response["output"].encode())
+        return _load_value(response)
+
+    def close(self) -> None:
+        with self.cond:
+            workers, self.idle = (self.idle, []) if self.pid == os.getpid() else ([], [])
+            self.n_workers -= len(workers)
+        for worker in workers:
+            worker.kill()
+
+
+_EXECUTOR_POOL: FactorExecutorPool | None = None
+_EXECUTOR_POOL_LOCK = threading.Lock()
+
+
+def get_executor_pool() -> FactorExecutorPool:
+    """The pool configured by `FACTOR_COSTEER_SETTINGS`"""
+    global _EXECUTOR_POOL
+    with _EXECUTOR_POOL_LOCK:
+        if _EXECUTOR_POOL is None:
+            _EXECUTOR_POOL = FactorExecutorPool(
+                size=FACTOR_COSTEER_SETTINGS.execution_pool_size,
+                python_bin=FACTOR_COSTEER_SETTINGS.python_bin,
+                max_tasks=FACTOR_COSTEER_SETTINGS.execution_pool_max_tasks,
+                memory_limit=FACTOR_COSTEER_SETTINGS.execution_memory_limit,
+            )
+            atexit.register(_EXECUTOR_POOL.close)
+        return _EXECUTOR_POOL
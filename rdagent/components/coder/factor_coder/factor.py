@@ -11,6 +11,8 @@ from filelock import FileLock
 from rdagent.app.kaggle.conf import KAGGLE_IMPLEMENT_SETTING
 from rdagent.components.coder.CoSTEER.task import CoSTEERTask
 from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+from rdagent.components.coder.factor_coder.executor import get_executor_pool
+from rdagent.components.coder.factor_coder.pv_mmap import prepare_mmap_data
 from rdagent.core.exception import CodeFormatError, CustomRuntimeError, NoOutputError
 from rdagent.core.experiment import Experiment, FBWorkspace
 from rdagent.core.utils import cache_with_pickle
@@ -114,7 +116,9 @@ class FactorFBWorkspace(FBWorkspace):
             4. execute the code
         else:
             4. generate a script from template to import the factor.py dump get the factor value to result.h5
+        (the code runs in a warm worker of the executor pool if `execution_pool_size` > 0, or in a new process)
         5. read the factor value from the output file in the workspace path folder
+           (the worker returns the value written to result.h5 directly)
         returns the execution feedback as a string and the factor value as a pandas dataframe
 
 
@@ -145,6 +149,8 @@ class FactorFBWorkspace(FBWorkspace):
                 source_data_path = Path(KAGGLE_IMPLEMENT_SETTING.local_data_path) / KAGGLE_IMPLEMENT_SETTING.competition
 
             source_data_path.mkdir(exist_ok=True, parents=True)
+            if self.target_task.version == 1 and FACTOR_COSTEER_SETTINGS.mmap_data:
+                prepare_mmap_data(source_data_path)
             code_path = self.workspace_path / f"factor.py"
 
             self.link_all_files_in_folder_to_workspace(source_data_path, self.workspace_path)
@@ -152,6 +158,7 @@ class FactorFBWorkspace(FBWorkspace):
             execution_feedback = self.FB_EXECUTION_SUCCEEDED
             execution_success = False
             execution_error = None
+            factor_value = None  # the value returned by the worker pool without writing result.h5
 
             if self.target_task.version == 1:
                 execution_code_path = code_path
@@ -160,13 +167,20 @@ class FactorFBWorkspace(FBWorkspace):
                 execution_code_path.write_text((Path(__file__).parent / "factor_execution_template.txt").read_text())
 
             try:
-                subprocess.check_output(
-                    f"{FACTOR_COSTEER_SETTINGS.python_bin} {execution_code_path}",
-                    shell=True,
-                    cwd=self.workspace_path,
-                    stderr=subprocess.STDOUT,
-                    timeout=FACTOR_COSTEER_SETTINGS.file_based_execution_timeout,
-                )
+                if FACTOR_COSTEER_SETTINGS.execution_pool_size > 0:
+                    factor_value = get_executor_pool().run(
+                        execution_code_path,
+                        cwd=self.workspace_path,
+                        timeout=FACTOR_COSTEER_SETTINGS.file_based_execution_timeout,
+                    )
+                else:
+                    subprocess.check_output(
+                        f"{FACTOR_COSTEER_SETTINGS.python_bin} {execution_code_path}",
+                        shell=True,
+                        cwd=self.workspace_path,
+                        stderr=subprocess.STDOUT,
+                        timeout=FACTOR_COSTEER_SETTINGS.file_based_execution_timeout,
+                    )
                 execution_success = True
             except subprocess.CalledProcessError as e:
                 import site
@@ -192,9 +206,11 @@ class FactorFBWorkspace(FBWorkspace):
                     execution_error = CustomRuntimeError(execution_feedback)
 
             workspace_output_file_path = self.workspace_path / "result.h5"
-            if workspace_output_file_path.exists() and execution_success:
+            if (factor_value is not None or workspace_output_file_path.exists()) and execution_success:
                 try:
-                    executed_factor_value_dataframe = pd.read_hdf(workspace_output_file_path)
+                    executed_factor_value_dataframe = (
+                        factor_value if factor_value is not None else pd.read_hdf(workspace_output_file_path)
+                    )
                     execution_feedback += self.FB_OUTPUT_FILE_FOUND
                 except Exception as e:
                     execution_feedback += f"Error found when reading hdf file: {e}"[:1000]
@@ -0,0 +1,270 @@
+"""
+A warm worker executing `factor.py` scripts one after another.
+
+It is started by `FactorExecutorPool` with the same python binary as the subprocess execution, and it only depends
+on numpy, pandas (and pyarrow to return the result) so it can run in the environment of the factor code.
+
+Protocol (on the inherited stdin/stdout pipes, each message is an 8-byte length followed by a pickled dict):
+
+- request: `{"script": str, "cwd": str}`
+- response: `{"success": bool, "output": str, "shm": str | None, "size": int, "pickled": bytes | None,
+  "series": bool, "name": Hashable, "recycle": bool, "read": list[tuple[str, str]]}`
+
+What a task gets:
+
+- a fresh `__main__` namespace and the workspace as the working directory and the first item of `sys.path`;
+- the output of the task (file descriptor 1 and 2, so the output of C extensions and child processes is included);
+- `pd.read_hdf` on the source data returns the data loaded before (when the worker started, or by an earlier task)
+  instead of decoding HDF5 again; the files read are reported so the next workers preload them;
+- `to_hdf("result.h5")` is captured: the value is returned by shared memory in Arrow IPC format instead of HDF5;
+- the global state a task may change (the pandas options, the seeds of `random` and `numpy.random`, the warnings
+  filters, the numpy error handling, the environment variables and the attributes of the pandas and numpy modules
+  and classes) is restored after the task, like running each script in a new interpreter.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import resource
+import runpy
+import struct
+import sys
+import tempfile
+import traceback
+import warnings
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.core.generic import NDFrame
+
+RESULT_FILE_NAME = "result.h5"
+
+_original_read_hdf = pd.read_hdf
+_original_to_hdf = NDFrame.to_hdf
+_hdf_cache: dict = {}
+_read_files: set = set()
+_captured: dict = {}
+_cwd = None
+
+# the modules and classes whose attributes a task may patch
+_PATCHABLE = (pd, np, np.random, pd.DataFrame, pd.Series, pd.Index, NDFrame)
+
+try:
+    _COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3 or bool(pd.options.mode.copy_on_write)
+except Exception:
+    _COPY_ON_WRITE = False
+
+
+def _cache_key(path, key):
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+    return real_path, key, st.st_size, st.st_mtime_ns
+
+
+def _share(value):
+    # the task may modify the returned object in place; a shallow copy is enough with copy-on-write
+    return value.copy(deep=not _COPY_ON_WRITE)
+
+
+def cached_read_hdf(path_or_buf, key=None, *args, **kwargs):
+    if args or kwargs or not isinstance(path_or_buf, (str, os.PathLike)):
+        return _original_read_hdf(path_or_buf, key, *args, **kwargs)
+    try:
+        cache_key = _cache_key(path_or_buf, key)
+    except OSError:
+        return _original_read_hdf(path_or_buf, key)
+    if cache_key not in _hdf_cache:
+        _hdf_cache[cache_key] = _original_read_hdf(path_or_buf, key)
+    if not cache_key[0].startswith(_cwd + os.sep):
+        # the source data (linked into the workspace) is worth preloading, the files of the workspace are not
+        _read_files.add((cache_key[0], key))
+    return _share(_hdf_cache[cache_key])
+
+
+def captured_to_hdf(self, path_or_buf, *args, **kwargs):
+    if isinstance(path_or_buf, (str, os.PathLike)) and _cwd is not None:
+        if os.path.abspath(os.path.join(_cwd, path_or_buf)) == os.path.join(_cwd, RESULT_FILE_NAME):
+            _captured["value"] = self
+            return None
+    return _original_to_hdf(self, path_or_buf, *args, **kwargs)
+
+
+def _read_message(stream):
+    header = stream.read(8)
+    if len(header) < 8:
+        return None
+    (size,) = struct.unpack("<Q", header)
+    return pickle.loads(stream.read(size))
+
+
+def _write_message(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(struct.pack("<Q", len(data)) + data)
+    stream.flush()
+
+
+def _export(value, response):
+    """Put the value into shared memory as an Arrow IPC stream; fall back to pickle"""
+    response["series"] = isinstance(value, pd.Series)
+    if response["series"]:
+        response["name"], df = value.name, value.to_frame()
+    else:
+        df = value
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        buf = sink.getvalue()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, buf.size))
+        try:
+            shm.buf[: buf.size] = memoryview(buf).cast("B")
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        # the parent process unlinks the block after reading it
+        resource_tracker.unregister(shm._name, "shared_memory")  # noqa: SLF001
+        response["shm"], response["size"] = shm.name, buf.size
+        shm.close()
+    except Exception:
+        response["pickled"] = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _save_state():
+    return {
+        "warnings": list(warnings.filters),
+        "seterr": np.geterr(),
+        "environ": dict(os.environ),
+        "streams": (sys.stdout, sys.stderr),
+        "attrs": [dict(vars(obj)) for obj in _PATCHABLE],
+    }
+
+
+def _restore_state(state):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # the deprecated options warn when they are reset
+        pd.reset_option("all")
+    warnings.filters[:] = state["warnings"]
+    warnings._filters_mutated()  # noqa: SLF001
+    np.seterr(**state["seterr"])
+    os.environ.clear()
+    os.environ.update(state["environ"])
+    sys.stdout, sys.stderr = state["streams"]
+    for obj, attrs in zip(_PATCHABLE, state["attrs"]):
+        for name in set(vars(obj)) - set(attrs):
+            # the submodules imported by the task are kept, they are in `sys.modules` anyway
+            if not isinstance(vars(obj)[name], type(os)):
+                delattr(obj, name)
+        for name, value in attrs.items():
+            if vars(obj).get(name) is not value:
+                setattr(obj, name, value)
+    # a new interpreter is seeded by the OS
+    random.seed()
+    np.random.seed()
+
+
+def _print_task_exception(e, script):
+    """Print the traceback from the frame of the script, like running the script directly"""
+    tb = e.__traceback__
+    while tb is not None and os.path.abspath(tb.tb_frame.f_code.co_filename) != script:
+        tb = tb.tb_next
+    traceback.print_exception(type(e), e, tb if tb is not None else e.__traceback__)
+
+
+def run_task(script, cwd):
+    global _cwd
+    response = {"success": False, "output": "", "shm": None, "size": 0, "pickled": None, "series": False}
+    response["recycle"] = False
+    old_cwd, old_path, old_argv = os.getcwd(), list(sys.path), list(sys.argv)
+    old_modules = set(sys.modules)
+    old_state = _save_state()
+    saved_fds = os.dup(1), os.dup(2)
+    _captured.clear()
+    _read_files.clear()
+    with tempfile.TemporaryFile() as output:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+        try:
+            script, _cwd = os.path.abspath(script), os.path.abspath(cwd)
+            os.chdir(_cwd)
+            sys.path.insert(0, _cwd)
+            sys.argv = [script]
+            pd.read_hdf, NDFrame.to_hdf = cached_read_hdf, captured_to_hdf
+            runpy.run_path(script, run_name="__main__")
+            response["success"] = True
+        except SystemExit as e:
+            response["success"] = e.code in (None, 0)
+            if not response["success"]:
+                _print_task_exception(e, script)
+        except BaseException as e:  # noqa: BLE001
+            _print_task_exception(e, script)
+            response["recycle"] = isinstance(e, MemoryError)
+        finally:
+            _restore_state(old_state)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+            os.chdir(old_cwd)
+            sys.path[:], sys.argv = old_path, old_argv
+            # the modules of the workspace (e.g. `factor.py` imported by the template) belong to the task
+            for name in set(sys.modules) - old_modules:
+                module_file = getattr(sys.modules[name], "__file__", None) or ""
+                if module_file.startswith(_cwd + os.sep):
+                    del sys.modules[name]
+            _cwd = None
+        output.seek(0)
+        response["output"] = output.read().decode(errors="replace")
+    response["read"] = sorted(_read_files)
+
+    value = _captured.pop("value", None)
+    if response["success"] and value is not None:
+        try:
+            _export(value, response)
+        except Exception:
+            response["success"] = False
+            response["output"] += traceback.format_exc()
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--preload", default="[]", help="the JSON list of the (path, key) of the HDF5 data to load")
+    parser.add_argument("--memory-limit", type=int, default=0, help="the limit of the address space in MB")
+    args = parser.parse_args()
+
+    # keep the pipe of the protocol away from the output of the tasks
+    channel_in = os.fdopen(os.dup(0), "rb")
+    channel_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+
+    for path, key in json.loads(args.preload):
+        try:
+            _hdf_cache[_cache_key(path, key)] = _original_read_hdf(path, key)
+        except Exception:  # noqa: BLE001
+            pass  # the data is loaded by the task itself if it can't be preloaded
+    if args.memory_limit > 0:
+        limit = args.memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    _write_message(channel_out, {"ready": True})
+    while (request := _read_message(channel_in)) is not None:
+        _write_message(channel_out, run_task(request["script"], request["cwd"]))
+
+
+if __name__ == "__main__":
+    sys.path = [p for p in sys.path if Path(p).resolve() != Path(__file__).resolve().parent]
+    main()
@@ -0,0 +1,59 @@
+"""
+Load the price-volume data from its memory-mapped copy.
+
+This file is copied into the factor data folder and linked to each factor workspace, so it only depends on
+numpy and pandas.
+
+Usage in factor code:
+
+.. code-block:: python
+
+    from pv_loader import load_pv
+
+    df = load_pv("daily_pv")  # the same DataFrame as pd.read_hdf("daily_pv.h5", key="data")
+    df = load_pv("daily_pv", columns=["$close", "$volume"])  # only the selected columns
+
+The values are not decoded or copied: each column is a view of its memory-mapped file (pages are copied only
+when they are modified), so concurrent factor processes share the OS page cache.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# the format of the copies prepared by `pv_mmap.py`
+FORMAT_VERSION = 2
+
+
+def load_pv(name: str = "daily_pv", columns: Optional[Sequence[str]] = None, folder: str = ".") -> pd.DataFrame:
+    path = Path(folder) / f"{name}.mmap"
+    meta = json.loads((path / "meta.json").read_text()) if (path / "meta.json").exists() else {}
+    if meta.get("format") != FORMAT_VERSION:
+        # not prepared (or prepared by an older version)
+        df = pd.read_hdf(Path(folder) / f"{name}.h5", key="data")
+        return df if columns is None else df.loc[:, list(columns)]
+
+    levels = []
+    for i, (level_meta, level_name) in enumerate(zip(meta["levels"], meta["index_names"])):
+        values = np.load(path / f"level_{i}.npy")
+        if level_meta["tz"] is not None:
+            level = pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(level_meta["tz"])
+        else:
+            level = pd.Index(values, dtype=level_meta["dtype"])
+        levels.append(level.rename(level_name))
+    codes = [np.load(path / f"codes_{i}.npy", mmap_mode="r") for i in range(len(levels))]
+    if meta["multi_index"]:
+        index = pd.MultiIndex(levels=levels, codes=codes, names=meta["index_names"], verify_integrity=False)
+    else:
+        index = levels[0].take(codes[0])
+
+    all_columns = meta["columns"]
+    positions = range(len(all_columns)) if columns is None else [all_columns.index(c) for c in columns]
+    # plain ndarray views of the maps, like the arrays of `read_hdf`
+    data = {j: np.load(path / f"column_{i}.npy", mmap_mode="c").view(np.ndarray) for j, i in enumerate(positions)}
+    df = pd.DataFrame(data, index=index, copy=False)
+    df.columns = pd.Index([all_columns[i] for i in positions], dtype=meta["columns_dtype"])
+    return df
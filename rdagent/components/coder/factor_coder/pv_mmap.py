@@ -0,0 +1,125 @@
+"""
+Prepare the memory-mapped copies of the HDF5 data in the factor data folder.
+
+Each `<name>.h5` is converted once to `<name>.mmap/`:
+
+- `column_<i>.npy`: the values of each column in its own dtype;
+- `level_<i>.npy` / `codes_<i>.npy`: the levels and codes of each index level (the strings are stored as fixed
+  width strings and the tz-aware datetimes in UTC, so they are loaded without pickle);
+- `meta.json`: the format, the columns, the dtypes of the index levels, the index names and the stat of the source
+  file (to detect a stale copy).
+
+The data which can't be restored exactly this way (e.g. extension dtypes or mixed objects) is not memory-mapped.
+
+`pv_loader.py` is copied beside them; factor code loads the data with `pv_loader.load_pv` without decoding HDF5.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.log import rdagent_logger as logger
+from rdagent.oai.llm_utils import md5_hash
+
+LOADER_PATH = Path(__file__).parent / "pv_loader.py"
+FORMAT_VERSION = 2  # also checked by `pv_loader.py`
+
+# the data folders (with the stat of their HDF5 files) prepared in this process
+_PREPARED: set[tuple] = set()
+
+
+def _source_stat(h5_path: Path) -> dict[str, int]:
+    st = h5_path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _level_values(level: pd.Index) -> tuple[np.ndarray, str | None] | None:
+    """The values of an index level to store and its time zone; None if they can't be restored exactly"""
+    if isinstance(level.dtype, pd.DatetimeTZDtype):
+        return level.tz_convert("UTC").tz_localize(None).to_numpy(), str(level.dtype.tz)
+    if level.dtype == object or pd.api.types.is_string_dtype(level.dtype):
+        if not all(isinstance(v, str) for v in level):
+            return None
+        return np.asarray(level.to_list(), dtype=str), None
+    if isinstance(level.dtype, np.dtype) and level.dtype.kind in "biufmM":
+        return level.to_numpy(), None
+    return None
+
+
+def convert_h5_to_mmap(h5_path: Path) -> Path | None:
+    """Convert `h5_path` to `<name>.mmap/`; return None if the data can't be restored exactly from the copy"""
+    target = h5_path.with_suffix(".mmap")
+    meta_path = target / "meta.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta.get("format") == FORMAT_VERSION and meta.get("source") == _source_stat(h5_path):
+            return target
+
+    df = pd.read_hdf(h5_path, key="data")
+    index = df.index if isinstance(df, pd.DataFrame) and isinstance(df.index, pd.MultiIndex) else None
+    if index is None and isinstance(df, pd.DataFrame):
+        index = pd.MultiIndex.from_arrays([df.index])
+    levels = [_level_values(level) for level in index.levels] if index is not None else [None]
+    if (
+        any(values is None for values in levels)
+        or not df.columns.is_unique
+        or not all(isinstance(c, str) for c in df.columns)
+        or not all(isinstance(t, np.dtype) and t.kind in "biufmM" for t in df.dtypes)
+    ):
+        logger.warning(f"{h5_path} can't be restored exactly from a memory-mapped copy; it is not memory-mapped.")
+        return None
+
+    tmp = target.with_suffix(".mmap.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for i in range(df.shape[1]):
+        np.save(tmp / f"column_{i}.npy", np.ascontiguousarray(df.iloc[:, i].to_numpy()))
+    for i, ((values, _), codes) in enumerate(zip(levels, index.codes)):
+        np.save(tmp / f"level_{i}.npy", values)
+        np.save(tmp / f"codes_{i}.npy", np.asarray(codes))
+    (tmp / "meta.json").write_text(
+        json.dumps(
+            {
+                "format": FORMAT_VERSION,
+                "columns": list(df.columns),
+                "columns_dtype": str(df.columns.dtype),
+                "levels": [{"dtype": str(level.dtype), "tz": tz} for level, (_, tz) in zip(index.levels, levels)],
+                "index_names": list(index.names),
+                "multi_index": isinstance(df.index, pd.MultiIndex),
+                "source": _source_stat(h5_path),
+            }
+        )
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    logger.info(f"Memory-mapped copy of {h5_path} is prepared.")
+    return target
+
+
+def prepare_mmap_data(data_folder: str | Path) -> None:
+    """
+    Make sure each HDF5 file in `data_folder` has an up-to-date memory-mapped copy and `pv_loader.py` exists.
+    It is cheap to call before every execution: only the stat of the files is checked once prepared.
+    """
+    data_folder = Path(data_folder)
+    h5_paths = sorted(data_folder.glob("*.h5"))
+    key = (str(data_folder.absolute()), *((p.name, *_source_stat(p).values()) for p in h5_paths))
+    if key in _PREPARED:
+        return
+
+    lock_folder = Path(RD_AGENT_SETTINGS.pickle_cache_folder_path_str) / "factor_coder.pv_mmap"
+    lock_folder.mkdir(parents=True, exist_ok=True)
+    with FileLock(lock_folder / f"{md5_hash(str(data_folder.absolute()))}.lock"):
+        for h5_path in h5_paths:
+            convert_h5_to_mmap(h5_path)
+        loader_target = data_folder / LOADER_PATH.name
+        if not loader_target.exists() or loader_target.read_text() != LOADER_PATH.read_text():
+            shutil.copy(LOADER_PATH, loader_target)
+    _PREPARED.add(key)
@@ -6,11 +6,12 @@ from collections import deque
 from pathlib import Path
 from typing import Any, NoReturn
 
+from scipy.spatial.distance import cosine
+
 from rdagent.components.knowledge_management.vector_base import (
     KnowledgeMetaData,
     PDVectorBase,
     VectorBase,
-    cosine,
 )
 from rdagent.core.knowledge_base import KnowledgeBase
 from rdagent.log import rdagent_logger as logger
@@ -2,8 +2,8 @@ import uuid
 from pathlib import Path
 from typing import List, Tuple, Union
 
+import numpy as np
 import pandas as pd
-from scipy.spatial.distance import cosine
 
 from rdagent.core.knowledge_base import KnowledgeBase
 from rdagent.log import rdagent_logger as logger
@@ -103,18 +103,141 @@ class VectorBase(KnowledgeBase):
         pass
 
 
+class EmbeddingIndex:
+    """
+    Embeddings stored in a contiguous, pre-normalised float32 matrix.
+
+    - Rows are appended in amortised O(1) (the matrix grows by doubling its capacity).
+    - Row indices are partitioned by label, so label constraints don't need a scan.
+    - The cosine similarities of a batch of queries are computed with a single matmul.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self.n = 0
+        self.matrix: np.ndarray | None = None  # (capacity, dim)
+        self.label_rows: dict[str | None, list[int]] = {}
+        self._label_rows_arr: dict[str | None, np.ndarray] = {}
+
+    @staticmethod
+    def normalize(embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norm = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        return np.divide(embeddings, norm, out=np.zeros_like(embeddings), where=norm > 0)
+
+    def add(self, embedding: list[float] | np.ndarray, label: str | None = None) -> int:
+        """Append an embedding and return its row index"""
+        vec = self.normalize(np.asarray(embedding))
+        if self.matrix is None:
+            self.matrix = np.empty((self.capacity, vec.shape[-1]), dtype=np.float32)
+        elif self.n == self.matrix.shape[0]:
+            new_matrix = np.empty((self.matrix.shape[0] * 2, self.matrix.shape[1]), dtype=np.float32)
+            new_matrix[: self.n] = self.matrix[: self.n]
+            self.matrix = new_matrix
+        self.matrix[self.n] = vec
+        self.label_rows.setdefault(label, []).append(self.n)
+        self._label_rows_arr.pop(label, None)
+        self.n += 1
+        return self.n - 1
+
+    def _get_rows(self, labels: list[str] | None) -> np.ndarray | None:
+        """The candidate rows in ascending order; None means all rows"""
+        if labels is None:
+            return None
+        arrs = []
+        for label in set(labels):
+            if label not in self.label_rows:
+                continue
+            if label not in self._label_rows_arr:
+                self._label_rows_arr[label] = np.asarray(self.label_rows[label], dtype=np.int64)
+            arrs.append(self._label_rows_arr[label])
+        return np.sort(np.concatenate(arrs)) if arrs else np.empty(0, dtype=np.int64)
+
+    def search(
+        self,
+        queries: list[list[float]] | np.ndarray,
+        topk_k: int | None = None,
+        similarity_threshold: float = 0,
+        constraint_labels: list[str] | None = None,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns
+        -------
+        list[tuple[np.ndarray, np.ndarray]]
+            For each query, the row indices and the similarities of the hits, sorted by similarity (descending).
+        """
+        q = self.normalize(np.atleast_2d(np.asarray(queries)))
+        rows = self._get_rows(constraint_labels)
+        if self.matrix is None or (rows is not None and rows.size == 0):
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(q.shape[0])]
+        candidates = self.matrix[: self.n] if rows is None else self.matrix[rows]
+        scores = q @ candidates.T  # (n_queries, n_candidates)
+
+        results = []
+        for score in scores:
+            hit = np.flatnonzero(score > similarity_threshold)
+            if topk_k is not None and hit.size > topk_k:
+                hit = hit[np.argpartition(-score[hit], topk_k - 1)[:topk_k]]
+                hit.sort()  # keep the insertion order for ties
+            hit = hit[np.argsort(-score[hit], kind="stable")]
+            results.append((hit if rows is None else rows[hit], score[hit]))
+        return results
+
+
 class PDVectorBase(VectorBase):
     """
     Implement of VectorBase using Pandas
+
+    The documents are kept as a list of records and the embeddings in an `EmbeddingIndex`;
+    `vector_df` is materialized on demand for compatibility.
     """
 
+    DEFAULT_COLUMNS = ["id", "label", "content", "embedding"]
+
     def __init__(self, path: Union[str, Path] = None):
-        self.vector_df = pd.DataFrame(columns=["id", "label", "content", "embedding"])
+        self.docs: list[dict] = []
+        self.index = EmbeddingIndex()
+        self._vector_df: pd.DataFrame | None = None
         super().__init__(path)
 
+    def load(self) -> None:
+        super().load()
+        self._vector_df = None  # rebuilt from the documents on demand
+        if "vector_df" in self.__dict__:
+            # dumped by the previous version which stores the DataFrame only
+            self.vector_df = self.__dict__.pop("vector_df")
+
+    def dump(self) -> None:
+        # the DataFrame is derived from the documents, so it is not dumped with them
+        vector_df, self._vector_df = self._vector_df, None
+        try:
+            super().dump()
+        finally:
+            self._vector_df = vector_df
+
+    @property
+    def vector_df(self) -> pd.DataFrame:
+        if self._vector_df is None:
+            self._vector_df = pd.DataFrame(self.docs) if self.docs else pd.DataFrame(columns=self.DEFAULT_COLUMNS)
+        return self._vector_df
+
+    @vector_df.setter
+    def vector_df(self, df: pd.DataFrame) -> None:
+        self.docs = []
+        self.index = EmbeddingIndex()
+        self._vector_df = None
+        self.add_rows(df.to_dict("records"))
+
     def shape(self):
         return self.vector_df.shape
 
+    def add_rows(self, rows: list[dict]) -> None:
+        """append the records (with `label` and `embedding`) to the vector base"""
+        for row in rows:
+            self.index.add(row["embedding"], row["label"])
+            self.docs.append(row)
+        self._vector_df = None
+
     def add(self, document: Union[Document, List[Document]]):
         """
         add new node to vector_df
@@ -150,7 +273,7 @@ class PDVectorBase(VectorBase):
                     for trunk, embedding in zip(document.trunks, document.trunks_embedding)
                 ]
             )
-            self.vector_df = pd.concat([self.vector_df, pd.DataFrame(docs)], ignore_index=True)
+            self.add_rows(docs)
         else:
             for doc in document:
                 self.add(document=doc)
@@ -182,27 +305,35 @@ class PDVectorBase(VectorBase):
             A list of `topk_k` nodes that are semantically similar to the input node, sorted by similarity score.
             All nodes shall meet the `similarity_threshold` and `constraint_labels` criteria.
         """
-        if not self.vector_df.shape[0]:
-            return [], []
-
-        document = Document(content=content)
-        document.create_embedding()
-
-        filtered_df = self.vector_df
-        if constraint_labels is not None:
-            filtered_df = self.vector_df[self.vector_df["label"].isin(constraint_labels)]
-
-        similarities = filtered_df["embedding"].apply(
-            lambda x: 1 - cosine(x, document.embedding)
-        )  # cosine is cosine distance, 1-similarity
-
-        searched_similarities = similarities[similarities > similarity_threshold]
-        if topk_k is not None:
-            searched_similarities = searched_similarities.nlargest(topk_k)
-        most_similar_docs = filtered_df.loc[searched_similarities.index]
-
-        docs = []
-        for _, similar_docs in most_similar_docs.iterrows():
-            docs.append(Document().from_dict(similar_docs.to_dict()))
-
-        return docs, searched_similarities.to_list()
+        return self.batch_search(
+            [content],
+            topk_k=topk_k,
+            similarity_threshold=similarity_threshold,
+            constraint_labels=constraint_labels,
+        )[0]
+
+    def batch_search(
+        self,
+        contents: list[str],
+        topk_k: int | None = None,
+        similarity_threshold: float = 0,
+        constraint_labels: list[str] | None = None,
+    ) -> list[Tuple[List[Document], List]]:
+        """
+        Search a batch of contents at once; the query embeddings are created in one request.
+        The arguments and the result of each content are the same as `search`.
+        """
+        if not self.docs:
+            return [([], []) for _ in contents]
+
+        query_embeddings = APIBackend().create_embedding(input_content=contents)
+        results = []
+        for rows, scores in self.index.search(
+            query_embeddings,
+            topk_k=topk_k,
+            similarity_threshold=similarity_threshold,
+            constraint_labels=constraint_labels,
+        ):
+            docs = [Document().from_dict(self.docs[i]) for i in rows]
+            results.append((docs, scores.tolist()))
+        return results
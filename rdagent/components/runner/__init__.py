@@ -1,16 +1,29 @@
+import json
+
 from rdagent.core.developer import Developer
 from rdagent.core.experiment import ASpecificExp, Experiment
 from rdagent.oai.llm_utils import md5_hash
 
 
 class CachedRunner(Developer[ASpecificExp]):
+    @staticmethod
+    def get_code_hash(exp: Experiment) -> str:
+        """The hash of the files of the experiment workspace (e.g. the configs) and the implementations"""
+        workspaces = [exp.experiment_workspace, *exp.sub_workspace_list]
+        file_dicts = [sorted(getattr(ws, "file_dict", {}).items()) if ws is not None else None for ws in workspaces]
+        return md5_hash(json.dumps(file_dicts, default=str))
+
     def get_cache_key(self, exp: Experiment) -> str:
         all_tasks = []
+        code_hashes = []
         for based_exp in exp.based_experiments:
             all_tasks.extend(based_exp.sub_tasks)
+            code_hashes.append(CachedRunner.get_code_hash(based_exp))
         all_tasks.extend(exp.sub_tasks)
+        code_hashes.append(CachedRunner.get_code_hash(exp))
         task_info_list = [task.get_task_information() for task in all_tasks]
-        task_info_str = "\n".join(task_info_list)
+        # the code is part of the key, so an edited implementation with the same description is run again
+        task_info_str = "\n".join(task_info_list + code_hashes)
         return md5_hash(task_info_str)
 
     def assign_cached_result(self, exp: Experiment, cached_res: Experiment) -> Experiment:
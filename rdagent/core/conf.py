@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
+from weakref import WeakValueDictionary
 
 from pydantic_settings import (
     BaseSettings,
@@ -12,6 +13,15 @@ from pydantic_settings import (
 
 class ExtendedBaseSettings(BaseSettings):
 
+    def __init__(self, **values: Any) -> None:
+        super().__init__(**values)
+        _SETTINGS_INSTANCES[id(self)] = self
+
+    @staticmethod
+    def instances() -> dict[int, ExtendedBaseSettings]:
+        """The settings created in the current process and still alive, by id"""
+        return dict(_SETTINGS_INSTANCES)
+
     @classmethod
     def settings_customise_sources(
         cls,
@@ -43,6 +53,9 @@ class ExtendedBaseSettings(BaseSettings):
         return init_settings, env_settings, *parent_env_settings, dotenv_settings, file_secret_settings
 
 
+_SETTINGS_INSTANCES: WeakValueDictionary[int, ExtendedBaseSettings] = WeakValueDictionary()
+
+
 class RDAgentSettings(ExtendedBaseSettings):
 
     # azure document intelligence configs
@@ -58,6 +71,8 @@ class RDAgentSettings(ExtendedBaseSettings):
 
     # multi processing conf
     multi_proc_n: int = 1
+    multi_proc_reuse_pool: bool = True
+    """keep the process pool of `multiprocessing_wrapper` alive between the calls instead of forking a new one"""
 
     # pickle cache conf
     cache_with_pickle: bool = True  # whether to use pickle cache
@@ -83,6 +98,13 @@ class RDAgentSettings(ExtendedBaseSettings):
     """the semaphore for each step;  you can specify a overall semaphore
     or a step-wise semaphore like {"coding": 3, "running": 2}"""
 
+    step_resource: dict[str, str] = {}
+    """the resource ("llm", "cpu" or "container") of the steps, overriding the defaults of the scheduler"""
+
+    step_resource_limit: dict[str, int] = {}
+    """the maximum number of running steps of each resource (unlimited by default),
+    e.g. {"llm": 4, "container": 2}; it is also the size of the process pool of the resource"""
+
     def get_max_parallel(self) -> int:
         """Based on the setting of semaphore, return the maximum number of parallel loops"""
         if isinstance(self.step_semaphore, int):
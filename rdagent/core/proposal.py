@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import asyncio
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Generic, TypeVar
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
 
 from rdagent.core.conf import RD_AGENT_SETTINGS
 from rdagent.core.evaluation import Feedback
@@ -113,6 +114,97 @@ ASpecificScen = TypeVar("ASpecificScen", bound=Scenario)
 ASpecificKB = TypeVar("ASpecificKB", bound=KnowledgeBase)
 
 
+class _TraceIndex:
+    """
+    The indexes of the nodes of a trace for the frequent queries (`exp2idx`, `get_parents`, `get_leaves`...).
+
+    `hist` and `dag_parent` are appended directly by many callers, so the indexes are synchronized when they are
+    queried: the appended nodes are added to them, and the indexes are rebuilt after any other change (e.g. an
+    insertion at the head, a new list). They are not pickled with the trace.
+    """
+
+    MAX_CACHED_CHAINS = 128
+
+    def __init__(self, hist: list, dag_parent: list) -> None:
+        self.hist = hist
+        self.dag_parent = dag_parent
+        self.n_hist = self.n_dag = 0
+        # the first and the last items when the indexes are synchronized
+        self.hist_ends: tuple[Any, Any] = (None, None)
+        self.dag_ends: tuple[Any, Any] = (None, None)
+        self.exp_first: dict[int, int] = {}  # id of an experiment -> its first index in `hist`
+        self.exp_last: dict[int, int] = {}  # id of an experiment -> its last index in `hist`
+        self.children: dict[int, list[int]] = {}
+        self.referenced: set[int] = set()  # the indices referenced as a parent
+        self.leaves: set[int] = set()
+        self._sorted_leaves: list[int] | None = None
+        # the ancestor chains (root -> ... -> node) by the first parents
+        self.chains: OrderedDict[int, tuple[int, ...]] = OrderedDict()
+        self.sync()
+
+    @staticmethod
+    def _is_appended(items: list, old_items: list, n_old: int, old_ends: tuple[Any, Any]) -> bool:
+        if items is not old_items or len(items) < n_old:
+            return False
+        return n_old == 0 or (items[0] is old_ends[0] and items[n_old - 1] is old_ends[1])
+
+    def is_valid_for(self, hist: list, dag_parent: list) -> bool:
+        """Whether `hist` and `dag_parent` are only appended since the last synchronization"""
+        hist_appended = self._is_appended(hist, self.hist, self.n_hist, self.hist_ends)
+        return hist_appended and self._is_appended(dag_parent, self.dag_parent, self.n_dag, self.dag_ends)
+
+    def sync(self) -> None:
+        """Add the appended nodes to the indexes"""
+        hist, dag_parent = self.hist, self.dag_parent
+        for i in range(self.n_hist, len(hist)):
+            key = id(hist[i][0])
+            self.exp_first.setdefault(key, i)
+            self.exp_last[key] = i
+            if i not in self.referenced:
+                self.leaves.add(i)
+                self._sorted_leaves = None
+        for i in range(self.n_dag, len(dag_parent)):
+            for parent in dict.fromkeys(dag_parent[i]):
+                self.children.setdefault(parent, []).append(i)
+                self.referenced.add(parent)
+                if parent in self.leaves:
+                    self.leaves.discard(parent)
+                    self._sorted_leaves = None
+        self.n_hist, self.n_dag = len(hist), len(dag_parent)
+        if hist:
+            self.hist_ends = (hist[0], hist[-1])
+        if dag_parent:
+            self.dag_ends = (dag_parent[0], dag_parent[-1])
+
+    def sorted_leaves(self) -> list[int]:
+        if self._sorted_leaves is None:
+            self._sorted_leaves = sorted(self.leaves)
+        return self._sorted_leaves
+
+    def chain(self, idx: int) -> tuple[int, ...]:
+        """The ancestors of the node `idx` (>= 0) by the first parents, in the order of root -> ... -> idx"""
+        if idx in self.chains:
+            self.chains.move_to_end(idx)
+            return self.chains[idx]
+        path = []
+        curr = idx
+        prefix: tuple[int, ...] = ()
+        while True:
+            if curr in self.chains:
+                prefix = self.chains[curr]
+                break
+            path.append(curr)
+            parent_tuple = self.dag_parent[curr]
+            if not parent_tuple or parent_tuple[0] == curr:
+                break
+            curr = parent_tuple[0]
+        chain = prefix + tuple(reversed(path))
+        self.chains[idx] = chain
+        if len(self.chains) > self.MAX_CACHED_CHAINS:
+            self.chains.popitem(last=False)
+        return chain
+
+
 class Trace(Generic[ASpecificScen, ASpecificKB]):
     NodeType = tuple[Experiment, ExperimentFeedback]  # Define NodeType as a new type representing the tuple
     NEW_ROOT: tuple = ()
@@ -170,17 +262,25 @@ class Trace(Generic[ASpecificScen, ASpecificKB]):
 
         return [self.hist[i] for i in self.get_parents(selection[0])]
 
+    def _get_index(self) -> _TraceIndex:
+        index: _TraceIndex | None = self.__dict__.get("_index")
+        if index is not None and index.is_valid_for(self.hist, self.dag_parent):
+            index.sync()
+        else:
+            # the traces of old versions and the unpickled ones have no index
+            index = self._index = _TraceIndex(self.hist, self.dag_parent)
+        return index
+
+    def __getstate__(self) -> dict[str, Any]:
+        # the index is rebuilt from `hist` and `dag_parent` when it is used after loading
+        return {k: v for k, v in self.__dict__.items() if k != "_index"}
+
     def exp2idx(self, exp: Experiment | list[Experiment]) -> int | list[int] | None:
+        index = self._get_index()
         if isinstance(exp, list):
-            exps: list[Experiment] = exp
-
-            # keep the order
-            exp_to_index: dict[Experiment, int] = {_exp: i for i, (_exp, _) in enumerate(self.hist)}
-            return [exp_to_index[_exp] for _exp in exps]
-        for i, (_exp, _) in enumerate(self.hist):
-            if _exp == exp:
-                return i
-        return None
+            # keep the order; the last index of an experiment appearing more than once
+            return [index.exp_last[id(_exp)] for _exp in exp]
+        return index.exp_first.get(id(exp))
 
     def idx2exp(self, idx: int | list[int]) -> Experiment | list[Experiment]:
         if isinstance(idx, list):
@@ -189,23 +289,30 @@ class Trace(Generic[ASpecificScen, ASpecificKB]):
         return self.hist[idx][0]
 
     def is_parent(self, parent_idx: int, child_idx: int) -> bool:
-        ancestors = self.get_parents(child_idx)
-        return parent_idx in ancestors
+        if not 0 <= parent_idx < len(self.dag_parent) or child_idx < 0:
+            return parent_idx in self.get_parents(child_idx)
+        if self.is_selection_new_tree((child_idx,)):
+            return False
+        index = self._get_index()
+        ancestors = index.chain(child_idx)
+        depth = len(index.chain(parent_idx)) - 1
+        return depth < len(ancestors) and ancestors[depth] == parent_idx
 
     def get_parents(self, child_idx: int) -> list[int]:
+        """The ancestors of the node by the first parents (including itself) in the order of root -> ... -> node"""
         if self.is_selection_new_tree((child_idx,)):
             return []
-
-        ancestors: list[int] = []
-        curr = child_idx
-        while True:
-            ancestors.insert(0, curr)
-            parent_tuple = self.dag_parent[curr]
-            if not parent_tuple or parent_tuple[0] == curr:
-                break
-            curr = parent_tuple[0]
-
-        return ancestors
+        if child_idx >= 0:
+            return list(self._get_index().chain(child_idx))
+        # a negative index (e.g. -1 for the latest node) is kept in the result
+        parent_tuple = self.dag_parent[child_idx]
+        if not parent_tuple or parent_tuple[0] == child_idx:
+            return [child_idx]
+        return [*self._get_index().chain(parent_tuple[0]), child_idx]
+
+    def get_children(self, parent_idx: int) -> list[int]:
+        """The nodes having `parent_idx` as one of their parents, in increasing order"""
+        return list(self._get_index().children.get(parent_idx, []))
 
 
 class CheckpointSelector:
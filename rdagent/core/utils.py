@@ -1,19 +1,32 @@
 from __future__ import annotations
 
+import atexit
+import concurrent.futures
+import contextvars
 import functools
+import hashlib
 import importlib
+import inspect
+import io
 import json
 import multiprocessing as mp
+import os
 import pickle
 import random
+import shutil
+import sys
+import tempfile
+import threading
+from collections import Counter, OrderedDict
 from collections.abc import Callable
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Any, ClassVar, NoReturn, cast
 
 from filelock import FileLock
 from fuzzywuzzy import fuzz  # type: ignore[import-untyped]
 
-from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.core.conf import RD_AGENT_SETTINGS, ExtendedBaseSettings
 from rdagent.oai.llm_conf import LLM_SETTINGS
 
 
@@ -118,7 +131,222 @@ def _subprocess_wrapper(f: Callable, seed: int, args: list) -> Any:
     """
 
     LLM_CACHE_SEED_GEN.set_seed(seed)
-    return f(*args)
+    try:
+        return f(*args)
+    finally:
+        # The workers are terminated when the pool exits (or outlive the task when the pool is reused), so the
+        # buffered LLM cache writes must be committed here (there is nothing to commit if the LLM backend is never
+        # imported).
+        if (backend := sys.modules.get("rdagent.oai.backend.base")) is not None:
+            backend.SQliteLazyCache.flush_all()
+
+
+# The objects which are cheap to pickle and are never sent as a part of the shared context
+_ATOMIC_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+class _SharedContextPickler(pickle.Pickler):
+    """Pickle the objects of the shared context as references to it"""
+
+    def __init__(self, file: io.BytesIO, shared_ids: dict[int, int]) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared_ids = shared_ids
+
+    def persistent_id(self, obj: Any) -> int | None:
+        return self.shared_ids.get(id(obj))
+
+
+class _SharedContextUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, shared: tuple) -> None:
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, pid: int) -> Any:
+        return self.shared[pid]
+
+
+def _split_shared_context(func_calls: list[tuple[Callable, tuple]]) -> tuple[tuple, list[bytes]]:
+    """
+    Split the calls into the shared context and the per-task deltas.
+
+    The shared context is the objects used by more than one call, either as the instance of a bound method
+    (e.g. the evolving strategy or the evaluator holding the scenario) or as an argument (e.g. the queried
+    knowledge). It is pickled once; the calls are pickled with references to it.
+    """
+    counts: Counter[int] = Counter()
+    objects: dict[int, Any] = {}
+    for f, args in func_calls:
+        candidates = [f.__self__ if inspect.ismethod(f) else None, *args]
+        for obj in {id(obj): obj for obj in candidates if not isinstance(obj, _ATOMIC_TYPES)}.values():
+            counts[id(obj)] += 1
+            objects[id(obj)] = obj
+    shared = tuple(objects[obj_id] for obj_id, count in counts.items() if count > 1)
+    shared_ids = {id(obj): i for i, obj in enumerate(shared)}
+    tasks = []
+    for call in func_calls:
+        buffer = io.BytesIO()
+        _SharedContextPickler(buffer, shared_ids).dump(call)
+        tasks.append(buffer.getvalue())
+    return shared, tasks
+
+
+# the shared contexts loaded by a worker; the recent ones are kept, as they are often sent again unchanged
+_WORKER_CONTEXTS: OrderedDict[str, bytes] = OrderedDict()
+_WORKER_CONTEXTS_SIZE = 4
+
+
+def _load_shared_context(context_path: str) -> tuple:
+    if context_path in _WORKER_CONTEXTS:
+        _WORKER_CONTEXTS.move_to_end(context_path)
+    else:
+        _WORKER_CONTEXTS[context_path] = Path(context_path).read_bytes()
+        while len(_WORKER_CONTEXTS) > _WORKER_CONTEXTS_SIZE:
+            _WORKER_CONTEXTS.popitem(last=False)
+    # each task gets its own copy, so a task modifying the context does not affect the next ones
+    return cast("tuple", pickle.loads(_WORKER_CONTEXTS[context_path]))
+
+
+def _pool_subprocess_wrapper(context_path: str | None, task: bytes, seed: int, log_state: tuple) -> Any:
+    """
+    Run a task of `multiprocessing_wrapper` in a worker of the reused pool.
+
+    The worker is forked once, so the state a newly forked process would have inherited from the caller
+    (the log tag and storage path, the timer) is restored for each task.
+    """
+    # rdagent.log imports this module
+    from rdagent.log import rdagent_logger as logger  # noqa: PLC0415
+    from rdagent.log.timer import RD_Agent_TIMER_wrapper  # noqa: PLC0415
+
+    shared = _load_shared_context(context_path) if context_path is not None else ()
+    f, args = _SharedContextUnpickler(io.BytesIO(task), shared).load()
+    tag, storage_path, timer = log_state
+    logger.set_storages_path(storage_path)
+    RD_Agent_TIMER_wrapper.timer = timer
+
+    def _run() -> Any:
+        if tag:
+            with logger.tag(tag):
+                return _subprocess_wrapper(f, seed, args)
+        return _subprocess_wrapper(f, seed, args)
+
+    # a fresh context, so the tag of the previous task run by the worker is not inherited
+    return contextvars.Context().run(_run)
+
+
+class _ReusedProcessPool:
+    """
+    The process pool of `multiprocessing_wrapper` in a process; it is reused by the following calls.
+
+    The shared contexts are written to files in a temporary folder (one per content), and each worker reads
+    a context once, instead of receiving it with every task.
+    """
+
+    MAX_CONTEXT_FILES = 8
+
+    def __init__(self, n: int, settings_snapshot: dict[int, dict[str, Any]]) -> None:
+        self.n = n
+        self.settings_snapshot = settings_snapshot
+        self.pid = os.getpid()
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=n)
+        self.context_dir = Path(tempfile.mkdtemp(prefix="rdagent_mp_"))
+        self.context_files: OrderedDict[str, Path] = OrderedDict()
+        self.context_refs: Counter[str] = Counter()
+        self.lock = threading.Lock()
+
+    def acquire_context(self, data: bytes) -> str:
+        """Save the shared context for the workers; it is kept until `release_context`"""
+        key = hashlib.md5(data).hexdigest()  # noqa: S324
+        with self.lock:
+            if key in self.context_files:
+                self.context_files.move_to_end(key)
+            else:
+                path = self.context_dir / f"{key}.pkl"
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(path)
+                self.context_files[key] = path
+            self.context_refs[key] += 1
+            for old_key in list(self.context_files):
+                if len(self.context_files) <= self.MAX_CONTEXT_FILES:
+                    break
+                if self.context_refs[old_key] == 0:
+                    self.context_files.pop(old_key).unlink(missing_ok=True)
+            return str(self.context_files[key])
+
+    def release_context(self, context_path: str) -> None:
+        with self.lock:
+            self.context_refs[Path(context_path).stem] -= 1
+
+    def run(self, func_calls: list[tuple[Callable, tuple]]) -> list:
+        # rdagent.log imports this module
+        from rdagent.log import rdagent_logger as logger  # noqa: PLC0415
+        from rdagent.log.timer import RD_Agent_TIMER_wrapper  # noqa: PLC0415
+
+        shared, tasks = _split_shared_context(func_calls)
+        context_path = self.acquire_context(pickle.dumps(shared, protocol=pickle.HIGHEST_PROTOCOL)) if shared else None
+        log_state = (logger._tag, logger.storage.path, RD_Agent_TIMER_wrapper.timer)  # noqa: SLF001
+        try:
+            # the seeds are generated in the order of the calls, so they do not depend on the scheduling
+            futures = [
+                self.executor.submit(
+                    _pool_subprocess_wrapper,
+                    context_path,
+                    task,
+                    LLM_CACHE_SEED_GEN.get_next_seed(),
+                    log_state,
+                )
+                for task in tasks
+            ]
+            return [future.result() for future in futures]
+        finally:
+            if context_path is not None:
+                self.release_context(context_path)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.context_dir, ignore_errors=True)
+
+
+_PROCESS_POOLS: dict[int, _ReusedProcessPool] = {}
+_PROCESS_POOLS_LOCK = threading.Lock()
+
+
+def _settings_snapshot() -> dict[int, dict[str, Any]]:
+    # the workers are forked with the settings of the moment; the pool is restarted if they are changed
+    return {key: settings.model_dump() for key, settings in ExtendedBaseSettings.instances().items()}
+
+
+def _settings_changed(snapshot: dict[int, dict[str, Any]]) -> bool:
+    # the settings created after the fork are not compared; the workers create their own ones
+    instances = ExtendedBaseSettings.instances()
+    return any(key in instances and instances[key].model_dump() != dump for key, dump in snapshot.items())
+
+
+def _get_process_pool(n: int) -> _ReusedProcessPool:
+    with _PROCESS_POOLS_LOCK:
+        pool = _PROCESS_POOLS.get(n)
+        if pool is not None and pool.pid != os.getpid():
+            # inherited from the parent process by forking; the pools belong to the parent
+            _PROCESS_POOLS.clear()
+            pool = None
+        if pool is not None and _settings_changed(pool.settings_snapshot):
+            pool.shutdown()
+            pool = None
+        if pool is None:
+            pool = _PROCESS_POOLS[n] = _ReusedProcessPool(n, _settings_snapshot())
+        return pool
+
+
+def shutdown_process_pools() -> None:
+    """Shut down the process pools reused by `multiprocessing_wrapper` in the current process"""
+    with _PROCESS_POOLS_LOCK:
+        if any(pool.pid == os.getpid() for pool in _PROCESS_POOLS.values()):
+            for pool in _PROCESS_POOLS.values():
+                pool.shutdown()
+        _PROCESS_POOLS.clear()
+
+
+atexit.register(shutdown_process_pools)
 
 
 def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) -> list:
@@ -130,6 +358,11 @@ def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) ->
     We cooperate with chat_cache_seed feature
     We ensure get the same seed trace even we have multiple number of seed
 
+    The process pool is kept and reused by the following calls with the same `n` (unless
+    `RD_AGENT_SETTINGS.multi_proc_reuse_pool` is disabled). The objects shared by the calls (e.g. the scenario
+    held by `self` of a bound method, the queried knowledge) are sent to each worker once instead of with
+    every task.
+
     Parameters
     ----------
     func_calls : List[Tuple[Callable, Tuple]]
@@ -145,6 +378,18 @@ def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) ->
     if n == 1 or max(1, min(n, len(func_calls))) == 1:
         return [f(*args) for f, args in func_calls]
 
+    if RD_AGENT_SETTINGS.multi_proc_reuse_pool:
+        reused_pool = _get_process_pool(n)
+        try:
+            return reused_pool.run(func_calls)
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory); the next call starts a new pool
+            with _PROCESS_POOLS_LOCK:
+                if _PROCESS_POOLS.get(n) is reused_pool:
+                    del _PROCESS_POOLS[n]
+            reused_pool.shutdown()
+            raise
+
     with mp.Pool(processes=max(1, min(n, len(func_calls)))) as pool:
         results = [
             pool.apply_async(_subprocess_wrapper, args=(f, LLM_CACHE_SEED_GEN.get_next_seed(), args))
@@ -189,19 +434,31 @@ def cache_with_pickle(hash_func: Callable, post_process_func: Callable | None =
             cache_file = target_folder / f"{hash_key}.pkl"
             lock_file = target_folder / f"{hash_key}.lock"
 
-            if cache_file.exists():
+            def _dump(result: Any) -> None:
+                # write to a temporary file first so a concurrent reader never loads a partial pickle
+                tmp_file = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                with tmp_file.open("wb") as f:
+                    pickle.dump(result, f)
+                tmp_file.replace(cache_file)
+
+            def _load_cached() -> Any:
                 with cache_file.open("rb") as f:
                     cached_res = pickle.load(f)
                 return post_process_func(*args, cached_res=cached_res, **kwargs) if post_process_func else cached_res
 
+            if cache_file.exists():
+                return _load_cached()
+
             if RD_AGENT_SETTINGS.use_file_lock:
                 with FileLock(lock_file):
+                    # another caller holding the lock may have produced the result while we were waiting
+                    if cache_file.exists():
+                        return _load_cached()
                     result = func(*args, **kwargs)
+                    _dump(result)
             else:
                 result = func(*args, **kwargs)
-
-            with cache_file.open("wb") as f:
-                pickle.dump(result, f)
+                _dump(result)
 
             return result
 
@@ -19,6 +19,13 @@ class LogSettings(ExtendedBaseSettings):
 
     storages: dict[str, list[int | str]] = {}
 
+    indexed_storage: bool = False
+    """If True, the pickled objects are appended to per-process segment files with an index,
+    instead of being saved to one file per object"""
+
+    tpl_log_sample_rate: float = 1.0
+    """The fraction of the template renders logged with the `debug_tpl` tag; 0 disables the logging of renders"""
+
     def model_post_init(self, _context: Any, /) -> None:
         if self.ui_server_port is not None:
             self.storages["rdagent.log.ui.storage.WebStorage"] = [self.ui_server_port, self.trace_path]
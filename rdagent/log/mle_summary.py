@@ -1,4 +1,3 @@
-import pickle
 import traceback
 from collections import defaultdict
 from pathlib import Path
@@ -56,8 +55,7 @@ def save_all_grade_info(log_folder):
 def _get_loop_and_fn_after_hours(log_folder: Path, hours: int):
     stop_session_fp = get_first_session_file_after_duration(log_folder, f"{hours}h")
 
-    with stop_session_fp.open("rb") as f:
-        session_obj: LoopBase = pickle.load(f)
+    session_obj = LoopBase.read(stop_session_fp)
 
     loop_trace = session_obj.loop_trace
     stop_li = max(loop_trace.keys())
@@ -1,19 +1,27 @@
 import os
-import random
 import signal
 import subprocess
+import threading
+import time
 from collections import defaultdict
-from datetime import datetime, timezone
 from pathlib import Path
 
 import randomname
 import typer
-from flask import Flask, jsonify, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    request,
+    send_from_directory,
+    stream_with_context,
+)
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 
-from rdagent.log.storage import FileStorage
+from rdagent.log.server.trace_index import TraceIndex, TraceIndexRegistry, page_json
 from rdagent.log.ui.conf import UI_SETTING
-from rdagent.log.ui.storage import WebStorage
+from rdagent.log.ui.storage import SENDER_HEADER, SEQ_HEADER, decode_batch
 from rdagent.log.utils import is_valid_session
 
 app = Flask(__name__, static_folder=UI_SETTING.static_path)
@@ -21,7 +29,15 @@ CORS(app)
 
 rdagent_processes = defaultdict()
 server_port = 19899
-log_folder_path = Path(UI_SETTING.trace_folder).absolute()
+log_folder_path = Path(UI_SETTING.trace_folder).resolve()
+UPLOAD_SCENARIOS = (
+    "Finance Data Building",
+    "Finance Data Building (Reports)",
+    "Finance Model Implementation",
+    "General Model Implementation",
+    "Finance Whole Pipeline",
+    "Data Science",
+)
 
 
 @app.route("/favicon.ico")
@@ -29,67 +45,123 @@ def favicon():
     return send_from_directory(app.static_folder, "favicon.ico", mimetype="image/vnd.microsoft.icon")
 
 
-msgs_for_frontend = defaultdict(list)
-pointers = defaultdict(lambda: defaultdict(int))  # pointers[trace_id][user_ip]
+trace_indexes = TraceIndexRegistry()
+pointers = defaultdict(lambda: defaultdict(int))  # pointers[trace_id][user_ip], the cursor of the journal
 
 
-def read_trace(log_path: Path, id: str = "") -> None:
-    fs = FileStorage(log_path)
-    ws = WebStorage(port=1, path=log_path)
-    msgs_for_frontend[id] = []
-    last_timestamp = None
-    for msg in fs.iter_msg():
-        data = ws._obj_to_json(obj=msg.content, tag=msg.tag, id=id, timestamp=msg.timestamp.isoformat())
-        if data:
-            if isinstance(data, list):
-                for d in data:
-                    msgs_for_frontend[id].append(d["msg"])
-                    last_timestamp = msg.timestamp
-            else:
-                msgs_for_frontend[id].append(data["msg"])
-                last_timestamp = msg.timestamp
+def resolve_trace_id(trace_id: str) -> str | None:
+    """
+    The id of a trace (its absolute log folder) from the id given by a client; None if it is not a trace.
+    The log folder of a trace is unpickled when it is followed, so only the sessions in the trace folder, the traces
+    started by the server and the pushed traces are accepted.
+    """
+    trace_folder = Path(UI_SETTING.trace_folder).resolve()
+    path = (trace_folder / trace_id).resolve()
+    if path == trace_folder or not path.is_relative_to(trace_folder):
+        return None
+    if str(path) in rdagent_processes or is_valid_session(path) or trace_indexes.is_pushed(str(path)):
+        return str(path)
+    return None
 
-    now = datetime.now(timezone.utc)
-    if last_timestamp and (now - last_timestamp).total_seconds() > 1800:
-        msgs_for_frontend[id].append({"tag": "END", "timestamp": now.isoformat(), "content": {}})
 
+def trace_not_found():
+    return jsonify({"error": "Trace not found"}), 404
 
-# load all traces from the log folder
-for p in log_folder_path.glob("*/*/"):
-    if is_valid_session(p):
-        read_trace(p, id=str(p))
+
+def get_trace_index(trace_id: str) -> TraceIndex:
+    """The index of the trace, with the new messages in its log folder"""
+    index = trace_indexes.get(trace_id)
+    process = rdagent_processes.get(trace_id)
+    index.refresh(Path(trace_id), running=process is not None and process.poll() is None)
+    return index
+
+
+def get_page_size(size: int | str | None) -> int:
+    if size is None:
+        return UI_SETTING.trace_page_size
+    return max(1, min(int(size), UI_SETTING.trace_max_page_size))
 
 
 @app.route("/trace", methods=["POST"])
 def update_trace():
-    global pointers, msgs_for_frontend
+    """The messages not returned to the client yet; the cursor of each client is kept by the server"""
+    global pointers
     data = request.get_json()
     trace_id = data.get("id")
     return_all = data.get("all")
     reset = data.get("reset")
-    msg_num = random.randint(1, 10)
     app.logger.info(data)
-    log_folder_path = Path(UI_SETTING.trace_folder).absolute()
     if not trace_id:
         return jsonify({"error": "Trace ID is required"}), 400
-    trace_id = str(log_folder_path / trace_id)
+    trace_id = resolve_trace_id(trace_id)
+    if trace_id is None:
+        return trace_not_found()
 
     user_ip = request.remote_addr
 
     if reset:
         pointers[trace_id][user_ip] = 0
 
-    start_pointer = pointers[trace_id][user_ip]
-    end_pointer = start_pointer + msg_num
-    if end_pointer > len(msgs_for_frontend[trace_id]) or return_all:
-        end_pointer = len(msgs_for_frontend[trace_id])
+    limit = UI_SETTING.trace_max_page_size if return_all else get_page_size(data.get("size"))
+    lines, _ = get_trace_index(trace_id).read(pointers[trace_id][user_ip], limit)
+    if lines:
+        pointers[trace_id][user_ip] = lines[-1][0]
+    return Response(f"[{','.join(line for _, line in lines)}]", status=200, mimetype="application/json")
 
-    returned_msgs = msgs_for_frontend[trace_id][start_pointer:end_pointer]
 
-    pointers[trace_id][user_ip] = end_pointer
-    if returned_msgs:
-        app.logger.info([msg["tag"] for msg in returned_msgs])
-    return jsonify(returned_msgs), 200
+@app.route("/traces/<path:trace_id>/messages", methods=["GET"])
+def trace_messages(trace_id: str):
+    """A page of the messages from `cursor` (0 by default) with at most `size` messages"""
+    trace_id = resolve_trace_id(trace_id)
+    if trace_id is None:
+        return trace_not_found()
+    try:
+        cursor = int(request.args.get("cursor", 0))
+        limit = get_page_size(request.args.get("size"))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or size"}), 400
+    lines, end = get_trace_index(trace_id).read(cursor, limit)
+    next_cursor = lines[-1][0] if lines else cursor
+    return Response(page_json(lines, next_cursor, end), status=200, mimetype="application/json")
+
+
+@app.route("/traces/<path:trace_id>/stream", methods=["GET"])
+def trace_stream(trace_id: str):
+    """
+    Server-sent events of the messages from `cursor` (or the `Last-Event-ID` of a reconnecting client), including
+    the messages written later; the id of an event is the cursor after its message.
+    The stream ends with an `end` event when the trace is ended.
+    """
+    trace_id = resolve_trace_id(trace_id)
+    if trace_id is None:
+        return trace_not_found()
+    try:
+        cursor = int(request.headers.get("Last-Event-ID") or request.args.get("cursor", 0))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    def events(cursor: int):
+        last_event = time.monotonic()
+        while True:
+            lines, end = get_trace_index(trace_id).read(cursor, UI_SETTING.trace_max_page_size)
+            for cursor, line in lines:
+                yield f"id: {cursor}\ndata: {line}\n\n"
+            if end:
+                yield f"id: {cursor}\nevent: end\ndata: {{}}\n\n"
+                return
+            if lines:
+                last_event = time.monotonic()
+                continue
+            if time.monotonic() - last_event > UI_SETTING.trace_stream_heartbeat:
+                yield ": keep-alive\n\n"
+                last_event = time.monotonic()
+            time.sleep(UI_SETTING.trace_poll_interval / 4)
+
+    return Response(
+        stream_with_context(events(cursor)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/upload", methods=["POST"])
@@ -101,6 +173,8 @@ def upload_file():
     competition = request.form.get("competition")
     loop_n = request.form.get("loops")
     all_duration = request.form.get("all_duration")
+    if scenario not in UPLOAD_SCENARIOS:
+        return jsonify({"error": "Unknown scenario"}), 400
 
     # scenario = "Data Science Loop"
     if scenario == "Data Science":
@@ -121,7 +195,7 @@ def upload_file():
             p = log_folder_path / scenario / "uploads" / trace_name
             if not p.exists():
                 p.mkdir(parents=True, exist_ok=True)
-            file.save(p / file.filename)
+            file.save(p / secure_filename(file.filename))
 
     if scenario == "Finance Data Building":
         cmds = ["rdagent", "fin_factor"]
@@ -133,7 +207,7 @@ def upload_file():
         if len(files) == 0:  # files is one link
             rfp = request.form.get("files")[0]
         else:  # one file is uploaded
-            rfp = str(trace_files_path / files[0].filename)
+            rfp = str(trace_files_path / secure_filename(files[0].filename))
         cmds = ["rdagent", "general_model", "--report_file_path", rfp]
     if scenario == "Finance Whole Pipeline":
         cmds = ["rdagent", "fin_quant"]
@@ -148,6 +222,8 @@ def upload_file():
         cmds += ["--timeout", f"{all_duration}h"]
 
     app.logger.info(f"Started process for {log_trace_path} with parameters: {cmds}")
+    # the messages are pushed by the process, instead of being read from its log folder
+    trace_indexes.get(str(log_trace_path)).mark_pushed()
     with stdout_path.open("w") as log_file:
         rdagent_processes[str(log_trace_path)] = subprocess.Popen(
             cmds,
@@ -169,34 +245,46 @@ def upload_file():
     )
 
 
+last_batch_seqs: dict[str, int] = {}  # the sequence number of the last batch received from each sender
+receive_lock = threading.Lock()
+
+
 @app.route("/receive", methods=["POST"])
 def receive_msgs():
     try:
-        data = request.get_json()
+        data = decode_batch(request.get_data(), request.headers.get("Content-Encoding"))
         # app.logger.info(data["msg"]["tag"])
         if not data:
             return jsonify({"error": "No JSON data received"}), 400
     except Exception as e:
-        return jsonify({"error": "Internal Server Error"}), 500
-
-    if isinstance(data, list):
-        for d in data:
-            msgs_for_frontend[d["id"]].append(d["msg"])
-    else:
-        msgs_for_frontend[data["id"]].append(data["msg"])
+        return jsonify({"error": "Invalid JSON data"}), 400
+
+    msgs_by_trace = defaultdict(list)
+    for d in data if isinstance(data, list) else [data]:
+        msgs_by_trace[d["id"]].append(d["msg"])
+
+    sender, seq = request.headers.get(SENDER_HEADER), request.headers.get(SEQ_HEADER)
+    with receive_lock:
+        if sender is not None and seq is not None:
+            # a batch is sent again if the response is lost; the batches of a sender are sent in order
+            if int(seq) <= last_batch_seqs.get(sender, 0):
+                return jsonify({"status": "duplicated"}), 200
+            last_batch_seqs[sender] = int(seq)
+        for trace_id, msgs in msgs_by_trace.items():
+            trace_indexes.get(str(trace_id)).push(msgs)
 
     return jsonify({"status": "success"}), 200
 
 
 @app.route("/control", methods=["POST"])
 def control_process():
-    global rdagent_processes, msgs_for_frontend
+    global rdagent_processes
     data = request.get_json()
     app.logger.info(data)
     if not data or "id" not in data or "action" not in data:
         return jsonify({"error": "Missing 'id' or 'action' in request"}), 400
 
-    id = str(log_folder_path / data["id"])
+    id = resolve_trace_id(data["id"])
     action = data["action"]
 
     if id not in rdagent_processes or rdagent_processes[id] is None:
@@ -205,7 +293,7 @@ def control_process():
     process = rdagent_processes[id]
 
     if process.poll() is not None:
-        msgs_for_frontend[id].append({"tag": "END", "timestamp": datetime.now(timezone.utc).isoformat(), "content": {}})
+        trace_indexes.get(id).end()
         return jsonify({"error": "Process has already terminated"}), 400
 
     try:
@@ -219,9 +307,7 @@ def control_process():
             process.terminate()
             process.wait()
             del rdagent_processes[id]
-            msgs_for_frontend[id].append(
-                {"tag": "END", "timestamp": datetime.now(timezone.utc).isoformat(), "content": {}}
-            )
+            trace_indexes.get(id).end()
             return jsonify({"status": "stopped"}), 200
         else:
             return jsonify({"error": "Unknown action"}), 400
@@ -232,16 +318,17 @@ def control_process():
 @app.route("/test", methods=["GET"])
 def test():
     # return 'Hello, World!'
-    global msgs_for_frontend, pointers
-    msgs = {k: [i["tag"] for i in v] for k, v in msgs_for_frontend.items()}
-    pointers = pointers
-    return jsonify({"msgs": msgs, "pointers": pointers}), 200
+    global pointers
+    traces = {
+        k: {"source": v.state["source"], "size": v.journal.size(), "ended": v.ended}
+        for k, v in trace_indexes.indexes.items()
+    }
+    return jsonify({"traces": traces, "pointers": pointers}), 200
 
 
 @app.route("/", methods=["GET"])
 def index():
     # return 'Hello, World!'
-    # return {k: [i["tag"] for i in v] for k, v in msgs_for_frontend.items()}
     return send_from_directory(app.static_folder, "index.html")
 
 
@@ -15,6 +15,7 @@ from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 
 from rdagent.log.ui.conf import UI_SETTING
+from rdagent.log.ui.storage import decode_batch
 
 app = Flask(__name__, static_folder=UI_SETTING.static_path)
 CORS(app)
@@ -116,8 +117,8 @@ def upload_file():
 @app.route("/receive", methods=["POST"])
 def receive_msgs():
     try:
-        data = request.get_json()
-        app.logger.info(data["msg"]["tag"])
+        data = decode_batch(request.get_data(), request.headers.get("Content-Encoding"))
+        app.logger.info([d["msg"]["tag"] for d in (data if isinstance(data, list) else [data])])
         if not data:
             return jsonify({"error": "No JSON data received"}), 400
     except Exception as e:
@@ -0,0 +1,190 @@
+"""
+The messages of the traces served to the frontend.
+
+The frontend messages (see README.md) of each trace are appended to a json-lines journal in the index folder,
+and read by pages from a cursor, which is the byte offset of the next message in the journal. So the server keeps
+no messages in memory, and a client resumes from the cursor it got.
+
+The journal of a trace is fed by one of the two sources:
+
+- "push": the messages posted to `/receive` by the `WebStorage` of a running RD-Agent (e.g. started by `/upload`);
+- "files": the log folder of the trace, which is followed incrementally (`FileStorage.tail_records`) when the
+  trace is read, until no logs are written for `trace_end_idle` seconds.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from rdagent.log.storage import FileStorage
+from rdagent.log.ui.conf import UI_SETTING
+from rdagent.log.ui.storage import WebStorage
+
+END_TAG = "END"
+
+
+def end_message() -> dict:
+    return {"tag": END_TAG, "timestamp": datetime.now(timezone.utc).isoformat(), "content": {}}
+
+
+class TraceJournal:
+    """The frontend messages of a trace as a json-lines file; the cursor of a message is its byte offset"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, msgs: list[dict]) -> None:
+        if not msgs:
+            return
+        data = "".join(json.dumps(msg) + "\n" for msg in msgs).encode()
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # one write of whole lines, so a reader never gets a part of a message
+            with self.path.open("ab") as f:
+                f.write(data)
+
+    def read(self, cursor: int, limit: int) -> list[tuple[int, str]]:
+        """At most `limit` messages (as json) from `cursor`, each with the cursor after it"""
+        lines: list[tuple[int, str]] = []
+        try:
+            with self.path.open("rb") as f:
+                f.seek(cursor)
+                while len(lines) < limit:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break  # the end, or a line being written
+                    cursor += len(line)
+                    lines.append((cursor, line[:-1].decode()))
+        except FileNotFoundError:
+            pass
+        return lines
+
+
+class TraceIndex:
+    """The journal of a trace and the state of feeding it (persisted next to the journal)"""
+
+    def __init__(self, trace_id: str, index_folder: Path) -> None:
+        self.trace_id = trace_id
+        key = hashlib.md5(trace_id.encode()).hexdigest()  # noqa: S324
+        self.journal = TraceJournal(index_folder / f"{key}.jsonl")
+        self.state_path = index_folder / f"{key}.json"
+        self.state: dict[str, Any] = {"id": trace_id, "source": None, "position": None, "ended": False}
+        if self.state_path.exists():
+            self.state.update(json.loads(self.state_path.read_text()))
+        self.last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(self.state))
+        tmp_path.replace(self.state_path)
+
+    @property
+    def ended(self) -> bool:
+        return bool(self.state["ended"])
+
+    def mark_pushed(self) -> None:
+        """The messages of the trace are pushed to the server, so its log folder is not followed"""
+        with self._lock:
+            if self.state["source"] != "push":
+                self.state["source"] = "push"
+                self._save_state()
+
+    def push(self, msgs: list[dict]) -> None:
+        with self._lock:
+            if self.state["source"] != "push":
+                self.state["source"] = "push"
+                self._save_state()
+            self.journal.append(msgs)
+
+    def end(self) -> None:
+        with self._lock:
+            if not self.state["ended"]:
+                self.journal.append([end_message()])
+                self.state["ended"] = True
+                self._save_state()
+
+    def refresh(self, log_path: Path, running: bool = False) -> None:
+        """Append the new messages in the log folder of the trace (at most once per `trace_poll_interval`)"""
+        if self.state["source"] == "push" or self.ended or not log_path.is_dir():
+            return
+        if time.monotonic() - self.last_refresh < UI_SETTING.trace_poll_interval:
+            return
+        with self._lock:
+            if self.state["source"] == "push" or self.ended:
+                return
+            self.state["source"] = "files"
+            records, self.state["position"] = FileStorage(log_path).tail_records(self.state["position"])
+            ws = WebStorage(port=1, path=self.trace_id)
+            msgs = []
+            for record in records:
+                msg = record.to_message()
+                data = ws._obj_to_json(
+                    obj=msg.content, tag=msg.tag, id=self.trace_id, timestamp=msg.timestamp.isoformat()
+                )
+                msgs.extend(d["msg"] for d in (data if isinstance(data, list) else [data] if data else []))
+                self.state["last_time"] = msg.timestamp.isoformat()
+            self.journal.append(msgs)
+
+            last_time = self.state.get("last_time")
+            now = datetime.now(timezone.utc)
+            if (
+                not running
+                and last_time is not None
+                and (now - datetime.fromisoformat(last_time)).total_seconds() > UI_SETTING.trace_end_idle
+            ):
+                self.journal.append([end_message()])
+                self.state["ended"] = True
+            self._save_state()
+            self.last_refresh = time.monotonic()
+
+    def read(self, cursor: int, limit: int) -> tuple[list[tuple[int, str]], bool]:
+        """The messages from `cursor`, and whether the trace is ended and all of its messages are read"""
+        ended = self.ended
+        lines = self.journal.read(cursor, limit)
+        next_cursor = lines[-1][0] if lines else cursor
+        return lines, ended and next_cursor >= self.journal.size()
+
+
+class TraceIndexRegistry:
+    def __init__(self, index_folder: str | Path | None = None) -> None:
+        self.index_folder = Path(
+            index_folder or UI_SETTING.trace_index_folder or Path(UI_SETTING.trace_folder) / "__index__"
+        ).absolute()
+        self.indexes: dict[str, TraceIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, trace_id: str) -> TraceIndex:
+        with self._lock:
+            if trace_id not in self.indexes:
+                self.indexes[trace_id] = TraceIndex(trace_id, self.index_folder)
+            return self.indexes[trace_id]
+
+    def is_pushed(self, trace_id: str) -> bool:
+        """Whether the messages of the trace are pushed to the server (the trace is not registered by the check)"""
+        with self._lock:
+            index = self.indexes.get(trace_id)
+        if index is None:
+            index = TraceIndex(trace_id, self.index_folder)
+        return index.state["source"] == "push"
+
+
+def page_json(lines: list[tuple[int, str]], next_cursor: int, end: bool) -> str:
+    """The response of a page; the journal lines are already json, so they are not parsed again"""
+    messages = ",".join(line for _, line in lines)
+    return f'{{"messages": [{messages}], "next_cursor": {next_cursor}, "end": {json.dumps(end)}}}'
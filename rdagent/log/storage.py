@@ -1,12 +1,19 @@
+from __future__ import annotations
+
 import json
+import os
 import pickle
 import re
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Generator, Literal
 
 from .base import Message, Storage
-from .utils import gen_datetime
+from .conf import LOG_SETTINGS
+from .utils import extract_loopid_func_name, gen_datetime
 
 LOG_LEVEL = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
@@ -25,15 +32,80 @@ def _remove_empty_dir(path: Path) -> None:
             path.rmdir()
 
 
+@dataclass
+class LogRecord:
+    """
+    The index entry of a logged object; the object itself is only loaded by `load`.
+    - For the objects in segment files, `length` is the size of the pickled object at `offset`.
+    - For the objects saved as single pickle files, `length` is -1.
+    """
+
+    timestamp: datetime
+    tag: str  # the tag including the pid trace as its last part
+    loop_id: int | None
+    path: Path
+    offset: int = 0
+    length: int = -1
+
+    def load(self) -> object:
+        with self.path.open("rb") as f:
+            if self.length < 0:
+                return pickle.load(f)
+            f.seek(self.offset)
+            return pickle.loads(f.read(self.length))
+
+    def to_message(self) -> Message:
+        tag, _, pid = self.tag.rpartition(".")
+        return Message(tag=tag, level="INFO", timestamp=self.timestamp, caller="", pid_trace=pid, content=self.load())
+
+
+def _match_tag(tag: str | None, record_tag: str) -> bool:
+    """`tag` matches the records whose tag contains it as consecutive parts (like `**/a/b/**` in a glob)"""
+    return tag is None or f".{tag}." in f".{record_tag}."
+
+
 class FileStorage(Storage):
     """
     The info are logginged to the file systems
 
-    TODO: describe the storage format
+    The objects are saved in one of the two formats, and both of them can be read.
+    - Single files: each object is saved to `<tag as folders>/<timestamp>.pkl`
+    - Indexed segments (`LOG_SETTINGS.indexed_storage`): each process appends the pickled objects to
+      `__segments__/<pid>.seg` and their `(timestamp, tag, loop, offset, length)` to the sidecar index
+      `__segments__/<pid>.idx` (one json per line). So the records can be queried by tag and time
+      without listing or loading all the objects.
+
+    The json and text objects are always saved as single files.
     """
 
-    def __init__(self, path: str | Path) -> None:
+    SEGMENT_FOLDER = "__segments__"
+    _segment_lock = threading.Lock()
+
+    def __init__(self, path: str | Path, indexed: bool | None = None) -> None:
         self.path = Path(path)
+        self.indexed = LOG_SETTINGS.indexed_storage if indexed is None else indexed
+
+    def _log_to_segment(self, obj: object, tag: str, timestamp: datetime) -> Path:
+        segment_folder = self.path / self.SEGMENT_FOLDER
+        segment_folder.mkdir(parents=True, exist_ok=True)
+        segment_path = segment_folder / f"{os.getpid()}.seg"
+        data = pickle.dumps(obj)
+        loop_id, _ = extract_loopid_func_name(tag)
+        with self._segment_lock:
+            with segment_path.open("ab") as f:
+                offset = f.tell()
+                f.write(data)
+            entry = {
+                "timestamp": timestamp.isoformat(),
+                "tag": tag,
+                "loop": None if loop_id is None else int(loop_id),
+                "offset": offset,
+                "length": len(data),
+            }
+            # the index is written after the object, so an indexed object is always complete
+            with segment_path.with_suffix(".idx").open("a") as f:
+                f.write(json.dumps(entry) + "\n")
+        return segment_path
 
     def log(
         self,
@@ -46,6 +118,9 @@ class FileStorage(Storage):
         # TODO: We can remove the timestamp after we implement PipeLog
         timestamp = gen_datetime(timestamp)
 
+        if save_type == "pkl" and self.indexed:
+            return self._log_to_segment(obj, tag, timestamp)
+
         cur_p = self.path / tag.replace(".", "/")
         cur_p.mkdir(parents=True, exist_ok=True)
 
@@ -61,8 +136,11 @@ class FileStorage(Storage):
             return path
         elif save_type == "pkl":
             path = path.with_suffix(".pkl")
-            with path.open("wb") as f:
+            # written to a temporary file first, so a reader never finds a partial pickle file
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with tmp_path.open("wb") as f:
                 pickle.dump(obj, f)
+            os.replace(tmp_path, path)
             return path
         elif save_type == "text":
             obj = str(obj)
@@ -76,34 +154,188 @@ class FileStorage(Storage):
         r"(?P<caller>.+:.+:\d+) - "
     )
 
-    def iter_msg(self, tag: str | None = None) -> Generator[Message, None, None]:
-        msg_l = []
+    def _iter_segment_index(self) -> Generator[tuple[Path, list[dict]], None, None]:
+        """yield the index files and their entries"""
+        segment_folder = self.path / self.SEGMENT_FOLDER
+        if not segment_folder.exists():
+            return
+        for index_path in segment_folder.glob("*.idx"):
+            entries = []
+            with index_path.open() as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # a line being written
+            yield index_path, entries
+
+    def _file_record(self, file: Path) -> LogRecord | None:
+        """The record of a single pickle file; None if it is not a logged object"""
+        if file.name == "debug_llm.pkl" or file.parent.name == self.SEGMENT_FOLDER:
+            return None
+        try:
+            timestamp = datetime.strptime(file.stem, "%Y-%m-%d_%H-%M-%S-%f").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None  # not a logged object (e.g. summary.pkl)
+        record_tag = ".".join(file.relative_to(self.path).as_posix().replace("/", ".").split(".")[:-2])
+        loop_id, _ = extract_loopid_func_name(record_tag)
+        return LogRecord(
+            timestamp=timestamp,
+            tag=record_tag,
+            loop_id=None if loop_id is None else int(loop_id),
+            path=file,
+        )
 
+    def _iter_file_records(self, tag: str | None = None) -> Generator[LogRecord, None, None]:
         pkl_files = "**/*.pkl" if tag is None else f"**/{tag.replace('.','/')}/**/*.pkl"
         for file in self.path.glob(pkl_files):
-            if file.name == "debug_llm.pkl":
+            if (record := self._file_record(file)) is not None:
+                yield record
+
+    def iter_records(
+        self, tag: str | None = None, start: datetime | None = None, end: datetime | None = None
+    ) -> list[LogRecord]:
+        """
+        Query the records of the logged objects sorted by time, without loading the objects.
+
+        Parameters
+        ----------
+        tag : str | None
+            only the records whose tag contains `tag` as consecutive parts, e.g. "Loop_1.running"
+        start, end : datetime | None
+            only the records logged in [start, end]
+        """
+        records = list(self._iter_file_records(tag))
+        for index_path, entries in self._iter_segment_index():
+            segment_path = index_path.with_suffix(".seg")
+            for e in entries:
+                if _match_tag(tag, e["tag"]):
+                    records.append(
+                        LogRecord(
+                            timestamp=datetime.fromisoformat(e["timestamp"]),
+                            tag=e["tag"],
+                            loop_id=e["loop"],
+                            path=segment_path,
+                            offset=e["offset"],
+                            length=e["length"],
+                        )
+                    )
+        records = [
+            r for r in records if (start is None or r.timestamp >= start) and (end is None or r.timestamp <= end)
+        ]
+        records.sort(key=lambda r: r.timestamp)
+        return records
+
+    # a folder modified within the seconds may be modified again without changing its mtime
+    MTIME_SETTLE_SECONDS = 2
+
+    def _tail_files(self, folders: dict[str, dict]) -> tuple[list[LogRecord], dict[str, dict]]:
+        """
+        The single files not seen in `folders`, and the new `folders`.
+
+        `folders` maps the relative path of each folder to its mtime, sub-folders and pickle files when it was listed
+        last time. A folder is listed again only if its mtime changed (or was too recent to be trusted), so
+        following an unchanged storage only stats its folders, and a file is returned once whatever its timestamp.
+        """
+        records: list[LogRecord] = []
+        new_folders: dict[str, dict] = {}
+        settled = time.time_ns() - self.MTIME_SETTLE_SECONDS * 10**9
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            folder = self.path / rel
+            try:
+                mtime = folder.stat().st_mtime_ns
+            except FileNotFoundError:
                 continue
-            pkl_log_tag = ".".join(file.relative_to(self.path).as_posix().replace("/", ".").split(".")[:-3])
-            pid = file.parent.name
+            entry = folders.get(rel)
+            if entry is None or entry["mtime"] != mtime:
+                sub_folders, files = [], []
+                try:
+                    with os.scandir(folder) as it:
+                        for e in it:
+                            if e.is_dir():
+                                if not (rel == "" and e.name == self.SEGMENT_FOLDER):
+                                    sub_folders.append(e.name)
+                            elif e.name.endswith(".pkl"):
+                                files.append(e.name)
+                except FileNotFoundError:
+                    continue
+                seen = set(entry["files"]) if entry is not None else set()
+                for name in files:
+                    if name not in seen and (record := self._file_record(folder / name)) is not None:
+                        records.append(record)
+                entry = {"mtime": mtime if mtime < settled else None, "folders": sub_folders, "files": files}
+            new_folders[rel] = entry
+            pending.extend(f"{rel}/{name}" if rel else name for name in entry["folders"])
+        return records, new_folders
 
-            with file.open("rb") as f:
-                content = pickle.load(f)
+    def tail_records(self, position: dict | None = None) -> tuple[list[LogRecord], dict]:
+        """
+        Follow the storage: return the records logged after `position` sorted by time, and the new position.
 
-            timestamp = datetime.strptime(file.stem, "%Y-%m-%d_%H-%M-%S-%f").replace(tzinfo=timezone.utc)
+        `position` is the json-serializable position returned by the previous call (None for the beginning).
+        The segment indexes are read from the byte offsets where the previous call stopped; the single files are
+        the ones not seen by the previous calls (so a file written late by another process is not missed).
+        """
+        position = position or {}
+        segment_offsets = dict(position.get("segments", {}))
 
-            m = Message(tag=pkl_log_tag, level="INFO", timestamp=timestamp, caller="", pid_trace=pid, content=content)
+        if "folders" in position or "file_time" not in position:
+            records, folders = self._tail_files(position.get("folders", {}))
+        else:
+            # the position of an older version, which followed the single files by their latest timestamp
+            last_file_time = datetime.fromisoformat(position["file_time"]) if position["file_time"] else None
+            records, folders = self._tail_files({})
+            records = [r for r in records if last_file_time is None or r.timestamp > last_file_time]
 
-            msg_l.append(m)
+        segment_folder = self.path / self.SEGMENT_FOLDER
+        for index_path in sorted(segment_folder.glob("*.idx")) if segment_folder.exists() else []:
+            offset = segment_offsets.get(index_path.name, 0)
+            with index_path.open("rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # a line being written
+                    offset += len(line)
+                    e = json.loads(line)
+                    records.append(
+                        LogRecord(
+                            timestamp=datetime.fromisoformat(e["timestamp"]),
+                            tag=e["tag"],
+                            loop_id=e["loop"],
+                            path=index_path.with_suffix(".seg"),
+                            offset=e["offset"],
+                            length=e["length"],
+                        )
+                    )
+            segment_offsets[index_path.name] = offset
 
-        msg_l.sort(key=lambda x: x.timestamp)
-        for m in msg_l:
-            yield m
+        records.sort(key=lambda r: r.timestamp)
+        return records, {"folders": folders, "segments": segment_offsets}
+
+    def iter_msg(
+        self, tag: str | None = None, start: datetime | None = None, end: datetime | None = None
+    ) -> Generator[Message, None, None]:
+        # the objects are loaded one by one when the messages are consumed
+        for record in self.iter_records(tag=tag, start=start, end=end):
+            yield record.to_message()
 
     def truncate(self, time: datetime) -> None:
-        for file in self.path.glob("**/*.pkl"):
-            timestamp = datetime.strptime(file.stem, "%Y-%m-%d_%H-%M-%S-%f").replace(tzinfo=timezone.utc)
-            if timestamp > time:
-                file.unlink()
+        for record in self._iter_file_records():
+            if record.timestamp > time:
+                record.path.unlink()
+
+        with self._segment_lock:
+            for index_path, entries in self._iter_segment_index():
+                kept = [e for e in entries if datetime.fromisoformat(e["timestamp"]) <= time]
+                if len(kept) == len(entries):
+                    continue
+                tmp_path = index_path.with_suffix(".idx.tmp")
+                tmp_path.write_text("".join(json.dumps(e) + "\n" for e in kept))
+                tmp_path.replace(index_path)
+                with index_path.with_suffix(".seg").open("r+b") as f:
+                    f.truncate(max((e["offset"] + e["length"] for e in kept), default=0))
 
         _remove_empty_dir(self.path)
 
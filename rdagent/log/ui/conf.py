@@ -18,5 +18,52 @@ class UIBasePropSetting(ExtendedBaseSettings):
 
     trace_folder: str = "./traces"
 
+    session_index_path: str = "./git_ignore_folder/ui_session_index.db"
+    """The sqlite database of the summary index of the sessions (see `rdagent/log/ui/session_index.py`)"""
+
+    # the trace server
+    trace_index_folder: str | None = None
+    """The folder of the message journals of the traces; `<trace_folder>/__index__` by default"""
+
+    trace_page_size: int = 100
+    """The default number of messages in a page of a trace"""
+
+    trace_max_page_size: int = 1000
+    """The maximum number of messages in a page of a trace"""
+
+    trace_poll_interval: float = 1.0
+    """The minimum seconds between two scans of the log folder of a trace for new messages"""
+
+    trace_end_idle: int = 1800
+    """A trace without new logs for the seconds (and without a running process) is regarded as ended"""
+
+    trace_stream_heartbeat: float = 15
+    """The seconds between the keep-alive comments of an idle message stream"""
+
+    # the shipping of the messages by `WebStorage`
+    web_queue_size: int = 1000
+    """The maximum number of queued messages; logging blocks when the queue is full"""
+
+    web_batch_size: int = 100
+    """The maximum number of messages in a batch"""
+
+    web_batch_bytes: int = 1 << 20
+    """The maximum size of the messages in a batch (before compression)"""
+
+    web_batch_interval: float = 0.5
+    """The maximum seconds to wait for more messages before sending a batch"""
+
+    web_timeout: float = 5
+    """The timeout of sending a batch"""
+
+    web_max_backoff: float = 30
+    """The maximum seconds between the retries of sending the spilled batches"""
+
+    web_spill_path: str | None = None
+    """The folder of the batches spilled while the server is down; a folder in the temp dir by default"""
+
+    web_close_timeout: float = 10
+    """The maximum seconds to wait for the queued messages to be shipped at exit"""
+
 
 UI_SETTING = UIBasePropSetting()
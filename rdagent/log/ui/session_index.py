@@ -0,0 +1,333 @@
+"""
+The summary index of the sessions shown by the UI.
+
+Summarizing a session (the final SOTA experiment, the grade of the submitted experiment, the time of the steps)
+used to rglob its log folder and unpickle the experiments and traces on every refresh. The index keeps a small
+summary of each session in a sqlite database (`UI_SETTING.session_index_path`) and updates it incrementally from
+the records logged since the previous update (`FileStorage.tail_records`):
+
+- `records`: the location of the heavyweight objects (the SOTA experiments, the traces, the running experiments and
+  the mle scores) with their loop id, and the small value derived from each of them when it is indexed (the score of
+  a SOTA experiment, the digest of the code of a running experiment, the grade of a mle score);
+- `loop_times`: the time of the steps of the loops in the latest checkpoint of the session;
+- `sessions`: the position of the tail and the grade of the submitted experiment.
+
+Following an unchanged session only stats its folders (see `FileStorage.tail_records`), and a record logged late
+(e.g. by a parallel loop in another process) is still indexed when it arrives. An object is only unpickled when it
+is indexed, and when the UI drills down into it (e.g. `SessionIndex.final_sota_record(...).load()`).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from rdagent.core.utils import SingletonBaseClass
+from rdagent.log.storage import FileStorage, LogRecord
+from rdagent.log.utils import extract_json
+from rdagent.utils import md5_hash
+from rdagent.utils.workflow.loop import LoopBase, LoopTrace
+
+SOTA_EXP, TRACE, RUNNING_EXP, MLE_SCORE = "sota_exp", "trace", "running_exp", "mle_score"
+
+# the grades of a mle score from the best; the grade of an experiment is the first one it reaches
+MLE_GRADES = [
+    ("gold_medal", "gold"),
+    ("silver_medal", "silver"),
+    ("bronze_medal", "bronze"),
+    ("above_median", "above_median"),
+    ("valid_submission", "valid_submission"),
+    ("submission_exists", "made_submission"),
+]
+
+
+def record_kind(tag: str) -> str | None:
+    """The kind of the object logged with `tag` (including the pid trace); None for the objects not indexed"""
+    parts = tag.split(".")
+    if "SOTA experiment" in parts:
+        return SOTA_EXP
+    if "trace" in parts:
+        return TRACE
+    if parts[0].startswith("Loop_") and parts[1:2] == ["running"]:
+        if len(parts) == 3:
+            return RUNNING_EXP
+        if parts[2] == "mle_score":
+            return MLE_SCORE
+    return None
+
+
+def latest_checkpoint(log_path: Path) -> Path | None:
+    session_p = log_path / "__session__"
+    if not session_p.exists():
+        return None
+    files = [f for f in session_p.glob("*/*_*") if f.parent.name.isdigit() and f.name.split("_")[0].isdigit()]
+    return max(files, key=lambda f: (int(f.parent.name), int(f.name.split("_")[0])), default=None)
+
+
+def _index_value(kind: str, obj: Any) -> Any:
+    """The small value kept in the index for a logged object"""
+    if kind == SOTA_EXP:
+        try:
+            result = obj.result
+        except AttributeError:  # Compatible with old versions
+            result = obj.__dict__["result"]
+        if result is None:
+            return None
+        score = result.loc["ensemble"].iloc[0]
+        try:
+            return float(score)
+        except (TypeError, ValueError):
+            return str(score)
+    if kind == RUNNING_EXP:
+        return md5_hash(obj.experiment_workspace.all_codes)
+    if kind == MLE_SCORE:
+        return extract_json(obj)
+    return None
+
+
+class SessionIndex(SingletonBaseClass):
+    """
+    The summary index of the sessions; the queries update the index of the session before reading it, unless
+    `update=False` (e.g. for the queries following an explicit `update`).
+    """
+
+    VALUED_KINDS = (SOTA_EXP, RUNNING_EXP, MLE_SCORE)
+
+    def __init__(self, db_path: str) -> None:
+        if getattr(self, "db_path", None) == db_path:
+            return
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._conn_pid: int | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session TEXT PRIMARY KEY, position TEXT, checkpoint TEXT, sota_exp_stat TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records (session TEXT, kind TEXT, loop_id INTEGER, timestamp TEXT, "
+                "path TEXT, offset INTEGER, length INTEGER, value TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS records_session_kind ON records (session, kind, loop_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS loop_times "
+                "(session TEXT, loop_id INTEGER, step_idx INTEGER, start TEXT, end TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS loop_times_session ON loop_times (session)")
+            conn.commit()
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def session_key(log_path: Path) -> str:
+        return str(Path(log_path).absolute())
+
+    def reset(self, log_path: Path) -> None:
+        """Drop the index of the session, so it is built again by the next query"""
+        session = self.session_key(log_path)
+        with self._lock, self.conn as conn:
+            for table in ("sessions", "records", "loop_times"):
+                conn.execute(f"DELETE FROM {table} WHERE session = ?", (session,))
+
+    def update(self, log_path: Path) -> None:
+        log_path = Path(log_path)
+        with self._lock:
+            try:
+                self._update(log_path)
+            except FileNotFoundError:
+                # the logs were truncated (e.g. the session was checked out at an earlier loop)
+                self.reset(log_path)
+                self._update(log_path)
+
+    def _update(self, log_path: Path) -> None:
+        session = self.session_key(log_path)
+        if not log_path.exists():
+            raise FileNotFoundError(f"The session {log_path} does not exist.")
+        row = self.conn.execute(
+            "SELECT position, checkpoint, sota_exp_stat FROM sessions WHERE session = ?", (session,)
+        ).fetchone()
+        old_position, checkpoint, sota_exp_stat = row if row is not None else (None, None, None)
+        position = json.loads(old_position) if old_position is not None else None
+
+        storage = FileStorage(log_path)
+        segment_folder = log_path / FileStorage.SEGMENT_FOLDER
+        for name, offset in (position or {}).get("segments", {}).items():
+            if not (segment_folder / name).exists() or (segment_folder / name).stat().st_size < offset:
+                raise FileNotFoundError(f"The segment index {name} is truncated.")
+        # the truncation of the single files removes the latest ones
+        latest_file = self.conn.execute(
+            "SELECT path FROM records WHERE session = ? AND length < 0 ORDER BY timestamp DESC LIMIT 1", (session,)
+        ).fetchone()
+        if latest_file is not None and not Path(latest_file[0]).exists():
+            raise FileNotFoundError(f"The log file {latest_file[0]} is removed.")
+        records, position = storage.tail_records(position)
+
+        with self.conn as conn:
+            changed = stat_changed = row is None
+            for record in records:
+                kind = record_kind(record.tag)
+                if kind is None or record.loop_id is None:
+                    continue
+                conn.execute(
+                    "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, NULL)",
+                    (
+                        session,
+                        kind,
+                        record.loop_id,
+                        record.timestamp.isoformat(),
+                        str(record.path),
+                        record.offset,
+                        record.length,
+                    ),
+                )
+                changed = True
+                stat_changed = stat_changed or kind != SOTA_EXP
+            # the values are computed for the new records, and retried for the ones not loadable before
+            # (e.g. a pickle file being written)
+            pending = conn.execute(
+                "SELECT rowid, kind, loop_id, timestamp, path, offset, length FROM records "
+                f"WHERE session = ? AND value IS NULL AND kind IN ({', '.join('?' * len(self.VALUED_KINDS))})",
+                (session, *self.VALUED_KINDS),
+            ).fetchall()
+            for rowid, kind, *record_row in pending:
+                try:
+                    value = _index_value(kind, self._record(record_row).load())
+                except FileNotFoundError:
+                    raise
+                except Exception:  # noqa: BLE001
+                    continue
+                conn.execute("UPDATE records SET value = ? WHERE rowid = ?", (json.dumps(value), rowid))
+                changed = True
+                stat_changed = stat_changed or kind != SOTA_EXP
+
+            if stat_changed:
+                sota_exp_stat = json.dumps(self._compute_sota_exp_stat(conn, session))
+
+            checkpoint_path = latest_checkpoint(log_path)
+            new_checkpoint = (
+                None if checkpoint_path is None else f"{checkpoint_path}:{checkpoint_path.stat().st_mtime_ns}"
+            )
+            if new_checkpoint != checkpoint:
+                changed = True
+                conn.execute("DELETE FROM loop_times WHERE session = ?", (session,))
+                conn.executemany(
+                    "INSERT INTO loop_times VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (session, loop_id, lt.step_idx, lt.start.isoformat(), lt.end.isoformat())
+                        for loop_id, traces in self._read_loop_trace(checkpoint_path).items()
+                        for lt in traces
+                    ],
+                )
+            new_position = json.dumps(position)
+            if changed or new_position != old_position:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                    (session, new_position, new_checkpoint, sota_exp_stat),
+                )
+
+    @staticmethod
+    def _read_loop_trace(checkpoint_path: Path | None) -> dict[int, list[LoopTrace]]:
+        if checkpoint_path is None:
+            return {}
+        try:
+            return LoopBase.read(checkpoint_path).loop_trace
+        except Exception:  # noqa: BLE001
+            return {}
+
+    @staticmethod
+    def _record(row: list | tuple) -> LogRecord:
+        loop_id, timestamp, path, offset, length = row
+        return LogRecord(datetime.fromisoformat(timestamp), "", loop_id, Path(path), offset, length)
+
+    def _final_record_row(self, conn: sqlite3.Connection, session: str, kind: str) -> tuple | None:
+        """The record of the kind in the last loop"""
+        return conn.execute(
+            "SELECT loop_id, timestamp, path, offset, length, value FROM records WHERE session = ? AND kind = ? "
+            "ORDER BY loop_id DESC, timestamp DESC LIMIT 1",
+            (session, kind),
+        ).fetchone()
+
+    def _compute_sota_exp_stat(self, conn: sqlite3.Connection, session: str) -> str | None:
+        """The grade of the experiment to submit in the final trace"""
+        trace_row = self._final_record_row(conn, session, TRACE)
+        if trace_row is None:
+            return None
+        final_trace = self._record(trace_row[:5]).load()
+        if hasattr(final_trace, "sota_exp_to_submit"):
+            sota_exp = final_trace.sota_exp_to_submit
+        else:
+            sota_exp = final_trace.sota_experiment()
+        if sota_exp is None:
+            return None
+
+        # the latest running experiment with the same code
+        loop_row = conn.execute(
+            "SELECT loop_id FROM records WHERE session = ? AND kind = ? AND value = ? ORDER BY loop_id DESC LIMIT 1",
+            (session, RUNNING_EXP, json.dumps(md5_hash(sota_exp.experiment_workspace.all_codes))),
+        ).fetchone()
+        if loop_row is None:
+            return None
+        score_row = conn.execute(
+            "SELECT value FROM records WHERE session = ? AND kind = ? AND loop_id = ? AND value IS NOT NULL "
+            "ORDER BY timestamp LIMIT 1",
+            (session, MLE_SCORE, loop_row[0]),
+        ).fetchone()
+        if score_row is None:
+            # sota exp is not evaluated by mle_score
+            return None
+        sota_mle_score = json.loads(score_row[0])
+        if not sota_mle_score:
+            return None
+        return next((grade for key, grade in MLE_GRADES if sota_mle_score.get(key)), None)
+
+    def final_sota_record(self, log_path: Path) -> LogRecord | None:
+        """The record of the SOTA experiment logged in the last loop"""
+        self.update(log_path)
+        with self._lock:
+            row = self._final_record_row(self.conn, self.session_key(log_path), SOTA_EXP)
+        return None if row is None else self._record(row[:5])
+
+    def final_sota_score(self, log_path: Path, update: bool = True) -> Any:
+        """The valid score (of the ensemble) of the SOTA experiment logged in the last loop"""
+        if update:
+            self.update(log_path)
+        with self._lock:
+            row = self._final_record_row(self.conn, self.session_key(log_path), SOTA_EXP)
+        return None if row is None or row[5] is None else json.loads(row[5])
+
+    def sota_exp_stat(self, log_path: Path, update: bool = True) -> str | None:
+        if update:
+            self.update(log_path)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT sota_exp_stat FROM sessions WHERE session = ?", (self.session_key(log_path),)
+            ).fetchone()
+        return None if row is None or row[0] is None else json.loads(row[0])
+
+    def loop_times(self, log_path: Path, update: bool = True) -> dict[int, list[LoopTrace]]:
+        """The `loop_trace` of the latest checkpoint of the session"""
+        if update:
+            self.update(log_path)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT loop_id, step_idx, start, end FROM loop_times WHERE session = ? ORDER BY rowid",
+                (self.session_key(log_path),),
+            ).fetchall()
+        times: dict[int, list[LoopTrace]] = {}
+        for loop_id, step_idx, start, end in rows:
+            times.setdefault(loop_id, []).append(
+                LoopTrace(datetime.fromisoformat(start), datetime.fromisoformat(end), step_idx)
+            )
+        return times
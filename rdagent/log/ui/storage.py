@@ -1,3 +1,13 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Generator
@@ -9,46 +19,241 @@ from rdagent.log.utils import extract_evoid, extract_loopid_func_name, gen_datet
 
 from .conf import UI_SETTING
 
+SENDER_HEADER = "X-RDAgent-Sender"
+SEQ_HEADER = "X-RDAgent-Seq"
+
+
+def decode_batch(body: bytes, content_encoding: str | None = None) -> list[dict] | dict:
+    """Decode the messages posted to `/receive` (a batch of `WebStorage`, or a single message)"""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+class _BatchSender:
+    """
+    Ship the messages of `WebStorage` to the server from a background thread.
+
+    - The messages wait in a bounded queue; `put` blocks while it is full, so the messages are not dropped.
+    - The queued messages are sent in gzip-compressed batches, when a batch is full (by count or size) or no more
+      messages come in `batch_interval`.
+    - A batch failed to be sent is spilled to disk. The spilled batches are sent again in order with an exponential
+      backoff, and the newer batches are spilled behind them until the server is back.
+    - Each batch carries the id of the sender and its sequence number, so the server can ignore the batches sent
+      twice (e.g. received but timed out).
+    - The queued messages are shipped at exit (for at most `close_timeout` seconds).
+    """
+
+    _CLOSE = object()
+
+    def __init__(
+        self,
+        url: str,
+        queue_size: int | None = None,
+        batch_size: int | None = None,
+        batch_bytes: int | None = None,
+        batch_interval: float | None = None,
+        timeout: float | None = None,
+        max_backoff: float | None = None,
+        spill_path: str | None = None,
+        close_timeout: float | None = None,
+    ) -> None:
+        """The options are the `web_*` settings in `UI_SETTING` by default"""
+        self.url = url
+        self.batch_size = UI_SETTING.web_batch_size if batch_size is None else batch_size
+        self.batch_bytes = UI_SETTING.web_batch_bytes if batch_bytes is None else batch_bytes
+        self.batch_interval = UI_SETTING.web_batch_interval if batch_interval is None else batch_interval
+        self.timeout = UI_SETTING.web_timeout if timeout is None else timeout
+        self.max_backoff = UI_SETTING.web_max_backoff if max_backoff is None else max_backoff
+        self.close_timeout = UI_SETTING.web_close_timeout if close_timeout is None else close_timeout
+        spill_path = spill_path or UI_SETTING.web_spill_path or str(Path(tempfile.gettempdir()) / "rdagent_web_storage")
+        queue_size = UI_SETTING.web_queue_size if queue_size is None else queue_size
+
+        self.pid = os.getpid()
+        self.sender_id = f"{self.pid}-{uuid.uuid4().hex[:8]}"
+        self.spill_dir = Path(spill_path) / self.sender_id
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.seq = 0
+        self.spilled: deque[tuple[int, Path]] = deque()
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.closed = False
+
+        self.thread = threading.Thread(target=self._run, name="WebStorageSender", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def put(self, msg: str) -> None:
+        """Queue a message (encoded as json)"""
+        self.queue.put(msg)
+
+    def _collect(self) -> tuple[list[str], bool]:
+        """
+        Wait for a batch of messages; return the batch and whether the sender is closed.
+        The messages are marked as done by `_run` after they are sent or spilled.
+        """
+        batch: list[str] = []
+        size = 0
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size and size < self.batch_bytes:
+            try:
+                msg = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if msg is self._CLOSE:
+                self.queue.task_done()
+                return batch, True
+            batch.append(msg)
+            size += len(msg)
+        return batch, False
+
+    def _post(self, seq: int, payload: bytes) -> bool:
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            SENDER_HEADER: self.sender_id,
+            SEQ_HEADER: str(seq),
+        }
+        try:
+            resp = requests.post(f"{self.url}/receive", data=payload, headers=headers, timeout=self.timeout)
+            # the batches rejected by the server (4xx) would never be accepted, so they are not sent again
+            ok = resp.status_code < 500
+        except requests.RequestException:
+            ok = False
+        if ok:
+            self.backoff = 0.0
+        else:
+            self.backoff = min(max(self.backoff * 2, 0.5), self.max_backoff)
+            self.retry_at = time.monotonic() + self.backoff
+        return ok
+
+    def _spill(self, seq: int, payload: bytes) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{seq:012d}.json.gz"
+        path.write_bytes(payload)
+        self.spilled.append((seq, path))
+
+    def _send_spilled(self, force: bool = False) -> None:
+        while self.spilled and (force or time.monotonic() >= self.retry_at):
+            seq, path = self.spilled[0]
+            if not self._post(seq, path.read_bytes()):
+                return
+            path.unlink(missing_ok=True)
+            self.spilled.popleft()
+
+    def _ship(self, batch: list[str]) -> None:
+        self.seq += 1
+        payload = gzip.compress(f"[{','.join(batch)}]".encode())
+        # the batches are sent in order, so a batch waits behind the spilled ones
+        if self.spilled or not self._post(self.seq, payload):
+            self._spill(self.seq, payload)
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            try:
+                if batch:
+                    self._ship(batch)
+                self._send_spilled(force=closed)
+            except Exception as e:  # noqa: BLE001
+                # e.g. the spill folder is not writable; the sender keeps running, so the logging is not blocked
+                from rdagent.log import rdagent_logger as logger
+
+                logger.warning(f"Failed to ship {len(batch)} messages to {self.url}: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def pending(self) -> int:
+        """The number of the messages queued and the batches spilled"""
+        return self.queue.qsize() + len(self.spilled)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait for the queued and spilled messages to be sent; return whether all of them are sent"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks or self.spilled:
+            if not self.thread.is_alive() or (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(0.02)
+        return True
+
+    def close(self) -> None:
+        if self.closed or self.pid != os.getpid():
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        try:
+            self.queue.put(self._CLOSE, timeout=self.close_timeout)
+        except queue.Full:
+            pass
+        self.thread.join(self.close_timeout)
+        if self.spilled:
+            from rdagent.log import rdagent_logger as logger
+
+            logger.warning(f"{len(self.spilled)} batches of messages are not sent to {self.url}, see {self.spill_dir}")
+
 
 class WebStorage(Storage):
     """
     The storage for web app.
     It is used to provide the data for the web app.
+
+    The messages are shipped to the server by a background sender (see `_BatchSender`), which is started by the
+    first message; so the storage can also be used only to convert the objects (`_obj_to_json`).
     """
 
-    def __init__(self, port: int, path: str) -> None:
+    def __init__(self, port: int, path: str, **sender_kwargs: Any) -> None:
         """
         Initializes the storage object with the specified port and identifier.
         Args:
             port (int): The port number to use for the storage service.
             path (str): The unique identifier for local storage, the log path.
+            sender_kwargs: the options of the sender, the settings in `UI_SETTING` by default.
         """
         self.url = f"http://localhost:{port}"
         self.path = path
         self.msgs = []
+        self.sender_kwargs = sender_kwargs
+        self._sender: _BatchSender | None = None
+        self._sender_lock = threading.Lock()
 
     def __str__(self):
         return f"WebStorage({self.url})"
 
+    @property
+    def sender(self) -> _BatchSender:
+        with self._sender_lock:
+            # a forked process ships its own messages; the sender thread of the parent is not copied
+            if self._sender is None or self._sender.pid != os.getpid():
+                self._sender = _BatchSender(self.url, **self.sender_kwargs)
+            return self._sender
+
     def log(self, obj: object, tag: str, timestamp: datetime | None = None, **kwargs: Any) -> str | Path:
         timestamp = gen_datetime(timestamp)
         if "pdf_image" in tag or "load_pdf_screenshot" in tag:
             obj.save(f"{UI_SETTING.static_path}/{timestamp.isoformat()}.jpg")
 
-        try:
-            data = self._obj_to_json(obj=obj, tag=tag, id=self.path, timestamp=timestamp.isoformat())
-            if not data:
-                return "Normal log, skipped"
-            if isinstance(data, list):
-                for d in data:
-                    self.msgs.append(d)
-            else:
-                self.msgs.append(data)
-            headers = {"Content-Type": "application/json"}
-            resp = requests.post(f"{self.url}/receive", json=data, headers=headers, timeout=1)
-            return f"{resp.status_code} {resp.text}"
-        except (requests.ConnectionError, requests.Timeout) as e:
-            pass
+        data = self._obj_to_json(obj=obj, tag=tag, id=self.path, timestamp=timestamp.isoformat())
+        if not data:
+            return "Normal log, skipped"
+        data_list = data if isinstance(data, list) else [data]
+        # encoded by the caller, so an unserializable object fails where it is logged
+        encoded = [json.dumps(d) for d in data_list]
+        self.msgs.extend(data_list)
+        for msg in encoded:
+            self.sender.put(msg)
+        return f"Queued {len(encoded)} messages"
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait for the logged messages to be shipped; return whether all of them are shipped"""
+        return self._sender is None or self._sender.pid != os.getpid() or self._sender.flush(timeout)
+
+    def close(self) -> None:
+        """Ship the logged messages and stop the sender"""
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
 
     def truncate(self, time: datetime) -> None:
         self.msgs = [m for m in self.msgs if datetime.fromisoformat(m["msg"]["timestamp"]) <= time]
@@ -59,6 +264,8 @@ class WebStorage(Storage):
                 tag=msg["msg"]["tag"],
                 level="INFO",
                 timestamp=datetime.fromisoformat(msg["msg"]["timestamp"]),
+                caller=None,
+                pid_trace=None,
                 content=msg,
             )
 
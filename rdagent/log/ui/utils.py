@@ -1,5 +1,4 @@
 import math
-import pickle
 import re
 from collections import deque
 from datetime import datetime, timedelta
@@ -10,12 +9,9 @@ import networkx as nx
 import pandas as pd
 import typer
 
-from rdagent.app.data_science.loop import DataScienceRDLoop
 from rdagent.core.proposal import Trace
-from rdagent.core.utils import cache_with_pickle
 from rdagent.log.ui.conf import UI_SETTING
-from rdagent.log.utils import extract_json
-from rdagent.oai.llm_utils import md5_hash
+from rdagent.log.ui.session_index import SessionIndex
 from rdagent.scenarios.kaggle.kaggle_crawler import get_metric_direction
 
 LITE = [
@@ -122,112 +118,25 @@ def get_script_time(stdout_p: Path):
     return None
 
 
-def _log_path_hash_func(log_path: Path):
-    hash_str = str(log_path) + str(log_path.stat().st_mtime)
-    session_p = log_path / "__session__"
-    if session_p.exists():
-        for ld in session_p.iterdir():
-            if ld.is_dir():
-                hash_str += str(ld.name) + str(ld.stat().st_mtime)
-    else:
-        hash_str += "no session now"
-    return md5_hash(hash_str)
+def get_final_sota_exp(log_path: Path):
+    """The SOTA experiment logged in the last loop; it is unpickled, so only call it when drilling down"""
+    record = SessionIndex(db_path=UI_SETTING.session_index_path).final_sota_record(log_path)
+    return None if record is None else record.load()
 
 
-@cache_with_pickle(_log_path_hash_func, force=True)
-def get_final_sota_exp(log_path: Path):
-    sota_exp_paths = [i for i in log_path.rglob(f"**/SOTA experiment/**/*.pkl")]
-    if len(sota_exp_paths) == 0:
-        return None
-    final_sota_exp_path = max(sota_exp_paths, key=lambda x: int(re.match(r".*Loop_(\d+).*", str(x))[1]))
-    with final_sota_exp_path.open("rb") as f:
-        final_sota_exp = pickle.load(f)
-    return final_sota_exp
+def get_final_sota_exp_score(log_path: Path):
+    """The valid score of the SOTA experiment logged in the last loop"""
+    return SessionIndex(db_path=UI_SETTING.session_index_path).final_sota_score(log_path)
 
 
-@cache_with_pickle(_log_path_hash_func, force=True)
 def get_sota_exp_stat(log_path: Path):
-    trace_paths = [i for i in log_path.rglob(f"**/trace/**/*.pkl")]
-    if len(trace_paths) == 0:
-        return None
-    final_trace_path = max(trace_paths, key=lambda x: int(re.match(r".*Loop_(\d+).*", str(x))[1]))
-    with final_trace_path.open("rb") as f:
-        final_trace = pickle.load(f)
-
-    if hasattr(final_trace, "sota_exp_to_submit"):
-        sota_exp = final_trace.sota_exp_to_submit
-    else:
-        sota_exp = final_trace.sota_experiment()
+    return SessionIndex(db_path=UI_SETTING.session_index_path).sota_exp_stat(log_path)
 
-    if sota_exp is None:
-        return None
 
-    sota_loop_id = None
-    exp_paths = [
-        (i, int(match[1]))
-        for i in log_path.rglob(f"*/running/*/*.pkl")
-        if (match := re.search(r".*Loop_(\d+).*", str(i)))
-    ]
-    if len(exp_paths) == 0:
-        return None
-    exp_paths.sort(key=lambda x: x[1], reverse=True)
-    for exp_path, loop_id in exp_paths:
-        with open(exp_path, "rb") as f:
-            trace = pickle.load(f)
-            if trace.experiment_workspace.all_codes == sota_exp.experiment_workspace.all_codes:
-                sota_loop_id = loop_id
-                break
-
-    sota_mle_score_paths = [i for i in log_path.rglob(f"Loop_{sota_loop_id}/running/mle_score/**/*.pkl")]
-    if len(sota_mle_score_paths) == 0:
-        # sota exp is not evaluated by mle_score
-        return None
-    with sota_mle_score_paths[0].open("rb") as f:
-        sota_mle_score = extract_json(pickle.load(f))
-
-    sota_exp_stat = None
-    if sota_mle_score:  # sota exp's grade output
-        if sota_mle_score["gold_medal"]:
-            sota_exp_stat = "gold"
-        elif sota_mle_score["silver_medal"]:
-            sota_exp_stat = "silver"
-        elif sota_mle_score["bronze_medal"]:
-            sota_exp_stat = "bronze"
-        elif sota_mle_score["above_median"]:
-            sota_exp_stat = "above_median"
-        elif sota_mle_score["valid_submission"]:
-            sota_exp_stat = "valid_submission"
-        elif sota_mle_score["submission_exists"]:
-            sota_exp_stat = "made_submission"
-    return sota_exp_stat
-
-
-@cache_with_pickle(_log_path_hash_func, force=True)
 def load_times(log_path: Path):
-    try:
-        session_path = log_path / "__session__"
-        max_li = max(int(p.name) for p in session_path.iterdir() if p.is_dir() and p.name.isdigit())
-        max_step = max(int(p.name.split("_")[0]) for p in (session_path / str(max_li)).iterdir() if p.is_file())
-        rdloop_obj_p = next((session_path / str(max_li)).glob(f"{max_step}_*"))
-
-        rd_times = DataScienceRDLoop.load(rdloop_obj_p).loop_trace
-    except Exception as e:
-        rd_times = {}
-    return rd_times
+    return SessionIndex(db_path=UI_SETTING.session_index_path).loop_times(log_path)
 
 
-def _log_folders_summary_hash_func(log_folders: list[str], hours: int | None = None):
-    hash_str = ""
-    for lf in log_folders:
-        summary_p = Path(lf) / (f"summary.pkl" if hours is None else f"summary_{hours}h.pkl")
-        if summary_p.exists():
-            hash_str += str(summary_p) + str(summary_p.stat().st_mtime)
-        else:
-            hash_str += f"{summary_p} not exists"
-    return md5_hash(hash_str)
-
-
-@cache_with_pickle(_log_folders_summary_hash_func, force=True)
 def get_summary_df(log_folders: list[str], hours: int | None = None) -> tuple[dict, pd.DataFrame]:
     """Process experiment logs and generate summary DataFrame.
 
@@ -273,7 +182,9 @@ def get_summary_df(log_folders: list[str], hours: int | None = None) -> tuple[di
             coding_time = timedelta()
             running_time = timedelta()
             all_time = timedelta()
-            times_info = load_times(Path(lf) / k)
+            session_index = SessionIndex(db_path=UI_SETTING.session_index_path)
+            session_index.update(Path(lf) / k)
+            times_info = session_index.loop_times(Path(lf) / k, update=False)
             for time_info in times_info.values():
                 all_time += sum((ti.end - ti.start for ti in time_info), timedelta())
                 exp_gen_time += time_info[0].end - time_info[0].start
@@ -286,18 +197,8 @@ def get_summary_df(log_folders: list[str], hours: int | None = None) -> tuple[di
             v["coding_time"] = str(coding_time).split(".")[0]
             v["running_time"] = str(running_time).split(".")[0]
 
-            final_sota_exp = get_final_sota_exp(Path(lf) / k)
-
-            v["sota_exp_score_valid"] = None
-            if final_sota_exp is not None:
-                try:
-                    final_sota_result = final_sota_exp.result
-                except AttributeError:  # Compatible with old versions
-                    final_sota_result = final_sota_exp.__dict__["result"]
-                if final_sota_result is not None:
-                    v["sota_exp_score_valid"] = final_sota_result.loc["ensemble"].iloc[0]
-
-            v["sota_exp_stat_new"] = get_sota_exp_stat(Path(lf) / k)
+            v["sota_exp_score_valid"] = session_index.final_sota_score(Path(lf) / k, update=False)
+            v["sota_exp_stat_new"] = session_index.sota_exp_stat(Path(lf) / k, update=False)
             # change experiment name
             if "amlt" in lf:
                 summary[f"{lf[lf.rfind('amlt')+5:].split('/')[0]} - {k}"] = v
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import io
 import json
+import os
 import re
 import sqlite3
+import threading
 import time
 import tokenize
 import uuid
+import weakref
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, List, Optional, Tuple, cast
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple, cast
 
 import pytz
 from pydantic import BaseModel, TypeAdapter
@@ -127,82 +134,301 @@ class JSONParser:
         return json.dumps(obj)
 
 
+def validate_json_response(
+    response: str, json_target_type: Optional[Any] = None, response_format: Optional[Any] = None
+) -> None:
+    """Validate the json response against the target type and the response format (it raises if invalid)"""
+    if json_target_type is not None:
+        TypeAdapter(json_target_type).validate_json(response)
+    if response_format is not None:
+        if not isinstance(response_format, dict) and issubclass(response_format, BaseModel):
+            # It may raise TypeError if initialization fails
+            response_format(**json.loads(response))
+        else:
+            logger.warning(f"Unknown response_format: {response_format}, skipping validation.")
+
+
+class JSONStreamExtractor:
+    """
+    Extract the first complete JSON object (or array) from a response while it is streamed, in a single pass.
+
+    - The JSON value is the response itself (after an optional leading `<think>` block) or the content of a
+      ```json fence; the text before and after it is ignored. Otherwise the stream is read to the end.
+    - Python literals (`True`, `False`, `None`) outside strings are converted to JSON.
+    - The value is validated once as soon as it is complete, so an invalid response fails before the stream ends
+      and the rest of the stream doesn't need to be waited for.
+
+    If the extracted text is not valid JSON, `failed` is set and the caller falls back to `JSONParser`.
+    """
+
+    PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+    CLOSERS = {"{": "}", "[": "]"}
+    THINK_START, THINK_END = "<think>", "</think>"
+    FENCE_PATTERN = re.compile(r"```json\s*", re.IGNORECASE)
+
+    def __init__(self, json_target_type: Optional[Any] = None, response_format: Optional[Any] = None) -> None:
+        self.json_target_type = json_target_type
+        self.response_format = response_format
+        self.text = ""  # all the text fed
+        self.result: str | None = None  # the extracted JSON text
+        self.failed = False
+        self._pos: int | None = None  # the next position to scan; None before the JSON value starts
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._word = ""  # the bare word (e.g. `True`) being scanned
+        self._out: list[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None or self.failed
+
+    def _find_start(self) -> int | None:
+        """
+        The position where the JSON value starts: the first content after an optional think block, or the content
+        of a ```json fence. The brackets in other text (e.g. "in [0, 1]") are not the response.
+        """
+        stripped = self.text.lstrip()
+        if self.THINK_START.startswith(stripped[: len(self.THINK_START)]) and len(stripped) < len(self.THINK_START):
+            return None  # not sure whether it is a think block yet
+        offset = 0
+        if stripped.startswith(self.THINK_START):
+            end = self.text.find(self.THINK_END)
+            if end < 0:
+                return None
+            offset = end + len(self.THINK_END)
+        content = self.text[offset:].lstrip()
+        if content[:1] in ("{", "["):
+            return len(self.text) - len(content)
+        match = self.FENCE_PATTERN.search(self.text, offset)
+        if match is None or match.end() == len(self.text):
+            return None
+        if self.text[match.end()] not in "{[":
+            self.failed = True  # not an object or array; left to `JSONParser`
+            return None
+        return match.end()
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Feed a streamed chunk; return True when the JSON value is complete (or the extraction failed).
+        It raises if the complete value doesn't match the target type / response format.
+        """
+        self.text += chunk
+        if self.done:
+            return True
+        if self._pos is None and (pos := self._find_start()) is not None:
+            self._pos = pos
+        if self._pos is None:
+            return self.failed
+
+        text, out = self.text, self._out
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                out.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch.isalnum() or ch == "_":
+                self._word += ch
+                continue
+            if self._word:
+                out.append(self.PYTHON_LITERALS.get(self._word, self._word))
+                self._word = ""
+            out.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in self.CLOSERS:
+                self._stack.append(self.CLOSERS[ch])
+            elif ch in "}]":
+                if not self._stack or self._stack.pop() != ch:
+                    self.failed = True
+                    return True
+                if not self._stack:
+                    self._complete("".join(out))
+                    return True
+        self._pos = len(text)
+        return False
+
+    def _complete(self, result: str) -> None:
+        try:
+            json.loads(result)
+        except json.JSONDecodeError:
+            self.failed = True
+            return
+        validate_json_response(result, self.json_target_type, self.response_format)
+        self.result = result
+
+
+# The extractor of the chat completion being streamed in the current thread / coroutine
+_JSON_STREAM_EXTRACTOR: ContextVar[JSONStreamExtractor | None] = ContextVar("_JSON_STREAM_EXTRACTOR", default=None)
+
+
+def feed_json_stream(chunk: str) -> bool:
+    """
+    Feed a streamed chunk to the JSON extractor of the current call (if any).
+    Return True if the rest of the stream can be dropped because the JSON value is complete.
+    """
+    extractor = _JSON_STREAM_EXTRACTOR.get()
+    if extractor is None:
+        return False
+    return extractor.feed(chunk) and extractor.result is not None and LLM_SETTINGS.json_stream_early_stop
+
+
 class SQliteLazyCache(SingletonBaseClass):
+    """
+    A sqlite based cache for chat, embedding and session messages.
+
+    It is designed to be shared by multiple processes (e.g. `multiprocessing_wrapper` in CoSTEER):
+
+    - The database runs in WAL mode, so readers never block the writer and the writer never blocks readers.
+    - Each process lazily opens its own connection. A connection inherited through `fork` is never reused.
+    - Writes are buffered and committed in batches (`prompt_cache_write_batch_size` / `prompt_cache_flush_interval`),
+      so we don't pay a fsync for every insert. Pending writes are visible to `*_get` of the same process.
+    - Entries can be evicted by age (`prompt_cache_max_age_days`) and by size (`prompt_cache_max_entries`).
+    """
+
+    # table name -> (key column, value column)
+    TABLES: dict[str, tuple[str, str]] = {
+        "chat_cache": ("md5_key", "chat"),
+        "embedding_cache": ("md5_key", "embedding"),
+        "message_cache": ("conversation_id", "message"),
+    }
+    EVICT_EVERY_N_WRITES = 1000
+
     def __init__(self, cache_location: str) -> None:
+        if getattr(self, "cache_location", None) == cache_location:
+            # `__init__` is called every time the singleton is retrieved; keep the connection and pending writes.
+            return
         super().__init__()
         self.cache_location = cache_location
-        db_file_exist = Path(cache_location).exists()
-        # TODO: sqlite3 does not support multiprocessing.
-        self.conn = sqlite3.connect(cache_location, timeout=20)
-        self.c = self.conn.cursor()
-        if not db_file_exist:
-            self.c.execute(
-                """
-                CREATE TABLE chat_cache (
-                    md5_key TEXT PRIMARY KEY,
-                    chat TEXT
-                )
-                """,
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection | None = None
+        self._conn_pid: int | None = None
+        self._pending: dict[str, dict[str, tuple[str, float]]] = {table: {} for table in self.TABLES}
+        self._last_flush_time = time.time()
+        self._writes_since_evict = 0
+        atexit.register(self.flush)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection owned by current process"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            # The pending writes of the parent process belong to the parent process; they will be flushed there.
+            self._pending = {table: {} for table in self.TABLES}
+            self._conn = self._connect()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.cache_location, timeout=60, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table, (key_col, value_col) in self.TABLES.items():
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ({key_col} TEXT PRIMARY KEY, {value_col} TEXT, created_at REAL)"
             )
-            self.c.execute(
-                """
-                CREATE TABLE embedding_cache (
-                    md5_key TEXT PRIMARY KEY,
-                    embedding TEXT
+            # cache files created by older versions have no `created_at` column
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if "created_at" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN created_at REAL")
+                conn.execute(f"UPDATE {table} SET created_at = ?", (time.time(),))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+        conn.commit()
+        self._evict(conn)
+        return conn
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Remove the entries exceeding the age and size limitation"""
+        if LLM_SETTINGS.prompt_cache_max_age_days is not None:
+            expire_time = time.time() - LLM_SETTINGS.prompt_cache_max_age_days * 24 * 3600
+            for table in self.TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (expire_time,))
+        if LLM_SETTINGS.prompt_cache_max_entries is not None:
+            for table in self.TABLES:
+                (n_entries,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                if n_entries > LLM_SETTINGS.prompt_cache_max_entries:
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY created_at LIMIT ?)",
+                        (n_entries - LLM_SETTINGS.prompt_cache_max_entries,),
+                    )
+        conn.commit()
+        self._writes_since_evict = 0
+
+    def _get(self, table: str, key: str) -> str | None:
+        key_col, value_col = self.TABLES[table]
+        with self._lock:
+            conn = self.conn
+            if key in self._pending[table]:
+                return self._pending[table][key][0]
+            result = conn.execute(f"SELECT {value_col} FROM {table} WHERE {key_col}=?", (key,)).fetchone()
+        return None if result is None else cast(str, result[0])
+
+    def _set(self, table: str, key: str, value: str) -> None:
+        with self._lock:
+            _ = self.conn  # make sure the pending writes belong to current process
+            self._pending[table][key] = (value, time.time())
+            n_pending = sum(len(p) for p in self._pending.values())
+            if (
+                n_pending >= LLM_SETTINGS.prompt_cache_write_batch_size
+                or time.time() - self._last_flush_time >= LLM_SETTINGS.prompt_cache_flush_interval
+            ):
+                self.flush()
+
+    def flush(self) -> None:
+        """Commit all the pending writes of current process in a single transaction"""
+        with self._lock:
+            if self._conn is None or self._conn_pid != os.getpid():
+                return
+            n_written = 0
+            for table, pending in self._pending.items():
+                if not pending:
+                    continue
+                key_col, value_col = self.TABLES[table]
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({key_col}, {value_col}, created_at) VALUES (?, ?, ?)",
+                    [(key, value, created_at) for key, (value, created_at) in pending.items()],
                 )
-                """,
-            )
-            self.c.execute(
-                """
-                CREATE TABLE message_cache (
-                    conversation_id TEXT PRIMARY KEY,
-                    message TEXT
-                )
-                """,
-            )
-            self.conn.commit()
+                n_written += len(pending)
+                pending.clear()
+            self._conn.commit()
+            self._last_flush_time = time.time()
+            self._writes_since_evict += n_written
+            if self._writes_since_evict >= self.EVICT_EVERY_N_WRITES:
+                self._evict(self._conn)
+
+    @classmethod
+    def flush_all(cls) -> None:
+        """Flush all the cache instances in current process (e.g. before a subprocess exits)"""
+        for instance in list(cls._instance_dict.values()):
+            if isinstance(instance, cls):
+                instance.flush()
 
     def chat_get(self, key: str) -> str | None:
-        md5_key = md5_hash(key)
-        self.c.execute("SELECT chat FROM chat_cache WHERE md5_key=?", (md5_key,))
-        result = self.c.fetchone()
-        return None if result is None else result[0]
+        return self._get("chat_cache", md5_hash(key))
 
     def embedding_get(self, key: str) -> list | dict | str | None:
-        md5_key = md5_hash(key)
-        self.c.execute("SELECT embedding FROM embedding_cache WHERE md5_key=?", (md5_key,))
-        result = self.c.fetchone()
-        return None if result is None else json.loads(result[0])
+        result = self._get("embedding_cache", md5_hash(key))
+        return None if result is None else json.loads(result)
 
     def chat_set(self, key: str, value: str) -> None:
-        md5_key = md5_hash(key)
-        self.c.execute(
-            "INSERT OR REPLACE INTO chat_cache (md5_key, chat) VALUES (?, ?)",
-            (md5_key, value),
-        )
-        self.conn.commit()
+        self._set("chat_cache", md5_hash(key), value)
         return None
 
     def embedding_set(self, content_to_embedding_dict: dict) -> None:
         for key, value in content_to_embedding_dict.items():
-            md5_key = md5_hash(key)
-            self.c.execute(
-                "INSERT OR REPLACE INTO embedding_cache (md5_key, embedding) VALUES (?, ?)",
-                (md5_key, json.dumps(value)),
-            )
-        self.conn.commit()
+            self._set("embedding_cache", md5_hash(key), json.dumps(value))
 
     def message_get(self, conversation_id: str) -> list[dict[str, Any]]:
-        self.c.execute("SELECT message FROM message_cache WHERE conversation_id=?", (conversation_id,))
-        result = self.c.fetchone()
-        return [] if result is None else cast(list[dict[str, Any]], json.loads(result[0]))
+        result = self._get("message_cache", conversation_id)
+        return [] if result is None else cast(list[dict[str, Any]], json.loads(result))
 
     def message_set(self, conversation_id: str, message_value: list[dict[str, Any]]) -> None:
-        self.c.execute(
-            "INSERT OR REPLACE INTO message_cache (conversation_id, message) VALUES (?, ?)",
-            (conversation_id, json.dumps(message_value)),
-        )
-        self.conn.commit()
+        self._set("message_cache", conversation_id, json.dumps(message_value))
         return None
 
 
@@ -274,6 +500,69 @@ class ChatSession:
         pass
 
 
+class AsyncTokenBucket:
+    """
+    A token bucket for asyncio; `rate` tokens are refilled per second and at most `capacity` tokens are kept.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMConcurrencyLimiter:
+    """
+    Process-wide limitation of the concurrent async LLM calls for each model.
+
+    - At most `llm_max_concurrency` calls of a model are in flight at the same time.
+    - At most `llm_requests_per_minute` calls of a model are started per minute (if it is set).
+    """
+
+    def __init__(self) -> None:
+        # asyncio.Semaphore is bound to the event loop that first uses it, so we keep one per (loop, model);
+        # they are dropped with their loop
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._buckets: dict[str, AsyncTokenBucket] = {}
+
+    def get_semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if model not in semaphores:
+            semaphores[model] = asyncio.Semaphore(LLM_SETTINGS.llm_max_concurrency)
+        return semaphores[model]
+
+    def get_bucket(self, model: str) -> AsyncTokenBucket | None:
+        if LLM_SETTINGS.llm_requests_per_minute is None:
+            return None
+        if model not in self._buckets:
+            rate = LLM_SETTINGS.llm_requests_per_minute / 60
+            self._buckets[model] = AsyncTokenBucket(rate=rate, capacity=max(1.0, rate))
+        return self._buckets[model]
+
+    @asynccontextmanager
+    async def limit(self, model: str) -> AsyncIterator[None]:
+        async with self.get_semaphore(model):
+            if (bucket := self.get_bucket(model)) is not None:
+                await bucket.acquire()
+            yield
+
+
+LLM_CONCURRENCY_LIMITER = LLMConcurrencyLimiter()
+
+
 class APIBackend(ABC):
     """
     Abstract base class for LLM API backends
@@ -421,6 +710,56 @@ class APIBackend(ABC):
             return resp[0]  # type: ignore[return-value]
         return resp  # type: ignore[return-value]
 
+    async def abuild_messages_and_create_chat_completion(  # type: ignore[no-untyped-def]
+        self,
+        user_prompt: str,
+        system_prompt: str | None = None,
+        former_messages: list | None = None,
+        chat_cache_prefix: str = "",
+        shrink_multiple_break: bool = False,
+        *args,
+        **kwargs,
+    ) -> str:
+        """
+        The asyncio version of `build_messages_and_create_chat_completion`.
+        The concurrency of each model is bounded by `llm_max_concurrency` and `llm_requests_per_minute`.
+        """
+        if former_messages is None:
+            former_messages = []
+        messages = self._build_messages(
+            user_prompt,
+            system_prompt,
+            former_messages,
+            shrink_multiple_break=shrink_multiple_break,
+        )
+
+        resp = await self._atry_create_chat_completion_or_embedding(  # type: ignore[misc]
+            *args,
+            messages=messages,
+            chat_completion=True,
+            chat_cache_prefix=chat_cache_prefix,
+            **kwargs,
+        )
+        if isinstance(resp, list):
+            raise ValueError("The response of _atry_create_chat_completion_or_embedding should be a string.")
+        logger.log_object({"system": system_prompt, "user": user_prompt, "resp": resp}, tag="debug_llm")
+        return resp
+
+    async def acreate_embedding(  # type: ignore[no-untyped-def]
+        self, input_content: str | list[str], *args, **kwargs
+    ) -> list[float] | list[list[float]]:
+        """The asyncio version of `create_embedding`"""
+        input_content_list = [input_content] if isinstance(input_content, str) else input_content
+        resp = await self._atry_create_chat_completion_or_embedding(  # type: ignore[misc]
+            input_content_list=input_content_list,
+            embedding=True,
+            *args,
+            **kwargs,
+        )
+        if isinstance(input_content, str):
+            return resp[0]  # type: ignore[return-value]
+        return resp  # type: ignore[return-value]
+
     def build_messages_and_calculate_token(
         self,
         user_prompt: str,
@@ -447,8 +786,7 @@ class APIBackend(ABC):
         """This function to share operation between embedding and chat completion"""
         assert not (chat_completion and embedding), "chat_completion and embedding cannot be True at the same time"
         max_retry = LLM_SETTINGS.max_retry if LLM_SETTINGS.max_retry is not None else max_retry
-        timeout_count = 0
-        violation_count = 0
+        fail_counts = {"timeout": 0, "violation": 0}
         for i in range(max_retry):
             API_start_time = datetime.now()
             try:
@@ -457,54 +795,39 @@ class APIBackend(ABC):
                 if chat_completion:
                     return self._create_chat_completion_auto_continue(*args, **kwargs)
             except Exception as e:  # noqa: BLE001
-                if hasattr(e, "message") and (
-                    "'messages' must contain the word 'json' in some form" in e.message
-                    or "\\'messages\\' must contain the word \\'json\\' in some form" in e.message
-                ):
-                    kwargs["add_json_in_prompt"] = True
-                elif hasattr(e, "message") and embedding and "maximum context length" in e.message:
-                    kwargs["input_content_list"] = [
-                        content[: len(content) // 2] for content in kwargs.get("input_content_list", [])
-                    ]
-                else:
-                    RD_Agent_TIMER_wrapper.api_fail_count += 1
-                    RD_Agent_TIMER_wrapper.latest_api_fail_time = datetime.now(pytz.timezone("Asia/Shanghai"))
-
-                    if (
-                        openai_imported
-                        and isinstance(e, litellm.BadRequestError)
-                        and (
-                            isinstance(e.__cause__, litellm.ContentPolicyViolationError)
-                            or "The response was filtered due to the prompt triggering Azure OpenAI's content management policy"
-                            in str(e)
-                        )
-                    ):
-                        violation_count += 1
-                        if violation_count >= LLM_SETTINGS.violation_fail_limit:
-                            logger.warning("Content policy violation detected.")
-                            raise PolicyError(e)
-
-                    if (
-                        openai_imported
-                        and isinstance(e, openai.APITimeoutError)
-                        or (
-                            isinstance(e, openai.APIError)
-                            and hasattr(e, "message")
-                            and "Your resource has been temporarily blocked because we detected behavior that may violate our content policy."
-                            in e.message
-                        )
-                    ):
-                        timeout_count += 1
-                        if timeout_count >= LLM_SETTINGS.timeout_fail_limit:
-                            logger.warning("Timeout error, please check your network connection.")
-                            raise e
-
-                    recommended_wait_seconds = self.retry_wait_seconds
-                    if openai_imported and isinstance(e, openai.RateLimitError) and hasattr(e, "message"):
-                        match = re.search(r"Please retry after (\d+) seconds\.", e.message)
-                        if match:
-                            recommended_wait_seconds = int(match.group(1))
-                    time.sleep(recommended_wait_seconds)
+                wait_seconds = self._handle_retry_error(e, embedding=embedding, fail_counts=fail_counts, kwargs=kwargs)
+                if wait_seconds is not None:
+                    time.sleep(wait_seconds)
+                    if RD_Agent_TIMER_wrapper.timer.started and not isinstance(e, json.decoder.JSONDecodeError):
+                        RD_Agent_TIMER_wrapper.timer.add_duration(datetime.now() - API_start_time)
+                logger.warning(str(e))
+                logger.warning(f"Retrying {i+1}th time...")
+        error_message = f"Failed to create chat completion after {max_retry} retries."
+        raise RuntimeError(error_message)
+
+    async def _atry_create_chat_completion_or_embedding(  # type: ignore[no-untyped-def]
+        self,
+        max_retry: int = 10,
+        chat_completion: bool = False,
+        embedding: bool = False,
+        *args,
+        **kwargs,
+    ) -> str | list[list[float]]:
+        """The asyncio version of `_try_create_chat_completion_or_embedding`; it never blocks the event loop."""
+        assert not (chat_completion and embedding), "chat_completion and embedding cannot be True at the same time"
+        max_retry = LLM_SETTINGS.max_retry if LLM_SETTINGS.max_retry is not None else max_retry
+        fail_counts = {"timeout": 0, "violation": 0}
+        for i in range(max_retry):
+            API_start_time = datetime.now()
+            try:
+                if embedding:
+                    return await self._acreate_embedding_with_cache(*args, **kwargs)
+                if chat_completion:
+                    return await self._acreate_chat_completion_auto_continue(*args, **kwargs)
+            except Exception as e:  # noqa: BLE001
+                wait_seconds = self._handle_retry_error(e, embedding=embedding, fail_counts=fail_counts, kwargs=kwargs)
+                if wait_seconds is not None:
+                    await asyncio.sleep(wait_seconds)
                     if RD_Agent_TIMER_wrapper.timer.started and not isinstance(e, json.decoder.JSONDecodeError):
                         RD_Agent_TIMER_wrapper.timer.add_duration(datetime.now() - API_start_time)
                 logger.warning(str(e))
@@ -512,6 +835,70 @@ class APIBackend(ABC):
         error_message = f"Failed to create chat completion after {max_retry} retries."
         raise RuntimeError(error_message)
 
+    def _handle_retry_error(
+        self, e: Exception, embedding: bool, fail_counts: dict[str, int], kwargs: dict[str, Any]
+    ) -> float | None:
+        """
+        Decide how to retry after a failed API call.
+
+        It may update `kwargs` in place to fix the next call, and it raises if the error should not be retried.
+
+        Returns
+        -------
+        float | None
+            The seconds to wait before retrying; None if we can retry immediately.
+        """
+        if hasattr(e, "message") and (
+            "'messages' must contain the word 'json' in some form" in e.message
+            or "\\'messages\\' must contain the word \\'json\\' in some form" in e.message
+        ):
+            kwargs["add_json_in_prompt"] = True
+            return None
+        if hasattr(e, "message") and embedding and "maximum context length" in e.message:
+            kwargs["input_content_list"] = [
+                content[: len(content) // 2] for content in kwargs.get("input_content_list", [])
+            ]
+            return None
+
+        RD_Agent_TIMER_wrapper.api_fail_count += 1
+        RD_Agent_TIMER_wrapper.latest_api_fail_time = datetime.now(pytz.timezone("Asia/Shanghai"))
+
+        if (
+            openai_imported
+            and isinstance(e, litellm.BadRequestError)
+            and (
+                isinstance(e.__cause__, litellm.ContentPolicyViolationError)
+                or "The response was filtered due to the prompt triggering Azure OpenAI's content management policy"
+                in str(e)
+            )
+        ):
+            fail_counts["violation"] += 1
+            if fail_counts["violation"] >= LLM_SETTINGS.violation_fail_limit:
+                logger.warning("Content policy violation detected.")
+                raise PolicyError(e)
+
+        if (
+            openai_imported
+            and isinstance(e, openai.APITimeoutError)
+            or (
+                isinstance(e, openai.APIError)
+                and hasattr(e, "message")
+                and "Your resource has been temporarily blocked because we detected behavior that may violate our content policy."
+                in e.message
+            )
+        ):
+            fail_counts["timeout"] += 1
+            if fail_counts["timeout"] >= LLM_SETTINGS.timeout_fail_limit:
+                logger.warning("Timeout error, please check your network connection.")
+                raise e
+
+        recommended_wait_seconds: float = self.retry_wait_seconds
+        if openai_imported and isinstance(e, openai.RateLimitError) and hasattr(e, "message"):
+            match = re.search(r"Please retry after (\d+) seconds\.", e.message)
+            if match:
+                recommended_wait_seconds = int(match.group(1))
+        return recommended_wait_seconds
+
     def _add_json_in_prompt(self, messages: list[dict[str, Any]]) -> None:
         """
         add json related content in the prompt if add_json_in_prompt is True
@@ -522,6 +909,58 @@ class APIBackend(ABC):
                 # NOTE: assumption: systemprompt is always the first message
                 break
 
+    def _get_chat_cache_key(
+        self, messages: list[dict[str, Any]], chat_cache_prefix: str = "", seed: Optional[int] = None
+    ) -> str:
+        if seed is None and LLM_SETTINGS.use_auto_chat_cache_seed_gen:
+            seed = LLM_CACHE_SEED_GEN.get_next_seed()
+        input_content_json = json.dumps(messages)
+        return (
+            chat_cache_prefix + input_content_json + f"<seed={seed}/>"
+        )  # FIXME this is a hack to make sure the cache represents the round index
+
+    def _get_cached_chat_response(self, messages: list[dict[str, Any]], input_content_json: str) -> str | None:
+        if not self.use_chat_cache:
+            return None
+        cache_result = self.cache.chat_get(input_content_json)
+        if cache_result is not None and LLM_SETTINGS.log_llm_chat_content:
+            logger.info(self._build_log_messages(messages), tag="llm_messages")
+            logger.info(f"{LogColors.CYAN}Response:{cache_result}{LogColors.END}", tag="llm_messages")
+        return cache_result
+
+    def _finalize_chat_response(
+        self,
+        all_response: str,
+        input_content_json: str,
+        json_mode: bool = False,
+        json_target_type: Optional[str] = None,
+        json_stream: JSONStreamExtractor | None = None,
+        **kwargs: Any,
+    ) -> str:
+        """Refine, check the format of and cache the full response"""
+        if json_mode:
+            # the response may not be streamed (or fed) to the extractor
+            json_stream = json_stream or JSONStreamExtractor(json_target_type, kwargs.get("response_format"))
+            if not json_stream.done:
+                json_stream.feed(all_response[len(json_stream.text) :])
+
+        # 2) refine the response and return
+        if LLM_SETTINGS.reasoning_think_rm:
+            match = re.search(r"<think>(.*?)</think>(.*)", all_response, re.DOTALL)
+            _, all_response = match.groups() if match else ("", all_response)
+
+        # 3) format checking
+        if json_mode and json_stream is not None and json_stream.result is not None:
+            all_response = json_stream.result  # extracted and validated already
+        else:
+            if json_mode:
+                parser = JSONParser()
+                all_response = parser.parse(all_response)
+            validate_json_response(all_response, json_target_type, kwargs.get("response_format"))
+        if self.dump_chat_cache:
+            self.cache.chat_set(input_content_json, all_response)
+        return all_response
+
     def _create_chat_completion_auto_continue(
         self,
         messages: list[dict[str, Any]],
@@ -537,65 +976,94 @@ class APIBackend(ABC):
         """
 
         # 0) return directly if cache is hit
-        if seed is None and LLM_SETTINGS.use_auto_chat_cache_seed_gen:
-            seed = LLM_CACHE_SEED_GEN.get_next_seed()
-        input_content_json = json.dumps(messages)
-        input_content_json = (
-            chat_cache_prefix + input_content_json + f"<seed={seed}/>"
-        )  # FIXME this is a hack to make sure the cache represents the round index
-        if self.use_chat_cache:
-            cache_result = self.cache.chat_get(input_content_json)
-            if cache_result is not None:
-                if LLM_SETTINGS.log_llm_chat_content:
-                    logger.info(self._build_log_messages(messages), tag="llm_messages")
-                    logger.info(f"{LogColors.CYAN}Response:{cache_result}{LogColors.END}", tag="llm_messages")
-                return cache_result
+        input_content_json = self._get_chat_cache_key(messages, chat_cache_prefix, seed)
+        if (cache_result := self._get_cached_chat_response(messages, input_content_json)) is not None:
+            return cache_result
 
         # 1) get a full response
         all_response = ""
         new_messages = deepcopy(messages)
-        # Loop to get a full response
-        try_n = 6
-        for _ in range(try_n):  # for some long code, 3 times may not enough for reasoning models
-            if json_mode and add_json_in_prompt:
-                self._add_json_in_prompt(new_messages)
-            response, finish_reason = self._create_chat_completion_inner_function(
-                messages=new_messages,
-                json_mode=json_mode,
-                **kwargs,
-            )
-            all_response += response
-            if finish_reason is None or finish_reason != "length":
-                break  # we get a full response now.
-            new_messages.append({"role": "assistant", "content": response})
-        else:
-            raise RuntimeError(f"Failed to continue the conversation after {try_n} retries.")
+        # the JSON value is extracted (and validated) while the response is streamed
+        json_stream = JSONStreamExtractor(json_target_type, kwargs.get("response_format")) if json_mode else None
+        token = _JSON_STREAM_EXTRACTOR.set(json_stream)
+        try:
+            # Loop to get a full response
+            try_n = 6
+            for _ in range(try_n):  # for some long code, 3 times may not enough for reasoning models
+                if json_mode and add_json_in_prompt:
+                    self._add_json_in_prompt(new_messages)
+                response, finish_reason = self._create_chat_completion_inner_function(
+                    messages=new_messages,
+                    json_mode=json_mode,
+                    **kwargs,
+                )
+                all_response += response
+                if finish_reason is None or finish_reason != "length":
+                    break  # we get a full response now.
+                new_messages.append({"role": "assistant", "content": response})
+            else:
+                raise RuntimeError(f"Failed to continue the conversation after {try_n} retries.")
+        finally:
+            _JSON_STREAM_EXTRACTOR.reset(token)
+
+        return self._finalize_chat_response(
+            all_response,
+            input_content_json,
+            json_mode=json_mode,
+            json_target_type=json_target_type,
+            json_stream=json_stream,
+            **kwargs,
+        )
 
-        # 2) refine the response and return
-        if LLM_SETTINGS.reasoning_think_rm:
-            match = re.search(r"<think>(.*?)</think>(.*)", all_response, re.DOTALL)
-            _, all_response = match.groups() if match else ("", all_response)
+    async def _acreate_chat_completion_auto_continue(
+        self,
+        messages: list[dict[str, Any]],
+        json_mode: bool = False,
+        chat_cache_prefix: str = "",
+        seed: Optional[int] = None,
+        json_target_type: Optional[str] = None,
+        add_json_in_prompt: bool = False,
+        **kwargs: Any,
+    ) -> str:
+        """The asyncio version of `_create_chat_completion_auto_continue`"""
+        input_content_json = self._get_chat_cache_key(messages, chat_cache_prefix, seed)
+        if (cache_result := self._get_cached_chat_response(messages, input_content_json)) is not None:
+            return cache_result
 
-        # 3) format checking
-        if json_mode:
-            parser = JSONParser()
-            all_response = parser.parse(all_response)
-
-        if json_target_type is not None:
-            TypeAdapter(json_target_type).validate_json(all_response)
-        if (response_format := kwargs.get("response_format")) is not None:
-            if not isinstance(response_format, dict) and issubclass(response_format, BaseModel):
-                # It may raise TypeError if initialization fails
-                response_format(**json.loads(all_response))
+        all_response = ""
+        new_messages = deepcopy(messages)
+        json_stream = JSONStreamExtractor(json_target_type, kwargs.get("response_format")) if json_mode else None
+        token = _JSON_STREAM_EXTRACTOR.set(json_stream)
+        try:
+            try_n = 6
+            for _ in range(try_n):
+                if json_mode and add_json_in_prompt:
+                    self._add_json_in_prompt(new_messages)
+                response, finish_reason = await self._acreate_chat_completion_inner_function(
+                    messages=new_messages,
+                    json_mode=json_mode,
+                    **kwargs,
+                )
+                all_response += response
+                if finish_reason is None or finish_reason != "length":
+                    break
+                new_messages.append({"role": "assistant", "content": response})
             else:
-                logger.warning(f"Unknown response_format: {response_format}, skipping validation.")
-        if self.dump_chat_cache:
-            self.cache.chat_set(input_content_json, all_response)
-        return all_response
+                raise RuntimeError(f"Failed to continue the conversation after {try_n} retries.")
+        finally:
+            _JSON_STREAM_EXTRACTOR.reset(token)
+
+        return self._finalize_chat_response(
+            all_response,
+            input_content_json,
+            json_mode=json_mode,
+            json_target_type=json_target_type,
+            json_stream=json_stream,
+            **kwargs,
+        )
 
-    def _create_embedding_with_cache(
-        self, input_content_list: list[str], *args: Any, **kwargs: Any
-    ) -> list[list[float]]:
+    def _split_cached_embeddings(self, input_content_list: list[str]) -> tuple[dict[str, Any], list[str]]:
+        """Return the embeddings hit in the cache and the contents that still need to be embedded"""
         content_to_embedding_dict = {}
         filtered_input_content_list = []
         if self.use_embedding_cache:
@@ -607,6 +1075,12 @@ class APIBackend(ABC):
                     filtered_input_content_list.append(content)
         else:
             filtered_input_content_list = input_content_list
+        return content_to_embedding_dict, filtered_input_content_list
+
+    def _create_embedding_with_cache(
+        self, input_content_list: list[str], *args: Any, **kwargs: Any
+    ) -> list[list[float]]:
+        content_to_embedding_dict, filtered_input_content_list = self._split_cached_embeddings(input_content_list)
 
         if len(filtered_input_content_list) > 0:
             resp = self._create_embedding_inner_function(input_content_list=filtered_input_content_list)
@@ -614,7 +1088,20 @@ class APIBackend(ABC):
                 content_to_embedding_dict[filtered_input_content_list[index]] = data
             if self.dump_embedding_cache:
                 self.cache.embedding_set(content_to_embedding_dict)
-        return [content_to_embedding_dict[content] for content in input_content_list]  # type: ignore[misc]
+        return [content_to_embedding_dict[content] for content in input_content_list]
+
+    async def _acreate_embedding_with_cache(
+        self, input_content_list: list[str], *args: Any, **kwargs: Any
+    ) -> list[list[float]]:
+        content_to_embedding_dict, filtered_input_content_list = self._split_cached_embeddings(input_content_list)
+
+        if len(filtered_input_content_list) > 0:
+            resp = await self._acreate_embedding_inner_function(input_content_list=filtered_input_content_list)
+            for index, data in enumerate(resp):
+                content_to_embedding_dict[filtered_input_content_list[index]] = data
+            if self.dump_embedding_cache:
+                self.cache.embedding_set(content_to_embedding_dict)
+        return [content_to_embedding_dict[content] for content in input_content_list]
 
     @abstractmethod
     def support_function_calling(self) -> bool:
@@ -640,7 +1127,7 @@ class APIBackend(ABC):
         raise NotImplementedError("Subclasses must implement this method")
 
     @abstractmethod
-    def _create_chat_completion_inner_function(  # type: ignore[no-untyped-def] # noqa: C901, PLR0912, PLR0915
+    def _create_chat_completion_inner_function(  # type: ignore[no-untyped-def]
         self,
         messages: list[dict[str, Any]],
         json_mode: bool = False,
@@ -651,3 +1138,31 @@ class APIBackend(ABC):
         Call the chat completion function
         """
         raise NotImplementedError("Subclasses must implement this method")
+
+    async def _acreate_embedding_inner_function(  # type: ignore[no-untyped-def]
+        self, input_content_list: list[str], *args, **kwargs
+    ) -> list[list[float]]:
+        """
+        The asyncio version of `_create_embedding_inner_function`.
+        Backends without a native async client fall back to running the sync call in a thread.
+        """
+        model = LLM_SETTINGS.embedding_model
+        async with LLM_CONCURRENCY_LIMITER.limit(model):
+            return await asyncio.to_thread(self._create_embedding_inner_function, input_content_list, *args, **kwargs)
+
+    async def _acreate_chat_completion_inner_function(  # type: ignore[no-untyped-def]
+        self,
+        messages: list[dict[str, Any]],
+        json_mode: bool = False,
+        *args,
+        **kwargs,
+    ) -> tuple[str, str | None]:
+        """
+        The asyncio version of `_create_chat_completion_inner_function`.
+        Backends without a native async client fall back to running the sync call in a thread.
+        """
+        model = LLM_SETTINGS.chat_model
+        async with LLM_CONCURRENCY_LIMITER.limit(model):
+            return await asyncio.to_thread(
+                self._create_chat_completion_inner_function, messages, json_mode, *args, **kwargs
+            )
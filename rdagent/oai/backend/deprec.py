@@ -27,7 +27,7 @@ from rdagent.utils import md5_hash
 
 DEFAULT_QLIB_DOT_PATH = Path("./")
 
-from rdagent.oai.backend.base import APIBackend
+from rdagent.oai.backend.base import APIBackend, feed_json_stream
 
 try:
     from azure.identity import DefaultAzureCredential, get_bearer_token_provider
@@ -392,6 +392,9 @@ class DeprecBackend(APIBackend):
                     resp += content
                     if len(chunk.choices) > 0 and chunk.choices[0].finish_reason is not None:
                         finish_reason = chunk.choices[0].finish_reason
+                    if feed_json_stream(content):
+                        finish_reason = "stop"  # the JSON value is complete, the rest is not needed
+                        break
             else:
                 response = cast(ChatCompletion, response)
                 resp = response.choices[0].message.content
@@ -441,6 +444,9 @@ class DeprecBackend(APIBackend):
                     resp += content
                     if len(chunk.choices) > 0 and chunk.choices[0].finish_reason is not None:
                         finish_reason = chunk.choices[0].finish_reason
+                    if feed_json_stream(content):
+                        finish_reason = "stop"  # the JSON value is complete, the rest is not needed
+                        break
 
                 if LLM_SETTINGS.log_llm_chat_content:
                     logger.info("\n", raw=True, tag="llm_messages")
@@ -4,6 +4,8 @@ from typing import Any, Literal, cast
 import numpy as np
 from litellm import (
     BadRequestError,
+    acompletion,
+    aembedding,
     completion,
     completion_cost,
     embedding,
@@ -14,7 +16,11 @@ from litellm import (
 
 from rdagent.log import LogColors
 from rdagent.log import rdagent_logger as logger
-from rdagent.oai.backend.base import APIBackend
+from rdagent.oai.backend.base import (
+    LLM_CONCURRENCY_LIMITER,
+    APIBackend,
+    feed_json_stream,
+)
 from rdagent.oai.llm_conf import LLMSettings
 
 
@@ -67,13 +73,7 @@ class LiteLLMAPIBackend(APIBackend):
         """
         Call the embedding function
         """
-        model_name = LITELLM_SETTINGS.embedding_model
-        logger.info(f"{LogColors.GREEN}Using emb model{LogColors.END} {model_name}", tag="debug_litellm_emb")
-        if LITELLM_SETTINGS.log_llm_chat_content:
-            logger.info(
-                f"{LogColors.MAGENTA}Creating embedding{LogColors.END} for: {input_content_list}",
-                tag="debug_litellm_emb",
-            )
+        model_name = self._prepare_embedding(input_content_list)
         response = embedding(
             model=model_name,
             input=input_content_list,
@@ -83,15 +83,39 @@ class LiteLLMAPIBackend(APIBackend):
         response_list = [data["embedding"] for data in response.data]
         return response_list
 
-    def _create_chat_completion_inner_function(  # type: ignore[no-untyped-def] # noqa: C901, PLR0912, PLR0915
-        self,
-        messages: list[dict[str, Any]],
-        json_mode: bool = False,
-        *args,
-        **kwargs,
-    ) -> tuple[str, str | None]:
+    async def _acreate_embedding_inner_function(
+        self, input_content_list: list[str], *args: Any, **kwargs: Any
+    ) -> list[list[float]]:  # noqa: ARG002
         """
-        Call the chat completion function
+        Call the embedding function with litellm's native async client
+        """
+        model_name = self._prepare_embedding(input_content_list)
+        async with LLM_CONCURRENCY_LIMITER.limit(model_name):
+            response = await aembedding(
+                model=model_name,
+                input=input_content_list,
+                *args,
+                **kwargs,
+            )
+        response_list = [data["embedding"] for data in response.data]
+        return response_list
+
+    def _prepare_embedding(self, input_content_list: list[str]) -> str:
+        """Log the embedding request and return the model name"""
+        model_name = LITELLM_SETTINGS.embedding_model
+        logger.info(f"{LogColors.GREEN}Using emb model{LogColors.END} {model_name}", tag="debug_litellm_emb")
+        if LITELLM_SETTINGS.log_llm_chat_content:
+            logger.info(
+                f"{LogColors.MAGENTA}Creating embedding{LogColors.END} for: {input_content_list}",
+                tag="debug_litellm_emb",
+            )
+        return model_name
+
+    def _prepare_chat_completion(
+        self, messages: list[dict[str, Any]], json_mode: bool, kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """
+        Build the arguments of litellm's `completion`/`acompletion` (`kwargs` is updated in place).
         """
         if json_mode and supports_response_schema(model=LITELLM_SETTINGS.chat_model):
             kwargs["response_format"] = {"type": "json_object"}
@@ -124,7 +148,7 @@ class LiteLLMAPIBackend(APIBackend):
                         else:
                             reasoning_effort = None
                     break
-        response = completion(
+        return dict(
             model=model,
             messages=messages,
             stream=LITELLM_SETTINGS.chat_stream,
@@ -134,38 +158,30 @@ class LiteLLMAPIBackend(APIBackend):
             max_retries=0,
             **kwargs,
         )
-        logger.info(f"{LogColors.GREEN}Using chat model{LogColors.END} {model}", tag="llm_messages")
 
-        if LITELLM_SETTINGS.chat_stream:
-            if LITELLM_SETTINGS.log_llm_chat_content:
-                logger.info(f"{LogColors.BLUE}assistant:{LogColors.END}", tag="llm_messages")
-            content = ""
-            finish_reason = None
-            for message in response:
-                if message["choices"][0]["finish_reason"]:
-                    finish_reason = message["choices"][0]["finish_reason"]
-                if "content" in message["choices"][0]["delta"]:
-                    chunk = (
-                        message["choices"][0]["delta"]["content"] or ""
-                    )  # when finish_reason is "stop", content is None
-                    content += chunk
-                    if LITELLM_SETTINGS.log_llm_chat_content:
-                        logger.info(LogColors.CYAN + chunk + LogColors.END, raw=True, tag="llm_messages")
+    @staticmethod
+    def _handle_stream_chunk(message: Any) -> tuple[str, str | None]:
+        """Return the content and the finish reason of a streamed chunk"""
+        chunk = ""
+        if "content" in message["choices"][0]["delta"]:
+            chunk = message["choices"][0]["delta"]["content"] or ""  # when finish_reason is "stop", content is None
             if LITELLM_SETTINGS.log_llm_chat_content:
-                logger.info("\n", raw=True, tag="llm_messages")
-        else:
-            content = str(response.choices[0].message.content)
-            finish_reason = response.choices[0].finish_reason
-            finish_reason_str = (
-                f"({LogColors.RED}Finish reason: {finish_reason}{LogColors.END})"
-                if finish_reason and finish_reason != "stop"
-                else ""
-            )
-            if LITELLM_SETTINGS.log_llm_chat_content:
-                logger.info(
-                    f"{LogColors.BLUE}assistant:{LogColors.END} {finish_reason_str}\n{content}", tag="llm_messages"
-                )
+                logger.info(LogColors.CYAN + chunk + LogColors.END, raw=True, tag="llm_messages")
+        return chunk, message["choices"][0]["finish_reason"]
+
+    def _handle_full_response(self, response: Any) -> tuple[str, str | None]:
+        content = str(response.choices[0].message.content)
+        finish_reason = response.choices[0].finish_reason
+        finish_reason_str = (
+            f"({LogColors.RED}Finish reason: {finish_reason}{LogColors.END})"
+            if finish_reason and finish_reason != "stop"
+            else ""
+        )
+        if LITELLM_SETTINGS.log_llm_chat_content:
+            logger.info(f"{LogColors.BLUE}assistant:{LogColors.END} {finish_reason_str}\n{content}", tag="llm_messages")
+        return content, finish_reason
 
+    def _log_cost(self, model: str, messages: list[dict[str, Any]], content: str, finish_reason: str | None) -> None:
         global ACC_COST
         try:
             cost = completion_cost(model=model, messages=messages, completion=content)
@@ -190,6 +206,76 @@ class LiteLLMAPIBackend(APIBackend):
             },
             tag="token_cost",
         )
+
+    def _create_chat_completion_inner_function(  # type: ignore[no-untyped-def] # noqa: C901, PLR0912, PLR0915
+        self,
+        messages: list[dict[str, Any]],
+        json_mode: bool = False,
+        *args,
+        **kwargs,
+    ) -> tuple[str, str | None]:
+        """
+        Call the chat completion function
+        """
+        completion_kwargs = self._prepare_chat_completion(messages, json_mode, kwargs)
+        model = completion_kwargs["model"]
+        response = completion(**completion_kwargs)
+        logger.info(f"{LogColors.GREEN}Using chat model{LogColors.END} {model}", tag="llm_messages")
+
+        if LITELLM_SETTINGS.chat_stream:
+            if LITELLM_SETTINGS.log_llm_chat_content:
+                logger.info(f"{LogColors.BLUE}assistant:{LogColors.END}", tag="llm_messages")
+            content = ""
+            finish_reason = None
+            for message in response:
+                chunk, chunk_finish_reason = self._handle_stream_chunk(message)
+                content += chunk
+                finish_reason = chunk_finish_reason or finish_reason
+                if feed_json_stream(chunk):
+                    finish_reason = "stop"  # the JSON value is complete, the rest is not needed
+                    break
+            if LITELLM_SETTINGS.log_llm_chat_content:
+                logger.info("\n", raw=True, tag="llm_messages")
+        else:
+            content, finish_reason = self._handle_full_response(response)
+
+        self._log_cost(model, messages, content, finish_reason)
+        return content, finish_reason
+
+    async def _acreate_chat_completion_inner_function(  # type: ignore[no-untyped-def]
+        self,
+        messages: list[dict[str, Any]],
+        json_mode: bool = False,
+        *args,
+        **kwargs,
+    ) -> tuple[str, str | None]:
+        """
+        Call the chat completion function with litellm's native async client
+        """
+        completion_kwargs = self._prepare_chat_completion(messages, json_mode, kwargs)
+        model = completion_kwargs["model"]
+        async with LLM_CONCURRENCY_LIMITER.limit(model):
+            response = await acompletion(**completion_kwargs)
+            logger.info(f"{LogColors.GREEN}Using chat model{LogColors.END} {model}", tag="llm_messages")
+
+            if LITELLM_SETTINGS.chat_stream:
+                if LITELLM_SETTINGS.log_llm_chat_content:
+                    logger.info(f"{LogColors.BLUE}assistant:{LogColors.END}", tag="llm_messages")
+                content = ""
+                finish_reason = None
+                async for message in response:
+                    chunk, chunk_finish_reason = self._handle_stream_chunk(message)
+                    content += chunk
+                    finish_reason = chunk_finish_reason or finish_reason
+                    if feed_json_stream(chunk):
+                        finish_reason = "stop"  # the JSON value is complete, the rest is not needed
+                        break
+                if LITELLM_SETTINGS.log_llm_chat_content:
+                    logger.info("\n", raw=True, tag="llm_messages")
+            else:
+                content, finish_reason = self._handle_full_response(response)
+
+        self._log_cost(model, messages, content, finish_reason)
         return content, finish_reason
 
     def support_function_calling(self) -> bool:
@@ -46,9 +46,21 @@ class LLMSettings(ExtendedBaseSettings):
     dump_embedding_cache: bool = False
     use_embedding_cache: bool = False
     prompt_cache_path: str = str(Path.cwd() / "prompt_cache.db")
+    prompt_cache_write_batch_size: int = 32
+    """The number of buffered cache writes that triggers a commit"""
+    prompt_cache_flush_interval: float = 5.0
+    """The maximum seconds a cache write is buffered before it is committed"""
+    prompt_cache_max_entries: int | None = None
+    """The maximum number of entries kept in each cache table; the oldest entries are evicted first"""
+    prompt_cache_max_age_days: float | None = None
+    """Cache entries older than this are evicted"""
     max_past_message_include: int = 10
     timeout_fail_limit: int = 10
     violation_fail_limit: int = 1
+    llm_max_concurrency: int = 8
+    """The maximum number of in-flight async LLM calls for each model in a process"""
+    llm_requests_per_minute: float | None = None
+    """The maximum number of async LLM calls started per minute for each model; None means no limitation"""
 
     # Behavior of returning answers to the same question when caching is enabled
     use_auto_chat_cache_seed_gen: bool = False
@@ -69,6 +81,8 @@ class LLMSettings(ExtendedBaseSettings):
     chat_max_tokens: int | None = None
     chat_temperature: float = 0.5
     chat_stream: bool = True
+    json_stream_early_stop: bool = True
+    """In json mode, stop reading the streamed response once the first JSON value is complete and valid"""
     chat_seed: int | None = None
     chat_frequency_penalty: float = 0.0
     chat_presence_penalty: float = 0.0
@@ -83,13 +83,9 @@ class DSTrace(Trace[DataScienceScen, KnowledgeBase]):
         # If we implement the most correct merging logic,  merge 2 traces, will result in a single trace(2 traces currently).
         # So user may get unexpected results when he want to know ho many branches are created.
 
-        # Build a set of all parent indices found in dag_parent (skip empty tuples which represent roots)
-        parent_indices = set(idx for parents in self.dag_parent for idx in parents)
-        # All node indices
-        all_indices = set(range(len(self.hist)))
-        # The leaf nodes have no children, so they are not present as parents of any other node
-        leaves = list(sorted(all_indices - parent_indices))
-        return leaves
+        # The leaf nodes have no children, so they are not present as parents of any other node.
+        # They are maintained by the index of the trace as the nodes are appended.
+        return list(self._get_index().sorted_leaves())
 
     def sync_dag_parent_and_hist(
         self,
@@ -97,6 +93,7 @@ class DSTrace(Trace[DataScienceScen, KnowledgeBase]):
         """
         Adding corresponding parent index to the dag_parent when the hist is going to be changed.
         Should be called when the hist is changed.
+        The index of the trace (leaves, children, ancestors) takes in the new node when it is queried next time.
         """
 
         if len(self.hist) == 0 or len(self.get_current_selection()) == 0:
@@ -2,8 +2,6 @@ import json
 from pathlib import Path
 from typing import List, Union
 
-import pandas as pd
-
 from rdagent.components.knowledge_management.vector_base import Document, PDVectorBase
 from rdagent.log import rdagent_logger as logger
 from rdagent.oai.llm_utils import APIBackend
@@ -157,7 +155,7 @@ class KaggleExperienceBase(PDVectorBase):
                     for trunk, trunk_embedding in zip(document.trunks, document.trunks_embedding)
                 ]
             )
-        self.vector_df = pd.concat([self.vector_df, pd.DataFrame(docs)], ignore_index=True)
+        self.add_rows(docs)
 
     def load_kaggle_experience(self, kaggle_experience_path: Union[str, Path]):
         """
@@ -1,16 +1,19 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable
 
 import pandas as pd
-from pandarallel import pandarallel
-
-from rdagent.core.conf import RD_AGENT_SETTINGS
-from rdagent.core.utils import cache_with_pickle
-
-pandarallel.initialize(verbose=1)
 
+from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+from rdagent.components.coder.factor_coder.cs_stats import mean_ic_matrix
 from rdagent.components.runner import CachedRunner
+from rdagent.core.conf import RD_AGENT_SETTINGS
 from rdagent.core.exception import FactorEmptyError
+from rdagent.core.utils import cache_with_pickle
 from rdagent.log import rdagent_logger as logger
+from rdagent.oai.llm_utils import md5_hash
+from rdagent.scenarios.qlib.developer.factor_store import get_data_version
 from rdagent.scenarios.qlib.developer.utils import process_factor_data
 from rdagent.scenarios.qlib.experiment.factor_experiment import QlibFactorExperiment
 from rdagent.scenarios.qlib.experiment.model_experiment import QlibModelExperiment
@@ -29,7 +32,10 @@ DIRNAME_local = Path.cwd()
 #         de = DockerEnv()
 #         de.run(local_path=self.ws_path, entry="qrun conf_baseline.yaml")
 
-# TODO: supporting multiprocessing and keep previous results
+
+def _submit(executor: ThreadPoolExecutor, func: Callable, *args: Any) -> Future:
+    """Submit `func` with a copy of the current context, so the logger tags are kept in the thread"""
+    return executor.submit(contextvars.copy_context().run, func, *args)
 
 
 class QlibFactorRunner(CachedRunner[QlibFactorExperiment]):
@@ -45,13 +51,25 @@ class QlibFactorRunner(CachedRunner[QlibFactorExperiment]):
     def calculate_information_coefficient(
         self, concat_feature: pd.DataFrame, SOTA_feature_column_size: int, new_feature_columns_size: int
     ) -> pd.DataFrame:
-        res = pd.Series(index=range(SOTA_feature_column_size * new_feature_columns_size))
-        for col1 in range(SOTA_feature_column_size):
-            for col2 in range(SOTA_feature_column_size, SOTA_feature_column_size + new_feature_columns_size):
-                res.loc[col1 * new_feature_columns_size + col2 - SOTA_feature_column_size] = concat_feature.iloc[
-                    :, col1
-                ].corr(concat_feature.iloc[:, col2])
-        return res
+        """
+        Calculate the IC between each SOTA column and each new column.
+        It equals to the mean over dates of `Series.corr` on each date.
+
+        Returns
+        -------
+        pd.DataFrame
+            IC of shape (SOTA_feature_column_size, new_feature_columns_size); NaN if a pair is never valid.
+        """
+        ic = mean_ic_matrix(
+            concat_feature.iloc[:, :SOTA_feature_column_size],
+            concat_feature.iloc[:, SOTA_feature_column_size : SOTA_feature_column_size + new_feature_columns_size],
+        )
+        # the columns are located by position because the factor names may be duplicated
+        return pd.DataFrame(ic.to_numpy())
+
+    def get_cache_key(self, exp: QlibFactorExperiment) -> str:
+        """The key of `CachedRunner` (tasks and code) and the version of the factor source data"""
+        return md5_hash(CachedRunner.get_cache_key(self, exp) + get_data_version(FACTOR_COSTEER_SETTINGS.data_folder))
 
     def deduplicate_new_factors(self, SOTA_feature: pd.DataFrame, new_feature: pd.DataFrame) -> pd.DataFrame:
         # calculate the IC between each column of SOTA_feature and new_feature
@@ -59,41 +77,48 @@ class QlibFactorRunner(CachedRunner[QlibFactorExperiment]):
         # return the new_feature
 
         concat_feature = pd.concat([SOTA_feature, new_feature], axis=1)
-        IC_max = (
-            concat_feature.groupby("datetime")
-            .parallel_apply(
-                lambda x: self.calculate_information_coefficient(x, SOTA_feature.shape[1], new_feature.shape[1])
-            )
-            .mean()
-        )
-        IC_max.index = pd.MultiIndex.from_product([range(SOTA_feature.shape[1]), range(new_feature.shape[1])])
-        IC_max = IC_max.unstack().max(axis=0)
+        IC_max = self.calculate_information_coefficient(
+            concat_feature, SOTA_feature.shape[1], new_feature.shape[1]
+        ).max(axis=0)
         return new_feature.iloc[:, IC_max[IC_max < 0.99].index]
 
-    @cache_with_pickle(CachedRunner.get_cache_key, CachedRunner.assign_cached_result)
+    @cache_with_pickle(get_cache_key, CachedRunner.assign_cached_result)
     def develop(self, exp: QlibFactorExperiment) -> QlibFactorExperiment:
         """
         Generate the experiment by processing and combining factor data,
         then passing the combined data to Docker for backtest results.
+
+        The baseline backtest (if missing) runs in a thread while the SOTA and the new factors are processed. The
+        factors are processed in the calling thread, because their execution forks the processes of
+        `multiprocessing_wrapper`; the baseline thread only waits for its backtest subprocess meanwhile.
         """
-        if exp.based_experiments and exp.based_experiments[-1].result is None:
-            logger.info(f"Baseline experiment execution ...")
-            exp.based_experiments[-1] = self.develop(exp.based_experiments[-1])
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            base_future = None
+            if exp.based_experiments and exp.based_experiments[-1].result is None:
+                logger.info(f"Baseline experiment execution ...")
+                # a based experiment is memoized by `develop` like the others, so it runs once across the loops
+                base_future = _submit(executor, self.develop, exp.based_experiments[-1])
+
+            try:
+                SOTA_factor = new_factors = None
+                if exp.based_experiments:
+                    # Filter and retain only QlibFactorExperiment instances
+                    sota_factor_experiments_list = [
+                        base_exp for base_exp in exp.based_experiments if isinstance(base_exp, QlibFactorExperiment)
+                    ]
+                    if len(sota_factor_experiments_list) > 1:
+                        logger.info(f"SOTA factor processing ...")
+                        SOTA_factor = process_factor_data(sota_factor_experiments_list)
+
+                    logger.info(f"New factor processing ...")
+                    # Process the new factors data
+                    new_factors = process_factor_data(exp)
+            finally:
+                # wait for the baseline before raising the error of any step
+                if base_future is not None:
+                    exp.based_experiments[-1] = base_future.result()
 
         if exp.based_experiments:
-            SOTA_factor = None
-            # Filter and retain only QlibFactorExperiment instances
-            sota_factor_experiments_list = [
-                base_exp for base_exp in exp.based_experiments if isinstance(base_exp, QlibFactorExperiment)
-            ]
-            if len(sota_factor_experiments_list) > 1:
-                logger.info(f"SOTA factor processing ...")
-                SOTA_factor = process_factor_data(sota_factor_experiments_list)
-
-            logger.info(f"New factor processing ...")
-            # Process the new factors data
-            new_factors = process_factor_data(exp)
-
             if new_factors.empty:
                 raise FactorEmptyError("Factors failed to run on the full sample, this round of experiment failed.")
 
@@ -0,0 +1,148 @@
+"""
+A persistent columnar store of the factor values.
+
+- The value of each factor is stored in one parquet file keyed by `md5(data_type + factor.py)` and the version
+  of the source data, so a factor is only executed once for the same data.
+- `manifest.json` records the stored factors.
+- The factor matrices assembled for a list of factors are stored too. When a list extends a list assembled
+  before (e.g. the SOTA factors grow by the factors of the last round), only the new columns are read and
+  appended to the previous matrix. The matrices are evicted in LRU order beyond `max_matrix_bytes`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow.parquet as pq
+from filelock import FileLock
+
+from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+from rdagent.components.coder.factor_coder.factor import FactorFBWorkspace
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.oai.llm_utils import md5_hash
+
+
+def get_data_version(data_folder: str | Path) -> str:
+    """The version of the source data; it changes when any file in the data folder is replaced or modified"""
+    data_folder = Path(data_folder)
+    if not data_folder.exists():
+        return "missing"
+    stats = sorted((p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in data_folder.iterdir() if p.is_file())
+    return md5_hash(json.dumps(stats))
+
+
+class FactorValueStore:
+    def __init__(self, store_path: str | Path | None = None, max_matrix_bytes: int = 2 << 30) -> None:
+        self.store_path = Path(
+            store_path
+            if store_path is not None
+            else Path(RD_AGENT_SETTINGS.pickle_cache_folder_path_str) / "qlib.factor_value_store"
+        )
+        self.manifest_path = self.store_path / "manifest.json"
+        self.max_matrix_bytes = max_matrix_bytes
+        self._data_versions: dict[str, str] = {}
+
+    def _data_version(self, data_type: str) -> str:
+        data_folder = (
+            FACTOR_COSTEER_SETTINGS.data_folder_debug if data_type == "Debug" else FACTOR_COSTEER_SETTINGS.data_folder
+        )
+        if data_folder not in self._data_versions:
+            self._data_versions[data_folder] = get_data_version(data_folder)
+        return self._data_versions[data_folder]
+
+    def get_key(self, implementation: FactorFBWorkspace, data_type: str = "All") -> str | None:
+        """The key of the factor value; None if the implementation can't be stored"""
+        code_hash = implementation.hash_func(data_type)
+        if code_hash is None:
+            return None
+        return md5_hash(f"{code_hash}:{self._data_version(data_type)}")
+
+    def _factor_path(self, key: str) -> Path:
+        return self.store_path / "factors" / f"{key}.parquet"
+
+    def _matrix_path(self, keys: list[str]) -> Path:
+        return self.store_path / "matrices" / f"{md5_hash(json.dumps(keys))}.parquet"
+
+    def contains(self, key: str) -> bool:
+        return self._factor_path(key).exists()
+
+    def load_manifest(self) -> dict[str, dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except json.JSONDecodeError:
+            return {}
+
+    @staticmethod
+    def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, engine="pyarrow")
+        tmp_path.replace(path)
+
+    @staticmethod
+    def _read_parquet(path: Path) -> pd.DataFrame:
+        return pq.read_table(path, memory_map=True).to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame, factor_name: str = "") -> None:
+        self._write_parquet(df, self._factor_path(key))
+        with FileLock(self.store_path / "manifest.lock"):
+            manifest = self.load_manifest()
+            manifest[key] = {
+                "factor_name": factor_name,
+                "columns": [str(c) for c in df.columns],
+                "rows": len(df),
+                "created_at": datetime.now().isoformat(),
+            }
+            tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(manifest, indent=2))
+            tmp_path.replace(self.manifest_path)
+
+    def get(self, key: str) -> pd.DataFrame:
+        return self._read_parquet(self._factor_path(key))
+
+    def assemble(self, keys: list[str]) -> pd.DataFrame:
+        """
+        Concat the stored factors of `keys` by columns (like `pd.concat(dfs, axis=1)`).
+        The longest list of leading keys assembled before is reused, so only the remaining factors are read.
+        """
+        for n_prefix in range(len(keys), 0, -1):
+            prefix_path = self._matrix_path(keys[:n_prefix])
+            try:
+                base = [self._read_parquet(prefix_path)]
+            except FileNotFoundError:  # never assembled, or evicted (maybe by another process)
+                continue
+            os.utime(prefix_path)  # the mtime is the last use of the matrix
+            break
+        else:
+            n_prefix, base = 0, []
+        if n_prefix == len(keys):
+            return base[0]
+        matrix = pd.concat(base + [self.get(key) for key in keys[n_prefix:]], axis=1)
+        if len(keys) > 1:
+            self._write_parquet(matrix, self._matrix_path(keys))
+            self._evict_matrices(keep=self._matrix_path(keys))
+        return matrix
+
+    def _evict_matrices(self, keep: Path) -> None:
+        """Remove the least recently used matrices (but `keep`) until they fit in `max_matrix_bytes`"""
+        matrices = []
+        for path in (self.store_path / "matrices").glob("*.parquet"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            matrices.append((st.st_mtime_ns, st.st_size, path))
+        total = sum(size for _, size, _ in matrices)
+        for _, size, path in sorted(matrices, key=lambda m: m[0]):
+            if total <= self.max_matrix_bytes:
+                break
+            if path != keep:
+                path.unlink(missing_ok=True)
+                total -= size
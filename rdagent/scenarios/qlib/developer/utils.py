@@ -7,12 +7,14 @@ from rdagent.core.conf import RD_AGENT_SETTINGS
 from rdagent.core.exception import FactorEmptyError
 from rdagent.core.utils import multiprocessing_wrapper
 from rdagent.log import rdagent_logger as logger
+from rdagent.scenarios.qlib.developer.factor_store import FactorValueStore
 from rdagent.scenarios.qlib.experiment.factor_experiment import QlibFactorExperiment
 
 
 def process_factor_data(exp_or_list: List[QlibFactorExperiment] | QlibFactorExperiment) -> pd.DataFrame:
     """
     Process and combine factor data from experiment implementations.
+    The factor values are kept in the `FactorValueStore`, so only the factors never stored are executed.
 
     Args:
         exp (ASpecificExp): The experiment containing factor data.
@@ -22,7 +24,10 @@ def process_factor_data(exp_or_list: List[QlibFactorExperiment] | QlibFactorExpe
     """
     if isinstance(exp_or_list, QlibFactorExperiment):
         exp_or_list = [exp_or_list]
-    factor_dfs = []
+    store = FactorValueStore() if RD_AGENT_SETTINGS.cache_with_pickle else None
+    # the factor data in order; a store key or a dataframe (if the factor can't be stored)
+    factor_data: list[str | pd.DataFrame] = []
+    error_message = ""
 
     # Collect all exp's dataframes
     for exp in exp_or_list:
@@ -31,22 +36,37 @@ def process_factor_data(exp_or_list: List[QlibFactorExperiment] | QlibFactorExpe
                 # if it has no sub_tasks, the experiment is results from template project.
                 # otherwise, it is developed with designed task. So it should have feedback.
                 assert isinstance(exp.prop_dev_feedback, CoSTEERMultiFeedback)
+                # only execute successfully feedback
+                implementations = [
+                    implementation
+                    for implementation, fb in zip(exp.sub_workspace_list, exp.prop_dev_feedback)
+                    if implementation and fb
+                ]
+                keys = [store.get_key(imp) if store is not None else None for imp in implementations]
+                to_execute = [i for i, key in enumerate(keys) if key is None or not store.contains(key)]
                 # Iterate over sub-implementations and execute them to get each factor data
-                message_and_df_list = multiprocessing_wrapper(
-                    [
-                        (implementation.execute, ("All",))
-                        for implementation, fb in zip(exp.sub_workspace_list, exp.prop_dev_feedback)
-                        if implementation and fb
-                    ],  # only execute successfully feedback
+                executed = multiprocessing_wrapper(
+                    [(implementations[i].execute, ("All",)) for i in to_execute],
                     n=RD_AGENT_SETTINGS.multi_proc_n,
                 )
-                error_message = ""
-                for message, df in message_and_df_list:
+                message_and_df_dict = dict(zip(to_execute, executed))
+                for i, key in enumerate(keys):
+                    if i not in message_and_df_dict:
+                        factor_data.append(key)
+                        logger.info(
+                            f"Factor data from {exp.hypothesis.concise_justification} is loaded from the store."
+                        )
+                        continue
+                    message, df = message_and_df_dict[i]
                     # Check if factor generation was successful
                     if df is not None and "datetime" in df.index.names:
                         time_diff = df.index.get_level_values("datetime").to_series().diff().dropna().unique()
                         if pd.Timedelta(minutes=1) not in time_diff:
-                            factor_dfs.append(df)
+                            if key is not None:
+                                store.put(key, df, factor_name=implementations[i].target_task.factor_name)
+                                factor_data.append(key)
+                            else:
+                                factor_data.append(df)
                             logger.info(
                                 f"Factor data from {exp.hypothesis.concise_justification} is successfully generated."
                             )
@@ -59,8 +79,14 @@ def process_factor_data(exp_or_list: List[QlibFactorExperiment] | QlibFactorExpe
                         )
 
     # Combine all successful factor data
-    if factor_dfs:
-        return pd.concat(factor_dfs, axis=1)
+    if factor_data:
+        if all(isinstance(data, str) for data in factor_data):
+            # the matrix of the leading factors (e.g. the SOTA factors of the last round) is reused
+            return store.assemble(factor_data)
+        return pd.concat(
+            [store.get(data) if isinstance(data, str) else data for data in factor_data],
+            axis=1,
+        )
     else:
         raise FactorEmptyError(
             f"No valid factor data found to merge (in process_factor_data) because of {error_message}."
@@ -0,0 +1,208 @@
+"""
+Run the qlib backtests of all the loops in one long-lived worker.
+
+Without it, each backtest starts its own `qrun` (and container), which initializes qlib, the data provider and the
+modules again for nearly identical configs. The service starts `backtest_worker.py` once per workspace root in the
+qlib environment; the backtests of all the processes (e.g. the parallel loops running in subprocesses) are queued
+to it by files in `<workspace root>/.backtest_service`, and it runs them on a bounded pool of forked processes.
+
+The result of a backtest is left in the workspace like `qrun` does (`mlruns`), so `QlibFBWorkspace.execute`
+reads it in the same way.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import docker  # type: ignore[import-untyped]
+from filelock import FileLock
+from pydantic_settings import SettingsConfigDict
+
+from rdagent.core.conf import RD_AGENT_SETTINGS, ExtendedBaseSettings
+from rdagent.log import rdagent_logger as logger
+from rdagent.scenarios.qlib.experiment import backtest_worker
+from rdagent.utils.env import (
+    DockerContainerPool,
+    DockerEnv,
+    Env,
+    EnvResult,
+    normalize_volumes,
+)
+
+
+class BacktestServiceSettings(ExtendedBaseSettings):
+    model_config = SettingsConfigDict(env_prefix="QLIB_BACKTEST_")
+
+    service: bool | None = None
+    """Run the backtests in the backtest service; by default it is used when the loops run in parallel"""
+
+    service_workers: int = 2
+    """The maximum number of backtests running at the same time"""
+
+    service_idle_timeout: int = 600
+    """The worker exits after it is idle for the seconds"""
+
+
+BACKTEST_SERVICE_SETTINGS = BacktestServiceSettings()
+
+
+class BacktestServiceError(RuntimeError):
+    """The backtest could not be run by the service (the caller may run it by itself)"""
+
+
+class BacktestService:
+    SERVICE_FOLDER = ".backtest_service"
+    HEARTBEAT_TIMEOUT = 30
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, env: Env, workspace_root: str | Path, workers: int = 2, idle_timeout: int = 600) -> None:
+        self.env = env
+        self.workspace_root = Path(workspace_root).absolute()
+        self.root = self.workspace_root / self.SERVICE_FOLDER
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        # the workspace root is mounted like the pooled containers in docker, and is the same path otherwise
+        self.service_workspace_root = (
+            DockerContainerPool.POOL_MOUNT_PATH if isinstance(env, DockerEnv) else str(self.workspace_root)
+        )
+
+    def service_path(self, path: str | Path) -> str:
+        """The path seen by the worker"""
+        relative_path = Path(path).absolute().relative_to(self.workspace_root)
+        return f"{self.service_workspace_root}/{relative_path.as_posix()}"
+
+    def is_alive(self) -> bool:
+        try:
+            return time.time() - (self.root / backtest_worker.HEARTBEAT_FILE).stat().st_mtime < self.HEARTBEAT_TIMEOUT
+        except FileNotFoundError:
+            return False
+
+    def ensure_started(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.root / "start.lock"):
+            if self.is_alive():
+                return
+            # the folders are created on the host, so the files written by the container can be removed
+            for folder in backtest_worker.JOB_FOLDERS:
+                (self.root / folder).mkdir(exist_ok=True)
+            shutil.copyfile(backtest_worker.__file__, self.root / "backtest_worker.py")
+            # the other clients regard the worker as alive while it is starting
+            (self.root / backtest_worker.HEARTBEAT_FILE).touch()
+            logger.info(f"Starting the backtest service in {self.root}")
+            self._launch()
+
+    def _launch(self) -> None:
+        args = [
+            f"{self.service_path(self.root)}/backtest_worker.py",
+            f"--root={self.service_path(self.root)}",
+            f"--workers={self.workers}",
+            f"--idle-timeout={self.idle_timeout}",
+        ]
+        if isinstance(self.env, DockerEnv):
+            client = docker.from_env()
+            volumes = {
+                **self.env._get_fixed_volumes(),
+                str(self.workspace_root): {"bind": self.service_workspace_root, "mode": "rw"},
+            }
+            client.containers.run(
+                image=self.env.conf.image,
+                command=["python", *args, "--chmod"],
+                volumes=normalize_volumes(volumes, self.env.conf.mount_path),
+                environment={"PYTHONWARNINGS": "ignore", "PYTHONUNBUFFERED": "1"},
+                detach=True,
+                auto_remove=True,
+                working_dir="/",
+                network=self.env.conf.network,
+                shm_size=self.env.conf.shm_size,
+                mem_limit=self.env.conf.mem_limit,
+                cpu_count=self.env.conf.cpu_count,
+                **self.env._gpu_kwargs(client),
+            )
+        else:
+            bin_path = getattr(self.env.conf, "bin_path", "")
+            env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+            env["PATH"] = ":".join(p for p in [*bin_path.split(":"), env.get("PATH", "")] if p)
+            with (self.root / "service.log").open("ab") as log:
+                subprocess.Popen(
+                    ["python", *args],
+                    env=env,
+                    cwd=self.root,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+
+    def run(
+        self, workspace_path: str | Path, config_name: str, env: dict | None = None, timeout: int | None = None
+    ) -> EnvResult:
+        """
+        Run `qrun <config_name>` in the workspace by the service.
+
+        Raises
+        ------
+        BacktestServiceError
+            The service failed before running the backtest to the end (it may not be started at all).
+        """
+        start = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            "workspace": self.service_path(workspace_path),
+            "config": config_name,
+            "env": {k: str(v) for k, v in (env or {}).items()},
+            "timeout": timeout,
+        }
+        self.ensure_started()
+        job_path = self.root / "jobs" / f"{job_id}.json"
+        backtest_worker.write_json(job_path, job)
+
+        result_path = self.root / "results" / f"{job_id}.json"
+        log_path = self.root / "results" / f"{job_id}.log"
+        while not result_path.exists():
+            if timeout is not None and time.time() - start > timeout + self.HEARTBEAT_TIMEOUT:
+                job_path.unlink(missing_ok=True)
+                raise BacktestServiceError(f"The backtest is not finished by the service in {timeout} seconds.")
+            if not self.is_alive():
+                if not job_path.exists():
+                    raise BacktestServiceError("The backtest service exited before the backtest finished.")
+                # the worker exited (e.g. idle) before the job was claimed
+                self.ensure_started()
+            time.sleep(self.POLL_INTERVAL)
+
+        result = json.loads(result_path.read_text())
+        log_output = log_path.read_text(errors="replace") if log_path.exists() else ""
+        result_path.unlink()
+        log_path.unlink(missing_ok=True)
+        if result["exit_code"] is None:
+            raise BacktestServiceError(result["error"])
+        return EnvResult(log_output, result["exit_code"], time.time() - start)
+
+
+_BACKTEST_SERVICES: dict[tuple[type, str], BacktestService] = {}
+_BACKTEST_SERVICES_LOCK = threading.Lock()
+
+
+def get_backtest_service(env: Env, workspace_root: str | Path) -> BacktestService | None:
+    """The service running the backtests of `workspace_root` in `env`; None if the service is not enabled"""
+    enabled = BACKTEST_SERVICE_SETTINGS.service
+    if enabled is None:
+        enabled = RD_AGENT_SETTINGS.get_max_parallel() > 1
+    if not enabled:
+        return None
+    key = (type(env), str(Path(workspace_root).absolute()))
+    with _BACKTEST_SERVICES_LOCK:
+        if key not in _BACKTEST_SERVICES:
+            _BACKTEST_SERVICES[key] = BacktestService(
+                env,
+                workspace_root,
+                workers=BACKTEST_SERVICE_SETTINGS.service_workers,
+                idle_timeout=BACKTEST_SERVICE_SETTINGS.service_idle_timeout,
+            )
+        return _BACKTEST_SERVICES[key]
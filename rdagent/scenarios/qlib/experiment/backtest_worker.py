@@ -0,0 +1,244 @@
+"""
+A long-lived worker running the qlib backtests of many workspaces.
+
+It is started by `BacktestService` in the qlib environment (the qlib docker or conda env) and exits after it is idle
+for a while, so it only depends on the standard library and qlib.
+
+- qlib, the data provider and the heavy modules are initialized once, before the first backtest;
+- each backtest runs the workflow of `qrun` in a process forked from the worker, so the backtests share the loaded
+  calendar, instruments and modules without leaking state into each other;
+- at most `--workers` backtests run at the same time.
+
+The backtests are exchanged by files in the service folder (on the host, and mounted into the container):
+
+- `jobs/<id>.json`: a job `{"workspace": str, "config": str, "env": dict, "timeout": int | None}` from a client;
+- `running/<id>.json`: the job claimed by the worker;
+- `results/<id>.log` and `results/<id>.json`: the output and `{"exit_code": int | None, "error": str}` of the job;
+  the exit code is None if the job could not be run;
+- `heartbeat`: touched every few seconds while the worker is alive.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+JOB_FOLDERS = ("jobs", "running", "results")
+HEARTBEAT_FILE = "heartbeat"
+HEARTBEAT_INTERVAL = 3
+STALE_RESULT_SECONDS = 24 * 3600
+
+PRELOAD_MODULES = [
+    "qlib.contrib.data.handler",
+    "qlib.contrib.model.gbdt",
+    "qlib.contrib.strategy",
+    "qlib.workflow.record_temp",
+    "qlib.contrib.model.pytorch_general_nn",
+]
+
+
+def write_json(path, obj):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(obj))
+    os.replace(tmp_path, path)
+
+
+def finish_job(root, job_id, exit_code, error=""):
+    write_json(root / "results" / f"{job_id}.json", {"exit_code": exit_code, "error": error})
+    with contextlib.suppress(FileNotFoundError):
+        (root / "running" / f"{job_id}.json").unlink()
+
+
+@contextlib.contextmanager
+def patched_environ(env):
+    old_env = dict(os.environ)
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(old_env)
+
+
+class QlibWorkflowRunner:
+    """Run the workflow of `qrun <config>` in the current folder; qlib is initialized by the first job"""
+
+    def __init__(self, preload_modules):
+        self.preload_modules = preload_modules
+        self.qlib_init = None
+
+    @staticmethod
+    def load_config(config_path):
+        from qlib.workflow.cli import render_template
+        from ruamel.yaml import YAML
+
+        return YAML(typ="safe", pure=True).load(render_template(config_path))
+
+    def prepare(self, job):
+        """Initialize qlib with the `qlib_init` of the first job and load the shared data before forking"""
+        if self.qlib_init is not None:
+            return
+        import qlib
+        from qlib.data import D
+
+        with patched_environ(job["env"]):
+            config = self.load_config(str(Path(job["workspace"]) / job["config"]))
+        self.qlib_init = {k: v for k, v in config.get("qlib_init", {}).items() if k != "exp_manager"}
+        qlib.init(**self.qlib_init)
+        D.calendar(freq="day")
+        D.list_instruments(D.instruments("all"), as_list=True)
+        for module in self.preload_modules:
+            try:
+                __import__(module)
+            except Exception:  # noqa: BLE001
+                pass  # the job imports it by itself
+
+    def __call__(self, job):
+        import qlib
+        from qlib.workflow.cli import workflow
+
+        original_init = qlib.init
+
+        def init(*args, **kwargs):
+            # the memory cache of qlib (calendar, instruments...) is kept if the data is the same as the worker's
+            qlib_init = {k: v for k, v in kwargs.items() if k != "exp_manager"}
+            kwargs.setdefault("clear_mem_cache", qlib_init != self.qlib_init)
+            return original_init(*args, **kwargs)
+
+        qlib.init = init
+        workflow(job["config"])
+
+
+def fork_job(root, job_id, job, run_job):
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    exit_code = 1
+    try:
+        # a new process group, so a job running out of time is killed with its children
+        os.setsid()
+        log_fd = os.open(root / "results" / f"{job_id}.log", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        os.close(log_fd)
+        os.chdir(job["workspace"])
+        sys.path.insert(0, job["workspace"])
+        os.environ.update(job["env"])
+        run_job(job)
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:  # noqa: BLE001
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def submit_time(path):
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return float("inf")  # withdrawn by the client
+
+
+def chmod_tree(path):
+    """Make the files created in the container removable on the host (like the runs of `DockerEnv`)"""
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            with contextlib.suppress(OSError):
+                os.chmod(os.path.join(root, name), 0o777)
+
+
+def serve(root, run_job, prepare=None, workers=2, idle_timeout=600, poll_interval=0.2, chmod=False):
+    root = Path(root)
+    for folder in JOB_FOLDERS:
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    heartbeat = root / HEARTBEAT_FILE
+    stopped = threading.Event()
+
+    def beat():
+        while True:
+            heartbeat.touch()
+            if stopped.wait(HEARTBEAT_INTERVAL):
+                break
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    # the jobs claimed by a previous worker are lost; the results nobody collected are removed
+    for path in (root / "running").glob("*.json"):
+        finish_job(root, path.stem, None, "The backtest service exited before the job finished.")
+    for path in (root / "results").iterdir():
+        if time.time() - path.stat().st_mtime > STALE_RESULT_SECONDS:
+            path.unlink()
+
+    running = {}  # pid -> (job id, job, deadline)
+    idle_since = time.monotonic()
+    try:
+        while True:
+            for pid, (job_id, job, deadline) in list(running.items()):
+                done_pid, status = os.waitpid(pid, os.WNOHANG)
+                if done_pid == 0 and (deadline is None or time.monotonic() < deadline):
+                    continue
+                if done_pid == 0:
+                    with contextlib.suppress(ProcessLookupError):
+                        os.killpg(pid, signal.SIGKILL)
+                    _, status = os.waitpid(pid, 0)
+                    with (root / "results" / f"{job_id}.log").open("a") as log:
+                        log.write(f"\n\nThe running time exceeds {job['timeout']} seconds, so the process is killed.")
+                if chmod:
+                    chmod_tree(job["workspace"])
+                finish_job(root, job_id, os.waitstatus_to_exitcode(status))
+                del running[pid]
+
+            pending = sorted((root / "jobs").glob("*.json"), key=submit_time)
+            for path in pending[: max(0, workers - len(running))]:
+                claimed = root / "running" / path.name
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue  # withdrawn by the client
+                job_id = path.stem
+                try:
+                    job = json.loads(claimed.read_text())
+                    if prepare is not None:
+                        prepare(job)
+                except Exception:  # noqa: BLE001
+                    finish_job(root, job_id, None, traceback.format_exc())
+                    continue
+                deadline = time.monotonic() + job["timeout"] if job.get("timeout") else None
+                running[fork_job(root, job_id, job, run_job)] = (job_id, job, deadline)
+
+            if running or pending:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > idle_timeout:
+                break
+            time.sleep(poll_interval)
+    finally:
+        stopped.set()
+        with contextlib.suppress(FileNotFoundError):
+            heartbeat.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", required=True, help="the service folder")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--idle-timeout", type=float, default=600)
+    parser.add_argument("--preload", nargs="*", default=PRELOAD_MODULES)
+    parser.add_argument("--chmod", action="store_true", help="make the files of the jobs writable by everyone")
+    args = parser.parse_args()
+
+    runner = QlibWorkflowRunner(args.preload)
+    serve(args.root, runner, runner.prepare, args.workers, args.idle_timeout, chmod=args.chmod)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Alpha158 with a persistent cache of its processed features.
+
+Only the factors in `combined_factors_df.parquet` change between the backtests of a run, while most of the data
+preparation is spent on building Alpha158 from the binary data and fitting its processors. So the handler
+
+- builds Alpha158 once for a handler config and a version of the qlib data, and saves the raw, infer and learn
+  frames (as Arrow IPC files) and the fitted processors in the cache folder;
+- afterwards loads the cached frames (memory-mapped) and, given a `factor_path`, only processes and joins the
+  factors.
+
+The processors of the templates (RobustZScoreNorm, Fillna, DropnaLabel, CSZScoreNorm) work on each column
+independently, so processing the factors alone gives the same values as processing them together with Alpha158.
+
+Usage in the qlib config (`module_path` is the path of this file in the workspace):
+
+.. code-block:: yaml
+
+    handler:
+        class: CachedAlpha158
+        module_path: cached_handler.py
+        kwargs:
+            factor_path: combined_factors_df.parquet  # optional, the factors to process and join
+            ...  # the kwargs of Alpha158
+
+The cache folder is `~/.qlib/feature_cache` (mounted into the qlib docker) unless `QLIB_FEATURE_CACHE_DIR` is set.
+The caches unused for `QLIB_FEATURE_CACHE_MAX_DAYS` (30 by default) are removed, as are the least recently used ones
+while the folder is larger than `QLIB_FEATURE_CACHE_MAX_GB` (20 by default).
+Without pyarrow (or `fcntl`, i.e. outside of POSIX) nothing is cached, and the handler builds Alpha158 as usual.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+import qlib
+from qlib.config import C
+from qlib.contrib.data.handler import Alpha158
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.log import get_module_logger
+
+try:
+    import fcntl
+
+    import pyarrow as pa
+except ImportError:
+    CACHE_SUPPORTED = False
+else:
+    CACHE_SUPPORTED = True
+
+CACHE_DIR_ENV = "QLIB_FEATURE_CACHE_DIR"
+DEFAULT_CACHE_DIR = "~/.qlib/feature_cache"
+MAX_CACHE_BYTES = float(os.environ.get("QLIB_FEATURE_CACHE_MAX_GB", 20)) * 2**30
+MAX_CACHE_SECONDS = float(os.environ.get("QLIB_FEATURE_CACHE_MAX_DAYS", 30)) * 24 * 3600
+PROCESSORS_FILE = "processors.pkl"
+FRAME_ATTRS = {"raw": "_data", "infer": "_infer", "learn": "_learn"}
+PROCESSOR_ATTRS = ("shared_processors", "infer_processors", "learn_processors")
+
+logger = get_module_logger("cached_handler")
+
+
+def get_qlib_data_version() -> str:
+    """The version of the qlib data; it changes when any calendar, instrument or feature file is modified"""
+    data_uri = Path(C.dpm.get_data_uri()).expanduser()
+    stats = []
+    for folder in ("calendars", "instruments", "features"):
+        for root, _, files in os.walk(data_uri / folder):
+            for name in files:
+                path = Path(root) / name
+                st = path.stat()
+                stats.append((path.relative_to(data_uri).as_posix(), st.st_size, st.st_mtime_ns))
+    return hashlib.md5(json.dumps(sorted(stats)).encode()).hexdigest()
+
+
+def dump_frame(df: pd.DataFrame, path: Path) -> None:
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def load_frame(path: Path) -> pd.DataFrame:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def get_folder_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def prune_cache(cache_dir: Path, keep: Path) -> None:
+    """Remove the caches beyond the age and size bounds, the least recently used first; `keep` is in use"""
+    now = time.time()
+    entries = []
+    for path in cache_dir.iterdir():
+        if not path.is_dir() or path == keep:
+            continue
+        if path.suffix == ".tmp":
+            # left by a backtest killed while saving its cache
+            if now - path.stat().st_mtime > 24 * 3600:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        entries.append((path.stat().st_mtime, get_folder_size(path), path))
+    total_size = get_folder_size(keep) + sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if now - mtime <= MAX_CACHE_SECONDS and total_size <= MAX_CACHE_BYTES:
+            break
+        # a cache being built or loaded by another backtest is kept
+        with (cache_dir / f"{path.name}.lock").open("w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+        total_size -= size
+
+
+def append_features(base: pd.DataFrame, features: pd.DataFrame) -> pd.DataFrame:
+    """Append `features` to the feature group of `base` on the rows of `base`"""
+    is_feature = base.columns.get_level_values(0) == "feature"
+    return pd.concat([base.loc[:, is_feature], features.reindex(base.index), base.loc[:, ~is_feature]], axis=1)
+
+
+class CachedAlpha158(Alpha158):
+    def __init__(self, factor_path: str | None = None, cache_dir: str | None = None, **kwargs) -> None:
+        # `setup_data` is called by the constructor of the parent, so the attributes are set before it
+        self.factor_path = factor_path
+        self.cache_dir = Path(cache_dir or os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)).expanduser()
+        self.handler_kwargs = kwargs
+        super().__init__(**kwargs)
+
+    def get_cache_key(self) -> str:
+        config = {
+            "handler": Alpha158.__name__,
+            "qlib": qlib.__version__,
+            "kwargs": self.handler_kwargs,
+            "data": get_qlib_data_version(),
+        }
+        return hashlib.md5(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    def setup_data(self, init_type: str = DataHandlerLP.IT_FIT_SEQ, **kwargs) -> None:
+        if init_type != DataHandlerLP.IT_FIT_SEQ or not CACHE_SUPPORTED:
+            # the processors are not fitted (or fitted differently), which is not what the cache holds;
+            # or the cache can't be saved without pyarrow
+            super().setup_data(init_type=init_type, **kwargs)
+        else:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            cache_key = self.get_cache_key()
+            cache_path = self.cache_dir / cache_key
+            # the concurrent backtests of the same config wait for the first one to build the cache
+            with (self.cache_dir / f"{cache_key}.lock").open("w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if (cache_path / PROCESSORS_FILE).exists():
+                    logger.info(f"Load the processed Alpha158 features from {cache_path}")
+                    self._load_cache(cache_path)
+                    # the modification time of a cache is the time it was last used
+                    os.utime(cache_path)
+                else:
+                    super().setup_data(init_type=init_type, **kwargs)
+                    self._dump_cache(cache_path)
+                prune_cache(self.cache_dir, keep=cache_path)
+        if self.factor_path is not None:
+            self._join_factors()
+
+    def _dump_cache(self, cache_path: Path) -> None:
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.mkdir(parents=True, exist_ok=True)
+        try:
+            for name, attr in FRAME_ATTRS.items():
+                if getattr(self, attr, None) is not None:
+                    dump_frame(getattr(self, attr), tmp_path / f"{name}.arrow")
+            # the processors file is written last; the cache is complete when it exists
+            processors = {attr: getattr(self, attr) for attr in PROCESSOR_ATTRS if hasattr(self, attr)}
+            with (tmp_path / PROCESSORS_FILE).open("wb") as f:
+                pickle.dump(processors, f)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:  # noqa: BLE001
+            # a failed cache only costs the next backtest a rebuild
+            logger.warning(f"Failed to save the Alpha158 cache: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _load_cache(self, cache_path: Path) -> None:
+        for name, attr in FRAME_ATTRS.items():
+            if (cache_path / f"{name}.arrow").exists():
+                setattr(self, attr, load_frame(cache_path / f"{name}.arrow"))
+        with (cache_path / PROCESSORS_FILE).open("rb") as f:
+            for attr, processors in pickle.load(f).items():
+                setattr(self, attr, processors)
+
+    @staticmethod
+    def _process(df: pd.DataFrame, processors: list) -> pd.DataFrame:
+        """Fit copies of the feature processors on the factors and apply them"""
+        for proc in processors:
+            # some processors (e.g. CSZScoreNorm) turn their group into a list when they are called
+            groups = getattr(proc, "fields_group", None)
+            if groups is not None and "feature" not in (groups if isinstance(groups, list) else [groups]):
+                continue
+            proc = copy.deepcopy(proc)
+            proc.fit(df)
+            df = proc(df)
+        return df
+
+    def _join_factors(self) -> None:
+        factors = pd.read_parquet(self.factor_path)
+        if not isinstance(factors.columns, pd.MultiIndex):
+            factors.columns = pd.MultiIndex.from_product([["feature"], factors.columns])
+        base = self._infer
+        if list(factors.index.names) != list(base.index.names):
+            factors = factors.reorder_levels(base.index.names)
+        # the factors replicating an Alpha158 feature are dropped, Alpha158 is the reference
+        factors = factors.loc[:, ~factors.columns.isin(base.columns)].sort_index()
+
+        raw_index = self._data.index if getattr(self, "_data", None) is not None else base.index
+        shared = self._process(factors.reindex(raw_index), getattr(self, "shared_processors", []))
+        infer = self._process(shared, self.infer_processors)
+        learn = self._process(infer if self.process_type == DataHandlerLP.PTYPE_A else shared, self.learn_processors)
+
+        if getattr(self, "_data", None) is not None:
+            self._data = append_features(self._data, factors)
+        self._infer = append_features(self._infer, infer)
+        self._learn = append_features(self._learn, learn)
@@ -0,0 +1,95 @@
+"""
+Read the result of a qlib workflow from the `mlruns` folder of the workspace on the host.
+
+It does the same as `read_exp_res.py` without initializing qlib (and without starting another container):
+the latest finished recorder of the active experiments is selected, then its metrics are saved to `qlib_res.csv` and
+its portfolio report to `ret.pkl`.
+
+The file store of MLflow is laid out as
+
+.. code-block:: text
+
+    mlruns/<experiment id>/meta.yaml                  # name, lifecycle_stage
+    mlruns/<experiment id>/<run id>/meta.yaml         # end_time (ms), lifecycle_stage, status
+    mlruns/<experiment id>/<run id>/metrics/<key>     # lines of "<timestamp> <value> <step>"
+    mlruns/<experiment id>/<run id>/artifacts/...     # the objects saved by the recorder
+"""
+
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+from rdagent.log import rdagent_logger as logger
+
+REPORT_ARTIFACT = Path("portfolio_analysis") / "report_normal_1day.pkl"
+
+
+def _read_meta(path: Path) -> dict | None:
+    try:
+        meta = yaml.safe_load(path.read_text())
+    except (OSError, yaml.YAMLError):
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+def find_latest_run(mlruns_path: Path) -> Path | None:
+    """The folder of the active run with the latest end time"""
+    latest_run, latest_end_time = None, None
+    for exp_meta_path in mlruns_path.glob("*/meta.yaml"):
+        exp_meta = _read_meta(exp_meta_path)
+        if exp_meta is None or exp_meta.get("lifecycle_stage", "active") != "active":
+            continue
+        for run_meta_path in exp_meta_path.parent.glob("*/meta.yaml"):
+            run_meta = _read_meta(run_meta_path)
+            if run_meta is None or run_meta.get("lifecycle_stage", "active") != "active":
+                continue
+            end_time = run_meta.get("end_time")
+            if end_time is None:
+                logger.warning(f"Recorder {run_meta_path.parent.name} has no valid end time")
+                continue
+            if latest_end_time is None or end_time > latest_end_time:
+                latest_run, latest_end_time = run_meta_path.parent, end_time
+    return latest_run
+
+
+def read_metrics(run_path: Path) -> pd.Series:
+    """The latest value of each metric (the largest step, then the latest timestamp, like MLflow)"""
+    metrics = {}
+    metrics_path = run_path / "metrics"
+    for metric_path in sorted(p for p in metrics_path.rglob("*") if p.is_file()):
+        records = []
+        for line in metric_path.read_text().splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                timestamp, value = int(parts[0]), float(parts[1])
+                step = int(parts[2]) if len(parts) > 2 else 0
+                records.append((step, timestamp, value))
+        if records:
+            metrics[metric_path.relative_to(metrics_path).as_posix()] = max(records)[2]
+    return pd.Series(metrics, dtype=float)
+
+
+def dump_latest_result(workspace_path: str | Path) -> bool:
+    """
+    Save the metrics and the portfolio report of the latest run in `<workspace>/mlruns` to `qlib_res.csv` and
+    `ret.pkl` in the workspace.
+
+    Returns
+    -------
+    bool
+        False if no finished run is found, so the caller can fall back to `read_exp_res.py`.
+    """
+    workspace_path = Path(workspace_path)
+    run_path = find_latest_run(workspace_path / "mlruns")
+    if run_path is None:
+        return False
+    read_metrics(run_path).to_csv(workspace_path / "qlib_res.csv")
+    report_path = run_path / "artifacts" / REPORT_ARTIFACT
+    if report_path.exists():
+        # the artifact is the pickle saved by the recorder, the same as `ret.pkl`
+        shutil.copyfile(report_path, workspace_path / "ret.pkl")
+    return True
@@ -131,6 +131,23 @@ def get_file_desc(p: Path, variable_list=[]) -> str:
             content=df_info,
         )
 
+    elif p.name.endswith(".mmap"):
+        return JJ_TPL.render(
+            file_name=p.name,
+            type_desc="Memory-mapped Data Folder",
+            content=(
+                f"A memory-mapped copy of `{p.stem}.h5` with the same content. It is faster to load:\n"
+                f'```Python\nfrom pv_loader import load_pv\ndf = load_pv("{p.stem}")\n```'
+            ),
+        )
+
+    elif p.name == "pv_loader.py":
+        return JJ_TPL.render(
+            file_name=p.name,
+            type_desc="Python Helper",
+            content="Provides `load_pv(name, columns=None)` to load the memory-mapped copy of `<name>.h5`.",
+        )
+
     elif p.name.endswith(".md"):
         with open(p) as f:
             content = f.read()
@@ -7,6 +7,11 @@ import pandas as pd
 from rdagent.components.coder.model_coder.conf import MODEL_COSTEER_SETTINGS
 from rdagent.core.experiment import FBWorkspace
 from rdagent.log import rdagent_logger as logger
+from rdagent.scenarios.qlib.experiment.backtest_service import (
+    BacktestServiceError,
+    get_backtest_service,
+)
+from rdagent.scenarios.qlib.experiment.qlib_result import dump_latest_result
 from rdagent.utils.env import QlibCondaConf, QlibCondaEnv, QTDockerEnv
 
 
@@ -26,18 +31,29 @@ class QlibFBWorkspace(FBWorkspace):
         qtde.prepare()
 
         # Run the Qlib backtest
-        execute_qlib_log = qtde.check_output(
-            local_path=str(self.workspace_path),
-            entry=f"qrun {qlib_config_name}",
-            env=run_env,
-        )
+        execute_qlib_log = None
+        if (service := get_backtest_service(qtde, self.workspace_path.parent)) is not None:
+            try:
+                execute_qlib_log = service.run(
+                    self.workspace_path, qlib_config_name, run_env, timeout=qtde.conf.running_timeout_period
+                ).stdout
+            except BacktestServiceError as e:
+                logger.warning(f"Failed to run the backtest by the backtest service, running it directly: {e}")
+        if execute_qlib_log is None:
+            execute_qlib_log = qtde.check_output(
+                local_path=str(self.workspace_path),
+                entry=f"qrun {qlib_config_name}",
+                env=run_env,
+            )
         logger.log_object(execute_qlib_log, tag="Qlib_execute_log")
 
-        execute_log = qtde.check_output(
-            local_path=str(self.workspace_path),
-            entry="python read_exp_res.py",
-            env=run_env,
-        )
+        # the result is read from `mlruns` on the host; `read_exp_res.py` is only run if it can't be found there
+        if not dump_latest_result(self.workspace_path):
+            execute_log = qtde.check_output(
+                local_path=str(self.workspace_path),
+                entry="python read_exp_res.py",
+                env=run_env,
+            )
 
         quantitative_backtesting_chart_path = self.workspace_path / "ret.pkl"
         if quantitative_backtesting_chart_path.exists():
@@ -4,29 +4,62 @@ Here are some infrastructure to build a agent
 The motivation of template and AgentOutput Design
 """
 
-import inspect
+import copy
+import functools
+import random
+import sys
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 import yaml
-from jinja2 import Environment, FunctionLoader, StrictUndefined
+from jinja2 import Environment, FunctionLoader, StrictUndefined, Template
 
 from rdagent.log import rdagent_logger as logger
+from rdagent.log.conf import LOG_SETTINGS
 
 DIRNAME = Path(__file__).absolute().resolve().parent
 PROJ_PATH = DIRNAME.parent.parent
 
 
 def get_caller_dir(upshift: int = 0) -> Path:
-    # Inspect the calling stack to get the caller's directory
-    stack = inspect.stack()
-    caller_frame = stack[1 + upshift]
-    caller_module = inspect.getmodule(caller_frame[0])
-    if caller_module and caller_module.__file__:
-        caller_dir = Path(caller_module.__file__).parent
-    else:
-        caller_dir = DIRNAME
-    return caller_dir
+    # Look up the frame of the caller directly; `inspect.stack()` would read the source of all the frames
+    caller_globals = sys._getframe(1 + upshift).f_globals
+    caller_file = caller_globals.get("__file__")
+    return Path(caller_file).parent if caller_file else DIRNAME
+
+
+class _FileCache:
+    """
+    The parsed content of the template files, shared by the process.
+    A file is parsed again only after it is modified, so the templates can still be edited while running.
+    """
+
+    def __init__(self) -> None:
+        self._content: dict[tuple[Path, str], tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, file_path: Path, ftype: str) -> Any:
+        """Raise FileNotFoundError if the file does not exist"""
+        mtime = file_path.stat().st_mtime_ns
+        key = (file_path, ftype)
+        cached = self._content.get(key)
+        if cached is None or cached[0] != mtime:
+            if ftype == "yaml":
+                with file_path.open() as file:
+                    content = yaml.safe_load(file)
+            else:
+                content = file_path.read_text()
+            with self._lock:
+                self._content[key] = cached = (mtime, content)
+        return cached[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._content.clear()
+
+
+FILE_CACHE = _FileCache()
 
 
 def load_content(uri: str, caller_dir: Path | None = None, ftype: str = "yaml") -> Any:
@@ -51,16 +84,14 @@ def load_content(uri: str, caller_dir: Path | None = None, ftype: str = "yaml")
 
     for file_path in file_path_l:
         try:
+            content = FILE_CACHE.load(file_path, ftype)
             if ftype == "yaml":
-                with file_path.open() as file:
-                    # Load the YAML file
-                    yaml_content = yaml.safe_load(file)
                 # Traverse the YAML content to get the desired template
                 for key in yaml_trace:
-                    yaml_content = yaml_content[key]
-                return yaml_content
-
-            return file_path.read_text()
+                    content = content[key]
+                # the cached content is shared, so the callers get their own copy of the mutable nodes
+                return content if isinstance(content, str) else copy.deepcopy(content)
+            return content
         except FileNotFoundError:
             continue  # the file does not exist, so goto the next loop.
         except KeyError:
@@ -69,6 +100,27 @@ def load_content(uri: str, caller_dir: Path | None = None, ftype: str = "yaml")
         raise FileNotFoundError(f"Cannot find {uri} in {file_path_l}")
 
 
+def _load_include(uri: str) -> tuple[str, None, Callable[[], bool]]:
+    """
+    The loader of `{% include "a.b.c:x.y" %}`.
+    The compiled includes are kept by jinja; they are compiled again when the included content changes.
+    """
+    source = load_content(uri, caller_dir=DIRNAME)
+    return source, None, lambda: load_content(uri, caller_dir=DIRNAME) == source
+
+
+_JINJA_ENV = Environment(undefined=StrictUndefined, loader=FunctionLoader(_load_include))
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(template: str) -> Template:
+    return _JINJA_ENV.from_string(template)
+
+
+# a separate generator, so the sampling does not consume the global seeds of the LLM cache
+_LOG_SAMPLER = random.Random()
+
+
 # class T(SingletonBaseClass): TODO: singleton does not support args now.
 class RDAT:
     """
@@ -111,25 +163,23 @@ class RDAT:
         """
         Render the template with the given context.
         """
-        # loader=FunctionLoader(load_conent) is for supporting grammar like below.
+        # The loader of the environment is for supporting grammar like below.
         # `{% include "scenarios.data_science.share:component_spec.DataLoadSpec" %}`
-        rendered = (
-            Environment(undefined=StrictUndefined, loader=FunctionLoader(load_content))
-            .from_string(self.template)
-            .render(**context)
-            .strip("\n")
-        )
+        # The compiled templates are reused by the renders of the same content.
+        rendered = _compile(self.template).render(**context).strip("\n")
         while "\n\n\n" in rendered:
             rendered = rendered.replace("\n\n\n", "\n\n")
-        logger.log_object(
-            obj={
-                "uri": self.uri,
-                "template": self.template,
-                "context": context,
-                "rendered": rendered,
-            },
-            tag="debug_tpl",
-        )
+        sample_rate = LOG_SETTINGS.tpl_log_sample_rate
+        if sample_rate >= 1 or (sample_rate > 0 and _LOG_SAMPLER.random() < sample_rate):
+            logger.log_object(
+                obj={
+                    "uri": self.uri,
+                    "template": self.template,
+                    "context": context,
+                    "rendered": rendered,
+                },
+                tag="debug_tpl",
+            )
         return rendered
 
 
@@ -7,6 +7,7 @@ Tries to create uniform environment for the agent to run;
 
 # TODO: move the scenario specific docker env into other folders.
 
+import atexit
 import contextlib
 import json
 import os
@@ -15,6 +16,7 @@ import re
 import select
 import shutil
 import subprocess
+import threading
 import time
 import uuid
 import zipfile
@@ -42,6 +44,7 @@ from rdagent.core.experiment import RD_AGENT_SETTINGS
 from rdagent.log import rdagent_logger as logger
 from rdagent.oai.llm_utils import md5_hash
 from rdagent.utils.agent.tpl import T
+from rdagent.utils.manifest import WorkspaceManifest
 from rdagent.utils.workflow import wait_retry
 
 
@@ -154,13 +157,17 @@ class Env(Generic[ASpecificEnvConf]):
     def __init__(self, conf: ASpecificEnvConf):
         self.conf = conf
 
-    def zip_a_folder_into_a_file(self, folder_path: str, zip_file_path: str) -> None:
+    def zip_a_folder_into_a_file(self, folder_path: str, zip_file_path: str, skip_symlinks: bool = False) -> None:
         """
         Zip a folder into a file, use zipfile instead of subprocess
+
+        If `skip_symlinks` is True, the symlinked files (e.g. linked input data) are not copied into the zip file.
         """
         with zipfile.ZipFile(zip_file_path, "w") as z:
             for root, _, files in os.walk(folder_path):
                 for file in files:
+                    if skip_symlinks and os.path.islink(os.path.join(root, file)):
+                        continue
                     z.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), folder_path))
 
     def unzip_a_file_into_a_folder(self, zip_file_path: str, folder_path: str) -> None:
@@ -289,7 +296,8 @@ class Env(Generic[ASpecificEnvConf]):
                     return p.parts[0]
                 return None
 
-            chmod_cmd = f"chmod -R 777 $(find {workspace_path} -mindepth 1 -maxdepth 1"
+            # the trailing slash makes `find` work when the workspace path is a symlink (e.g. pooled containers)
+            chmod_cmd = f"chmod -R 777 $(find {workspace_path.rstrip('/')}/ -mindepth 1 -maxdepth 1"
             for name in [
                 _get_path_stem(T("scenarios.data_science.share:scen.cache_path").r()),
                 _get_path_stem(T("scenarios.data_science.share:scen.input_path").r()),
@@ -339,41 +347,39 @@ class Env(Generic[ASpecificEnvConf]):
         Run the folder under the environment.
         Will cache the output and the folder diff for next round of running.
         Use the python codes and the parameters(entry, running_extra_volume) as key to hash the input.
+
+        The key is built from the workspace manifest (see `rdagent.utils.manifest`), so only the files changed
+        since the last run are read. On a cache hit, only the files that differ from the cached result are restored.
         """
         target_folder = Path(RD_AGENT_SETTINGS.pickle_cache_folder_path_str) / f"utils.env.run"
         target_folder.mkdir(parents=True, exist_ok=True)
 
         # we must add the information of data (beyond code) into the key.
         # Otherwise, all commands operating on data will become invalid (e.g. rm -r submission.csv)
-        # So we recursively walk in the folder and add the sorted relative filename list as part of the key.
-        data_key = []
-        for path in Path(local_path).rglob("*"):
-            p = str(path.relative_to(Path(local_path)))
-            if p.startswith("__pycache__"):
-                continue
-            data_key.append(p)
-        data_key = sorted(data_key)
-
+        # So the names of all the entries in the folder are part of the key (besides the hash of the python code).
+        manifest = WorkspaceManifest(local_path)
+        manifest.refresh()
         key = md5_hash(
-            json.dumps(
-                [
-                    [str(path.relative_to(Path(local_path))), path.read_text()]
-                    for path in sorted(Path(local_path).rglob("*.py"))
-                ]
-            )
+            json.dumps(manifest.fingerprint())
             + json.dumps({"entry": entry, "running_extra_volume": dict(running_extra_volume)})
             + json.dumps({"extra_volumes": self.conf.extra_volumes})
-            + json.dumps(data_key)
         )
-        if Path(target_folder / f"{key}.pkl").exists() and Path(target_folder / f"{key}.zip").exists():
-            with open(target_folder / f"{key}.pkl", "rb") as f:
+        pkl_path, zip_path, snapshot_path = (target_folder / f"{key}{suffix}" for suffix in (".pkl", ".zip", ".json"))
+        if pkl_path.exists() and zip_path.exists():
+            with open(pkl_path, "rb") as f:
                 ret = pickle.load(f)
-            self.unzip_a_file_into_a_folder(str(target_folder / f"{key}.zip"), local_path)
+            if snapshot_path.exists():
+                manifest.restore(json.loads(snapshot_path.read_text()), zip_path)
+            else:
+                # cached by the previous version without snapshot
+                self.unzip_a_file_into_a_folder(str(zip_path), local_path)
         else:
             ret = self.__run_with_retry(entry, local_path, env, running_extra_volume, remove_timestamp)
-            with open(target_folder / f"{key}.pkl", "wb") as f:
+            with open(pkl_path, "wb") as f:
                 pickle.dump(ret, f)
-            self.zip_a_folder_into_a_file(local_path, str(target_folder / f"{key}.zip"))
+            manifest.refresh()
+            self.zip_a_folder_into_a_file(local_path, str(zip_path), skip_symlinks=True)
+            snapshot_path.write_text(json.dumps(manifest.snapshot()))
         return cast(EnvResult, ret)
 
     @abstractmethod
@@ -645,6 +651,12 @@ class DockerConf(EnvConf):
     retry_count: int = 5  # retry count for the docker run
     retry_wait_seconds: int = 10  # retry wait seconds for the docker run
 
+    pool_size: int = 0
+    """The number of long-lived containers kept for this configuration; 0 disables the pool mode.
+    In pool mode, each run is an `exec` in a warm container instead of a new container."""
+    pool_max_uses: int = 50
+    """A pooled container is recycled after it has served this number of runs"""
+
 
 class QlibCondaConf(CondaConf):
     conda_env_name: str = "rdagent4qlib"
@@ -673,7 +685,7 @@ class QlibCondaEnv(LocalEnv[QlibCondaConf]):
                     shell=True,
                 )
                 subprocess.check_call(
-                    f"conda run -n {self.conf.conda_env_name} pip install catboost xgboost scipy==1.11.4 tables torch",
+                    f"conda run -n {self.conf.conda_env_name} pip install catboost xgboost scipy==1.11.4 tables pyarrow torch",
                     shell=True,
                 )
         except Exception as e:
@@ -749,6 +761,128 @@ class MLEBDockerConf(DockerConf):
     enable_cache: bool = False
 
 
+# the images whose GPU probe succeeded; the probe starts a container, so a successful one is done once per process
+# (a failed probe may be transient, so it is done again by the next run)
+_GPU_PROBE_CACHE: dict[str, bool] = {}
+
+
+class DockerContainerPool:
+    """
+    Long-lived containers sharing the same configuration and fixed volumes.
+
+    - The parent folder of the workspaces is mounted at `POOL_MOUNT_PATH`; each run links its workspace to
+      `conf.mount_path` and runs the entry with `exec`.
+    - The volumes nested in the mount path (e.g. the cache folder of the data science scenario) are mounted under
+      `POOL_VOLUMES_PATH` and linked into the workspace by each run (`links`: the relative path -> the mounted path).
+      The links only resolve in the container, so they are replaced by empty mount points (as a new container would
+      leave them) before the run returns.
+    - A container serves one run at a time and is recycled after `conf.pool_max_uses` runs
+      (or when a run fails to finish in time).
+    """
+
+    POOL_MOUNT_PATH = "/rdagent_pool"
+    POOL_VOLUMES_PATH = "/rdagent_pool_volumes"
+
+    def __init__(self, conf: DockerConf, workspace_root: str, volumes: dict, gpu_kwargs: dict) -> None:
+        self.conf = conf
+        self.workspace_root = workspace_root
+        mount_path = conf.mount_path.rstrip("/")
+        self.volumes = {workspace_root: {"bind": self.POOL_MOUNT_PATH, "mode": "rw"}}
+        self.links: dict[str, str] = {}
+        for i, (lp, v) in enumerate(volumes.items()):
+            bind = v["bind"].rstrip("/")
+            if bind.startswith(mount_path + "/"):
+                self.links[bind[len(mount_path) + 1 :]] = f"{self.POOL_VOLUMES_PATH}/{i}"
+                v = {**v, "bind": f"{self.POOL_VOLUMES_PATH}/{i}"}
+            self.volumes[lp] = v
+        self.gpu_kwargs = gpu_kwargs
+        self.idle: list[docker.models.containers.Container] = []  # type: ignore[no-any-unimported]
+        self.uses: dict[str, int] = {}
+        self.n_containers = 0
+        self.cond = threading.Condition()
+
+    def _create(  # type: ignore[no-any-unimported]
+        self, client: docker.DockerClient
+    ) -> docker.models.containers.Container:
+        container = client.containers.run(
+            image=self.conf.image,
+            entrypoint=["/bin/sh", "-c"],
+            command="while true; do sleep 3600; done",
+            volumes=self.volumes,
+            detach=True,
+            working_dir="/",
+            network=self.conf.network,
+            shm_size=self.conf.shm_size,
+            mem_limit=self.conf.mem_limit,
+            cpu_count=self.conf.cpu_count,
+            **self.gpu_kwargs,
+        )
+        self.uses[container.id] = 0
+        return container
+
+    @contextlib.contextmanager
+    def container(  # type: ignore[no-any-unimported]
+        self, client: docker.DockerClient
+    ) -> Generator[docker.models.containers.Container, None, None]:
+        with self.cond:
+            while not self.idle and self.n_containers >= self.conf.pool_size:
+                self.cond.wait()
+            if self.idle:
+                container = self.idle.pop()
+            else:
+                self.n_containers += 1
+                container = None
+        if container is None:
+            try:
+                container = self._create(client)
+            except Exception:
+                with self.cond:
+                    self.n_containers -= 1
+                    self.cond.notify()
+                raise
+        healthy = True
+        try:
+            yield container
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            with self.cond:
+                recycled = container.id not in self.uses  # discarded during the run (e.g. timeout)
+                if not recycled:
+                    self.uses[container.id] += 1
+                    reusable = healthy and self.uses[container.id] < self.conf.pool_max_uses
+                    if reusable:
+                        self.idle.append(container)
+                        self.cond.notify()
+            if not recycled and not reusable:
+                self.discard(container)
+
+    def discard(self, container: docker.models.containers.Container) -> None:  # type: ignore[no-any-unimported]
+        with self.cond:
+            if self.uses.pop(container.id, None) is None:
+                return  # discarded already
+            self.n_containers -= 1
+            self.cond.notify()
+        cleanup_container(container, context="pooled")
+
+    def close(self) -> None:
+        with self.cond:
+            containers, self.idle = self.idle, []
+        for container in containers:
+            self.discard(container)
+
+
+_CONTAINER_POOLS: dict[str, DockerContainerPool] = {}
+_CONTAINER_POOLS_LOCK = threading.Lock()
+
+
+@atexit.register
+def _close_container_pools() -> None:
+    for pool in _CONTAINER_POOLS.values():
+        pool.close()
+
+
 # physionet.org/files/mimic-eicu-fiddle-feature/1.0.0/FIDDLE_mimic3
 class DockerEnv(Env[DockerConf]):
     # TODO: Save the output into a specific file
@@ -829,6 +963,9 @@ class DockerEnv(Env[DockerConf]):
             ),
         }
 
+        if _GPU_PROBE_CACHE.get(self.conf.image):
+            return gpu_kwargs
+
         def get_image(image_name: str) -> None:
             try:
                 client.images.get(image_name)
@@ -850,7 +987,10 @@ class DockerEnv(Env[DockerConf]):
                 cleanup_container(container, context="GPU test")
             return gpu_kwargs
 
-        return _f()
+        res = _f()
+        if res:
+            _GPU_PROBE_CACHE[self.conf.image] = True
+        return res
 
     def replace_time_info(self, input_string: str) -> str:
         """To remove any time related information from the logs since it will destroy the cache mechanism"""
@@ -859,6 +999,56 @@ class DockerEnv(Env[DockerConf]):
         output_string = re.sub(datetime_pattern, "[DATETIME]", input_string)
         return output_string
 
+    def _get_fixed_volumes(self) -> dict:
+        """The volumes shared by all the runs (i.e. excluding the workspace and the running extra volumes)"""
+        volumes = {}
+        if self.conf.extra_volumes is not None:
+            for lp, rp in self.conf.extra_volumes.items():
+                volumes[lp] = rp if isinstance(rp, dict) else {"bind": rp, "mode": self.conf.extra_volume_mode}
+            cache_path = "/tmp/sample" if "/sample/" in "".join(self.conf.extra_volumes.keys()) else "/tmp/full"
+            Path(cache_path).mkdir(parents=True, exist_ok=True)
+            volumes[cache_path] = {"bind": T("scenarios.data_science.share:scen.cache_path").r(), "mode": "rw"}
+        return volumes
+
+    def _get_pool(  # type: ignore[no-any-unimported]
+        self, client: docker.DockerClient, local_path: str | None, running_extra_volume: Mapping
+    ) -> DockerContainerPool | None:
+        """
+        Return the container pool for the run; None if the run can't be served by a pooled container.
+        A pooled container can't change its mounts, so the runs with running extra volumes or the configurations
+        with a volume at the mount path (or above it) use a new container. So the mount path is private to a pooled
+        container, and each run replaces it by a link to its workspace.
+        """
+        if self.conf.pool_size <= 0 or local_path is None or running_extra_volume:
+            return None
+        fixed_volumes = normalize_volumes(
+            cast(dict[str, str | dict[str, str]], self._get_fixed_volumes()), self.conf.mount_path
+        )
+        mount_path = self.conf.mount_path.rstrip("/")
+        if any((mount_path + "/").startswith(v["bind"].rstrip("/") + "/") for v in fixed_volumes.values()):
+            return None
+        workspace_root = str(Path(local_path).absolute().parent)
+        key = md5_hash(self.conf.model_dump_json() + workspace_root)
+        with _CONTAINER_POOLS_LOCK:
+            if key not in _CONTAINER_POOLS:
+                _CONTAINER_POOLS[key] = DockerContainerPool(
+                    self.conf, workspace_root, fixed_volumes, self._gpu_kwargs(client)
+                )
+            return _CONTAINER_POOLS[key]
+
+    def _print_run_info(self, container: Any, entry: str | None, env: dict, volumes: dict) -> None:
+        print(Rule("[bold green]Docker Logs Begin[/bold green]", style="dark_orange"))
+        table = Table(title="Run Info", show_header=False)
+        table.add_column("Key", style="bold cyan")
+        table.add_column("Value", style="bold magenta")
+        table.add_row("Image", self.conf.image)
+        table.add_row("Container ID", container.id)
+        table.add_row("Container Name", container.name)
+        table.add_row("Entry", entry)
+        table.add_row("Env", "\n".join(f"{k}:{v}" for k, v in env.items()))
+        table.add_row("Volumes", "\n".join(f"{k}:\n  {v}" for k, v in volumes.items()))
+        print(table)
+
     def _run(
         self,
         entry: str | None = None,
@@ -875,17 +1065,15 @@ class DockerEnv(Env[DockerConf]):
         env["PYTHONUNBUFFERED"] = "1"
         client = docker.from_env()
 
+        if (pool := self._get_pool(client, local_path, running_extra_volume)) is not None:
+            return self._run_in_pool(pool, client, entry, local_path, env, remove_timestamp)
+
         volumes = {}
         if local_path is not None:
             local_path = os.path.abspath(local_path)
             volumes[local_path] = {"bind": self.conf.mount_path, "mode": "rw"}
 
-        if self.conf.extra_volumes is not None:
-            for lp, rp in self.conf.extra_volumes.items():
-                volumes[lp] = rp if isinstance(rp, dict) else {"bind": rp, "mode": self.conf.extra_volume_mode}
-            cache_path = "/tmp/sample" if "/sample/" in "".join(self.conf.extra_volumes.keys()) else "/tmp/full"
-            Path(cache_path).mkdir(parents=True, exist_ok=True)
-            volumes[cache_path] = {"bind": T("scenarios.data_science.share:scen.cache_path").r(), "mode": "rw"}
+        volumes.update(self._get_fixed_volumes())
         for lp, rp in running_extra_volume.items():
             volumes[lp] = rp if isinstance(rp, dict) else {"bind": rp, "mode": self.conf.extra_volume_mode}
 
@@ -911,17 +1099,7 @@ class DockerEnv(Env[DockerConf]):
             )
             assert container is not None  # Ensure container was created successfully
             logs = container.logs(stream=True)
-            print(Rule("[bold green]Docker Logs Begin[/bold green]", style="dark_orange"))
-            table = Table(title="Run Info", show_header=False)
-            table.add_column("Key", style="bold cyan")
-            table.add_column("Value", style="bold magenta")
-            table.add_row("Image", self.conf.image)
-            table.add_row("Container ID", container.id)
-            table.add_row("Container Name", container.name)
-            table.add_row("Entry", entry)
-            table.add_row("Env", "\n".join(f"{k}:{v}" for k, v in env.items()))
-            table.add_row("Volumes", "\n".join(f"{k}:\n  {v}" for k, v in volumes.items()))
-            print(table)
+            self._print_run_info(container, entry, env, volumes)
             for log in logs:
                 decoded_log = log.strip().decode()
                 decoded_log = self.replace_time_info(decoded_log) if remove_timestamp else decoded_log
@@ -939,6 +1117,84 @@ class DockerEnv(Env[DockerConf]):
         finally:
             cleanup_container(container)
 
+    def _run_in_pool(  # type: ignore[no-any-unimported]
+        self,
+        pool: DockerContainerPool,
+        client: docker.DockerClient,
+        entry: str | None,
+        local_path: str,
+        env: dict,
+        remove_timestamp: bool = True,
+    ) -> tuple[str, int]:
+        """Run the entry with `exec` in a pooled container; the workspace is linked to the mount path"""
+        pooled_workspace = f"{pool.POOL_MOUNT_PATH}/{Path(local_path).absolute().name}"
+        mount_path = self.conf.mount_path.rstrip("/")
+        # the nested volumes replace the mount points (empty folders) left by the runs in new containers; the links
+        # are in the workspace of the host, so they are turned back into mount points after the entry
+        links = "".join(
+            f" && {{ {{ rm -f {mount_path}/{rel} || rmdir {mount_path}/{rel}; }} 2>/dev/null;"
+            f" mkdir -p {os.path.dirname(f'{mount_path}/{rel}')} && ln -sfn {target} {mount_path}/{rel}; }}"
+            for rel, target in pool.links.items()
+        )
+        unlinks = "".join(
+            f" [ -L {mount_path}/{rel} ] && rm -f {mount_path}/{rel} && mkdir -p {mount_path}/{rel};"
+            for rel in pool.links
+        )
+        command = (
+            f"mkdir -p {os.path.dirname(mount_path)} && rm -rf {mount_path} && ln -s {pooled_workspace} {mount_path}"
+            f"{links} && cd {mount_path}/ && ( {entry} ); status=$?;{unlinks} exit $status"
+        )
+        log_output = ""
+        try:
+            with pool.container(client) as container:
+                # the entry is wrapped by `timeout` in most cases; the watchdog handles the rest by recycling the
+                # container
+                watchdog = threading.Timer(self.conf.running_timeout_period + 60, pool.discard, args=(container,))
+                watchdog.start()
+                try:
+                    exec_id = client.api.exec_create(
+                        container.id, ["/bin/sh", "-c", command], environment=env, workdir="/"
+                    )["Id"]
+                    self._print_run_info(container, entry, env, pool.volumes)
+                    buffer = ""
+                    for chunk in client.api.exec_start(exec_id, stream=True):
+                        # the chunks of `exec` are not aligned to lines like the logs of a container
+                        *lines, buffer = (buffer + chunk.decode(errors="replace")).split("\n")
+                        for line in lines:
+                            decoded_log = self.replace_time_info(line.strip()) if remove_timestamp else line.strip()
+                            Console().print(decoded_log, markup=False)
+                            log_output += decoded_log + "\n"
+                    if buffer.strip():
+                        decoded_log = self.replace_time_info(buffer.strip()) if remove_timestamp else buffer.strip()
+                        Console().print(decoded_log, markup=False)
+                        log_output += decoded_log + "\n"
+                    exit_status = client.api.exec_inspect(exec_id)["ExitCode"]
+                finally:
+                    watchdog.cancel()
+                if exit_status is None:
+                    # the container was recycled by the watchdog
+                    raise RuntimeError("The pooled container was killed before the run finished.")
+            print(Rule("[bold green]Docker Logs End[/bold green]", style="dark_orange"))
+            return log_output, exit_status
+        except docker.errors.ImageNotFound:
+            raise RuntimeError("Docker image not found.")
+        except docker.errors.APIError as e:
+            raise RuntimeError(f"Error while running the container: {e}")
+        finally:
+            self._unlink_pool_volumes(pool, local_path)
+
+    @staticmethod
+    def _unlink_pool_volumes(pool: DockerContainerPool, local_path: str) -> None:
+        """Turn the links of the nested volumes left in the workspace (e.g. by a killed run) back into mount points"""
+        for rel in pool.links:
+            path = Path(local_path) / rel
+            if path.is_symlink():
+                try:
+                    path.unlink()
+                    path.mkdir(parents=True, exist_ok=True)
+                except OSError as e:
+                    logger.warning(f"Failed to remove the link of the pooled volume {path}: {e}")
+
 
 class QTDockerEnv(DockerEnv):
     """Qlib Torch Docker"""
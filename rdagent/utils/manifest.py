@@ -0,0 +1,180 @@
+"""
+A persistent manifest of the files in a workspace.
+
+It records `(path, mtime, size, hash)` of each entry, so the content of a workspace can be fingerprinted
+without reading every file again:
+
+- It is built and refreshed by `Env.cached_run` only; `refresh` always re-hashes the python code (it is the cache
+  key), and only re-hashes the other files whose mtime or size changed since the last cached run of the workspace.
+  Like git's racy check, a file modified in the same timestamp tick as the manifest was saved is hashed again, so
+  an edit that keeps the size and the mtime is never missed.
+- Symlinks (e.g. the linked input data) are fingerprinted by their target and the target's stat;
+  the linked data is never read.
+
+The manifest is stored next to the cached runs (in the pickle cache folder) instead of the workspace, so it never
+becomes part of the workspace itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any
+
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.utils import md5_hash
+
+FILE, LINK, DIR = "file", "link", "dir"
+
+
+def _file_md5(path: Path) -> str:
+    hash_md5 = hashlib.md5(usedforsecurity=False)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+class WorkspaceManifest:
+    """
+    The entries are stored as `relative posix path -> {"kind", "mtime", "size", "hash", "link"}`
+    """
+
+    IGNORED_NAMES = ("__pycache__",)
+
+    def __init__(self, workspace_path: str | Path) -> None:
+        self.workspace_path = Path(workspace_path).absolute()
+        self.manifest_path = (
+            Path(RD_AGENT_SETTINGS.pickle_cache_folder_path_str)
+            / "utils.env.run"
+            / "manifest"
+            / f"{md5_hash(str(self.workspace_path))}.json"
+        )
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.saved_mtime_ns = 0  # the mtime of the saved manifest; the older entries are verified by their stat
+        if self.manifest_path.exists():
+            try:
+                self.saved_mtime_ns = self.manifest_path.stat().st_mtime_ns
+                self.entries = json.loads(self.manifest_path.read_text())
+            except json.JSONDecodeError:
+                self.entries = {}
+
+    def save(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.entries))
+        tmp_path.replace(self.manifest_path)
+        self.saved_mtime_ns = self.manifest_path.stat().st_mtime_ns
+
+    def _stat_entry(self, rel: str) -> dict[str, Any] | None:
+        """
+        Build the entry of `rel` from the file system.
+        The hash of a file which is not python code is reused if its mtime and size are unchanged and it was modified
+        before the manifest was saved.
+        """
+        path = self.workspace_path / rel
+        try:
+            st = path.lstat()
+        except FileNotFoundError:
+            return None
+        if path.is_symlink():
+            link = os.readlink(path)
+            try:
+                target_st = path.stat()
+                target_info = f"{target_st.st_size}:{target_st.st_mtime_ns}"
+            except FileNotFoundError:
+                target_info = "missing"
+            return {
+                "kind": LINK,
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "hash": md5_hash(f"{link}:{target_info}"),
+                "link": link,
+            }
+        if path.is_dir():
+            return {"kind": DIR, "mtime": st.st_mtime_ns, "size": 0, "hash": None}
+        old = self.entries.get(rel)
+        if (
+            old is not None
+            and not rel.endswith(".py")
+            and old["kind"] == FILE
+            and old["mtime"] == st.st_mtime_ns
+            and old["size"] == st.st_size
+            and st.st_mtime_ns < self.saved_mtime_ns
+        ):
+            return old
+        return {"kind": FILE, "mtime": st.st_mtime_ns, "size": st.st_size, "hash": _file_md5(path)}
+
+    def refresh(self) -> dict[str, dict[str, Any]]:
+        """
+        Sync the manifest with the workspace.
+        Only the python code and the files whose mtime or size changed are read again.
+        """
+        entries = {}
+        if self.workspace_path.exists():
+            for root, dirs, files in os.walk(self.workspace_path):
+                dirs[:] = [d for d in dirs if d not in self.IGNORED_NAMES]
+                for name in dirs + files:
+                    rel = (Path(root) / name).relative_to(self.workspace_path).as_posix()
+                    if (entry := self._stat_entry(rel)) is not None:
+                        entries[rel] = entry
+                # symlinked folders are listed in `dirs` but os.walk does not descend into them
+        self.entries = entries
+        self.save()
+        return self.entries
+
+    def fingerprint(self) -> dict[str, Any]:
+        """
+        The content used to build a cache key
+        - the hash of the python code
+        - the names of all the other entries (data is identified by name, like the previous key)
+        """
+        return {
+            "code": [[rel, e["hash"]] for rel, e in sorted(self.entries.items()) if rel.endswith(".py")],
+            "names": sorted(self.entries),
+        }
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """The state to restore; mtime is not part of the state"""
+        return {rel: {k: v for k, v in e.items() if k != "mtime"} for rel, e in self.entries.items()}
+
+    def restore(self, snapshot: dict[str, dict[str, Any]], zip_file_path: str | Path) -> None:
+        """
+        Turn the workspace into the `snapshot` state.
+        Only the entries that differ from the snapshot are removed or extracted from `zip_file_path`.
+        """
+        current = self.entries
+        # 1) remove the entries that are not in the snapshot or have a different kind
+        for rel in sorted(current, key=lambda r: r.count("/"), reverse=True):
+            if rel in snapshot and snapshot[rel]["kind"] == current[rel]["kind"]:
+                continue
+            path = self.workspace_path / rel
+            if current[rel]["kind"] == DIR and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.is_symlink() or path.exists():
+                path.unlink()
+
+        # 2) create the missing or changed entries
+        with zipfile.ZipFile(zip_file_path, "r") as z:
+            for rel, target in sorted(snapshot.items()):
+                path = self.workspace_path / rel
+                old = current.get(rel)
+                if old is not None and old["kind"] == target["kind"] and old["hash"] == target["hash"]:
+                    if target["kind"] != FILE or old["size"] == target["size"]:
+                        continue
+                if target["kind"] == DIR:
+                    path.mkdir(parents=True, exist_ok=True)
+                elif target["kind"] == LINK:
+                    if path.is_symlink() or path.exists():
+                        path.unlink()
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    os.symlink(target["link"], path)
+                else:
+                    if path.is_symlink():
+                        path.unlink()
+                    z.extract(rel, self.workspace_path)
+        self.refresh()
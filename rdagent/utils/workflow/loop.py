@@ -9,13 +9,17 @@ Postscripts:
 """
 
 import asyncio
-import concurrent.futures
 import datetime
+import hashlib
+import io
+import os
 import pickle
+import uuid
 from collections import defaultdict
-from dataclasses import dataclass
+from collections.abc import Container, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable, Optional, Union, cast
+from typing import IO, Any, Callable, Optional, Union, cast
 
 from tqdm.auto import tqdm
 
@@ -23,6 +27,7 @@ from rdagent.core.conf import RD_AGENT_SETTINGS
 from rdagent.log import rdagent_logger as logger
 from rdagent.log.conf import LOG_SETTINGS
 from rdagent.log.timer import RD_Agent_TIMER_wrapper, RDAgentTimer
+from rdagent.utils.workflow.scheduler import StepScheduler
 from rdagent.utils.workflow.tracking import WorkflowTracker
 
 
@@ -77,6 +82,74 @@ class LoopTrace:
     # TODO: more information about the trace
 
 
+# the values which are not saved as history objects
+_ATOMIC_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+@dataclass
+class CheckpointHistory:
+    """
+    The history objects (e.g. the entries in `trace.hist`) shared by the session checkpoints.
+
+    Each version of a history object is pickled once into `__session__/__history__/<key>.<digest>.pkl`;
+    the checkpoint of each step refers to it by key and maps the keys to their versions. So a checkpoint only
+    contains the delta of the step (new history entries, step indices, outputs of the running loops, timer state...).
+
+    The history objects may still be changed after they are added to the history (e.g. a runner sets the `result`
+    of a based experiment taken from `trace.hist`); such a change is saved as a new version, and the earlier
+    checkpoints keep the version of their time.
+    """
+
+    FOLDER = "__history__"
+
+    objects: dict[int, tuple[str, Any]] = field(default_factory=dict)  # id(obj) -> (key, obj)
+    saved: set[tuple[Path, str]] = field(default_factory=set)  # (history folder, version) that are saved
+
+    def key_of(self, obj: Any) -> str | None:
+        item = self.objects.get(id(obj))
+        return item[0] if item is not None and item[1] is obj else None
+
+    def register(self, obj: Any, key: str | None = None) -> str:
+        if (existing_key := self.key_of(obj)) is not None:
+            return existing_key
+        key = uuid.uuid4().hex if key is None else key
+        self.objects[id(obj)] = (key, obj)  # keep a reference, so the id is not reused
+        return key
+
+
+class _CheckpointPickler(pickle.Pickler):
+    """Pickle `root` with references to the other history objects (the ones with a key in `keys`)"""
+
+    def __init__(self, file: IO[bytes], history: CheckpointHistory, keys: Container[str], root: Any) -> None:
+        super().__init__(file)
+        self.history = history
+        self.keys = keys
+        self.root = root
+
+    def persistent_id(self, obj: Any) -> tuple[str, str] | None:
+        if obj is self.root:
+            return None
+        key = self.history.key_of(obj)
+        return (CheckpointHistory.FOLDER, key) if key is not None and key in self.keys else None
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    """Resolve the references to the history objects; each history object is loaded once"""
+
+    def __init__(self, file: IO[bytes], folder: Path, versions: dict[str, str], loaded: dict[str, Any]) -> None:
+        super().__init__(file)
+        self.folder = folder
+        self.versions = versions
+        self.loaded = loaded
+
+    def persistent_load(self, pid: Any) -> Any:
+        _, key = pid
+        if key not in self.loaded:
+            with (self.folder / f"{self.versions[key]}.pkl").open("rb") as f:
+                self.loaded[key] = _CheckpointUnpickler(f, self.folder, self.versions, self.loaded).load()
+        return self.loaded[key]
+
+
 class LoopBase:
     """
     Assumption:
@@ -95,6 +168,9 @@ class LoopBase:
         type[BaseException], ...
     ] = ()  # you can define a list of error that will withdraw current loop
 
+    # the resource ("llm", "cpu" or "container") of the steps which are not classified by the scheduler
+    step_resources: dict[str, str] = {}
+
     EXCEPTION_KEY = "_EXCEPTION"
     SENTINEL = -1
 
@@ -123,7 +199,7 @@ class LoopBase:
         self.loop_n: Optional[int] = None  # remain loop count
         self.step_n: Optional[int] = None  # remain step count
 
-        self.semaphores: dict[str, asyncio.Semaphore] = {}
+        self.scheduler = StepScheduler(self.step_resources)
 
     def get_unfinished_loop_cnt(self, next_loop: int) -> int:
         n = 0
@@ -132,18 +208,14 @@ class LoopBase:
                 n += 1
         return n
 
-    def get_semaphore(self, step_name: str) -> asyncio.Semaphore:
-        if isinstance(limit := RD_AGENT_SETTINGS.step_semaphore, dict):
-            limit = limit.get(step_name, 1)  # default to 1 if not specified
-
-        # NOTE: we assume the record step is always the last step to modify the global environment,
-        # so we set the limit to 1 to avoid race condition
-        if step_name == "record":
-            limit = 1
+    def get_step_priority(self, li: int, si: int) -> Any:
+        """
+        The priority key of running step `si` of loop `li` when the steps wait for the same slot (smaller first).
 
-        if step_name not in self.semaphores:
-            self.semaphores[step_name] = asyncio.Semaphore(limit)
-        return self.semaphores[step_name]
+        By default, the loops closer to the end go first (so the results come out early), then the earlier loops.
+        Override it to favour the promising loops, e.g. by the score of their traces.
+        """
+        return (-si, li)
 
     @property
     def pbar(self) -> tqdm:
@@ -198,7 +270,7 @@ class LoopBase:
         si = self.step_idx[li]
         name = self.steps[si]
 
-        async with self.get_semaphore(name):
+        async with self.scheduler.slot(name, self.get_step_priority(li, si)):
 
             logger.info(f"Start Loop {li}, Step {si}: {name}")
             self.tracker.log_workflow_state()
@@ -210,11 +282,10 @@ class LoopBase:
                 next_step_idx = si + 1
                 step_forward = True
                 try:
-                    # Call function with current loop's output, await if coroutine or use ProcessPoolExecutor for sync if required
+                    # Call function with current loop's output, await if coroutine or use the process pool for sync
+                    # if required
                     if force_subproc:
-                        curr_loop = asyncio.get_running_loop()
-                        with concurrent.futures.ProcessPoolExecutor() as pool:
-                            result = await curr_loop.run_in_executor(pool, func, self.loop_prev_out[li])
+                        result = await self.scheduler.run_in_subproc(name, func, self.loop_prev_out[li])
                     else:
                         # auto determine whether to run async or sync
                         if asyncio.iscoroutinefunction(func):
@@ -330,21 +401,26 @@ class LoopBase:
             0  # if we rerun the loop, we should revert the loop index to 0 to make sure every loop is correctly kicked
         )
 
-        while True:
-            try:
-                # run one kickoff_loop and execute_loop
-                await asyncio.gather(
-                    self.kickoff_loop(), *[self.execute_loop() for _ in range(RD_AGENT_SETTINGS.get_max_parallel())]
-                )
-                break
-            except self.LoopResumeError as e:
-                logger.warning(f"Stop all the routines and resume loop: {e}")
-                self.loop_idx = 0
-            except self.LoopTerminationError as e:
-                logger.warning(f"Reach stop criterion and stop loop: {e}")
-                break
-            finally:
-                self.close_pbar()
+        try:
+            while True:
+                try:
+                    # run one kickoff_loop and execute_loop
+                    await asyncio.gather(
+                        self.kickoff_loop(),
+                        *[self.execute_loop() for _ in range(RD_AGENT_SETTINGS.get_max_parallel())],
+                    )
+                    break
+                except self.LoopResumeError as e:
+                    logger.warning(f"Stop all the routines and resume loop: {e}")
+                    self.loop_idx = 0
+                except self.LoopTerminationError as e:
+                    logger.warning(f"Reach stop criterion and stop loop: {e}")
+                    break
+                finally:
+                    self.close_pbar()
+        finally:
+            logger.info(f"Step scheduler metrics: {self.scheduler.metrics()}")
+            self.scheduler.close()
 
     def withdraw_loop(self, loop_idx: int) -> None:
         prev_session_dir = self.session_folder / str(loop_idx - 1)
@@ -360,27 +436,89 @@ class LoopBase:
                 replace_timer=True,
             )
             logger.info(f"Load previous session from {prev_path}")
-            # Overwrite current instance state
+            # Overwrite current instance state; the scheduler (its slots and process pools) is kept for the steps
+            # still running
+            loaded.scheduler = self.scheduler
             self.__dict__ = loaded.__dict__
         else:
             logger.error(f"No previous dump found at {prev_session_dir}, cannot withdraw loop {loop_idx}")
             raise
 
+    def _iter_history_objects(self) -> Iterator[Any]:
+        """
+        The objects that are rarely changed once created; each version is saved once and shared by the checkpoints.
+        By default, they are the entries of `self.trace.hist` and their items (e.g. the experiment and feedback).
+        The atomic values (e.g. a boolean decision) are not worth a file; they are pickled where they are referenced.
+        """
+        for entry in getattr(getattr(self, "trace", None), "hist", []):
+            for obj in (entry, *entry) if isinstance(entry, tuple) else (entry,):
+                if not isinstance(obj, _ATOMIC_TYPES):
+                    yield obj
+
     def dump(self, path: str | Path) -> None:
         if RD_Agent_TIMER_wrapper.timer.started:
             RD_Agent_TIMER_wrapper.timer.update_remain_time()
         path = Path(path)
         path.parent.mkdir(parents=True, exist_ok=True)
+
+        history = getattr(self, "_checkpoint_history", None)
+        if history is None:
+            history = self._checkpoint_history = CheckpointHistory()
+        history_folder = path.parent.parent / CheckpointHistory.FOLDER
+        # the same object may be listed more than once
+        objects = {history.register(obj): obj for obj in self._iter_history_objects()}
+        versions = {}
+        for key, obj in objects.items():
+            # each object is pickled again to find the changed ones, but only the new versions are written
+            buffer = io.BytesIO()
+            _CheckpointPickler(buffer, history, objects, root=obj).dump(obj)
+            data = buffer.getvalue()
+            versions[key] = version = f"{key}.{hashlib.md5(data).hexdigest()}"  # noqa: S324
+            if (history_folder, version) in history.saved:
+                continue
+            history_folder.mkdir(parents=True, exist_ok=True)
+            history_path = history_folder / f"{version}.pkl"
+            if not history_path.exists():
+                tmp_path = history_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(history_path)
+            history.saved.add((history_folder, version))
+
         with path.open("wb") as f:
-            pickle.dump(self, f)
+            pickle.dump(versions, f)
+            _CheckpointPickler(f, history, objects, root=self).dump(self)
+
+    @staticmethod
+    def read(path: str | Path) -> "LoopBase":
+        """
+        Read the session object in the checkpoint `path`.
+        Unlike `load`, the environment (timer, log storages...) is not changed.
+        """
+        path = Path(path)
+        history_folder = path.parent.parent / CheckpointHistory.FOLDER
+        loaded: dict[str, Any] = {}
+        with path.open("rb") as f:
+            versions = pickle.load(f)
+            if isinstance(versions, dict):
+                session = cast(LoopBase, _CheckpointUnpickler(f, history_folder, versions, loaded).load())
+            else:
+                # the checkpoints saved as one pickle of the whole session
+                session = cast(LoopBase, versions)
+        history = CheckpointHistory()
+        for key, obj in loaded.items():
+            history.register(obj, key)
+            history.saved.add((history_folder, versions[key]))
+        session._checkpoint_history = history
+        return session
 
     def truncate_session_folder(self, li: int, si: int) -> None:
         """
         Clear the session folder by removing all session objects after the given loop index (li) and step index (si).
         """
         # clear session folders after the li
+        # NOTE: the history objects are kept, the earlier checkpoints may refer to them
         for sf in self.session_folder.iterdir():
-            if sf.is_dir() and int(sf.name) > li:
+            if sf.is_dir() and sf.name.isdigit() and int(sf.name) > li:
                 for file in sf.iterdir():
                     file.unlink()
                 sf.rmdir()
@@ -429,11 +567,13 @@ class LoopBase:
                 raise FileNotFoundError(f"No session file found in {path}")
 
             # iterate the dump steps in increasing order
-            files = sorted(path.glob("*/*_*"), key=lambda f: (int(f.parent.name), int(f.name.split("_")[0])))
+            files = sorted(
+                (f for f in path.glob("*/*_*") if f.parent.name.isdigit()),
+                key=lambda f: (int(f.parent.name), int(f.name.split("_")[0])),
+            )
             path = files[-1]
             logger.info(f"Loading latest session from {path}")
-        with path.open("rb") as f:
-            session = cast(LoopBase, pickle.load(f))
+        session = cls.read(path)
 
         # set session folder
         if checkout:
@@ -463,11 +603,11 @@ class LoopBase:
     def __getstate__(self) -> dict[str, Any]:
         res = {}
         for k, v in self.__dict__.items():
-            if k not in ["queue", "semaphores", "_pbar"]:
+            if k not in ["queue", "scheduler", "_pbar", "_checkpoint_history"]:
                 res[k] = v
         return res
 
     def __setstate__(self, state: dict[str, Any]) -> None:
         self.__dict__.update(state)
         self.queue = asyncio.Queue()
-        self.semaphores = {}
+        self.scheduler = StepScheduler(self.step_resources)
@@ -0,0 +1,224 @@
+"""
+Scheduling of the workflow steps of the parallel loops.
+
+The steps compete for a few kinds of resources: the LLM (proposing, feedback), the CPU (coding) and the containers
+(running the experiments). The scheduler
+
+- limits the running steps of each step name (`step_semaphore`) and of each resource (`step_resource_limit`);
+- grants a free slot to the waiting step with the highest priority (the smallest priority key, then the earliest
+  request) instead of the first one asking;
+- keeps a process pool per resource for the steps running in subprocesses, instead of starting a pool per step;
+- records the queue depth, the waiting time and the utilisation of the slots for tuning.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import heapq
+import itertools
+import random
+import sys
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.log import rdagent_logger as logger
+from rdagent.log.timer import RD_Agent_TIMER_wrapper, RDAgentTimer
+
+LLM, CPU, CONTAINER = "llm", "cpu", "container"
+
+# the resource of the common steps; the others are regarded as CPU-bound
+STEP_RESOURCES: dict[str, str] = {
+    "direct_exp_gen": LLM,
+    "exp_gen": LLM,
+    "propose": LLM,
+    "exp_propose": LLM,
+    "feedback": LLM,
+    "coding": CPU,
+    "running": CONTAINER,
+}
+
+
+class PrioritySemaphore:
+    """
+    An asyncio semaphore granting the free slots to the waiters with the smallest priority key.
+    `value=None` means unlimited.
+    """
+
+    def __init__(self, value: int | None) -> None:
+        self.value = value
+        self.in_use = 0
+        self._waiters: list[tuple[Any, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        # statistics
+        self.created_at = self._changed_at = time.monotonic()
+        self.n_acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.busy_time = 0.0  # the integral of `in_use` over time
+
+    @property
+    def n_waiting(self) -> int:
+        return sum(not future.done() for *_, future in self._waiters)
+
+    def _free(self) -> bool:
+        return self.value is None or self.in_use < self.value
+
+    def _update_busy_time(self) -> None:
+        now = time.monotonic()
+        self.busy_time += self.in_use * (now - self._changed_at)
+        self._changed_at = now
+
+    def _take(self) -> None:
+        self._update_busy_time()
+        self.in_use += 1
+
+    def _wake_up(self) -> None:
+        while self._waiters and self._free():
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # the slot is taken for the waiter now, so no later request can overtake it
+                self._take()
+                future.set_result(None)
+
+    async def acquire(self, priority: Any = ()) -> None:
+        start = time.monotonic()
+        if not self.n_waiting and self._free():
+            self._take()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._counter), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()  # granted before the cancellation
+                raise
+        waited = time.monotonic() - start
+        self.n_acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self) -> None:
+        self._update_busy_time()
+        self.in_use -= 1
+        self._wake_up()
+
+    def metrics(self) -> dict[str, float | int | None]:
+        self._update_busy_time()
+        elapsed = max(time.monotonic() - self.created_at, 1e-9)
+        return {
+            "limit": self.value,
+            "running": self.in_use,
+            "queue_depth": self.n_waiting,
+            "acquired": self.n_acquired,
+            "mean_wait": self.total_wait / self.n_acquired if self.n_acquired else 0.0,
+            "max_wait": self.max_wait,
+            # the mean number of running steps if unlimited
+            "utilisation": self.busy_time / elapsed / (self.value or 1),
+        }
+
+
+def _run_step_in_worker(
+    func: Callable, arg: Any, tag: str, storage_path: Any, timer: RDAgentTimer, random_state: tuple
+) -> Any:
+    """
+    Run a step in a worker of a persistent pool with the state a newly forked process would have had:
+    the log tag and storage path, the timer and the random state (the seeds of the LLM cache) of the caller.
+    """
+
+    def _run() -> Any:
+        with logger.tag(tag) if tag else contextlib.nullcontext():
+            return func(arg)
+
+    logger.set_storages_path(storage_path)
+    RD_Agent_TIMER_wrapper.timer = timer
+    random.setstate(random_state)
+    try:
+        # a fresh context, so the tag of the previous step run by the worker is not inherited
+        return contextvars.Context().run(_run)
+    finally:
+        # the worker outlives the step, so the buffered LLM cache writes are committed for the other processes
+        # (there is nothing to commit if the LLM backend is never imported)
+        if (backend := sys.modules.get("rdagent.oai.backend.base")) is not None:
+            backend.SQliteLazyCache.flush_all()
+
+
+class StepScheduler:
+    def __init__(self, step_resources: dict[str, str] | None = None) -> None:
+        self.step_resources = {**STEP_RESOURCES, **(step_resources or {}), **RD_AGENT_SETTINGS.step_resource}
+        self.step_slots: dict[str, PrioritySemaphore] = {}
+        self.resource_slots: dict[str, PrioritySemaphore] = {}
+        self.pools: dict[str, concurrent.futures.ProcessPoolExecutor] = {}
+
+    def get_resource(self, step_name: str) -> str:
+        return self.step_resources.get(step_name, CPU)
+
+    def _step_slot(self, step_name: str) -> PrioritySemaphore:
+        if step_name not in self.step_slots:
+            if isinstance(limit := RD_AGENT_SETTINGS.step_semaphore, dict):
+                limit = limit.get(step_name, 1)  # default to 1 if not specified
+            # NOTE: we assume the record step is always the last step to modify the global environment,
+            # so we set the limit to 1 to avoid race condition
+            if step_name == "record":
+                limit = 1
+            self.step_slots[step_name] = PrioritySemaphore(limit)
+        return self.step_slots[step_name]
+
+    def _resource_slot(self, resource: str) -> PrioritySemaphore:
+        if resource not in self.resource_slots:
+            self.resource_slots[resource] = PrioritySemaphore(RD_AGENT_SETTINGS.step_resource_limit.get(resource))
+        return self.resource_slots[resource]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, step_name: str, priority: Any = ()) -> AsyncIterator[None]:
+        """Wait for a slot of the step and of its resource"""
+        step_slot = self._step_slot(step_name)
+        resource_slot = self._resource_slot(self.get_resource(step_name))
+        await step_slot.acquire(priority)
+        try:
+            await resource_slot.acquire(priority)
+            try:
+                yield
+            finally:
+                resource_slot.release()
+        finally:
+            step_slot.release()
+
+    def _pool(self, resource: str) -> concurrent.futures.ProcessPoolExecutor:
+        if resource not in self.pools:
+            limit = RD_AGENT_SETTINGS.step_resource_limit.get(resource)
+            self.pools[resource] = concurrent.futures.ProcessPoolExecutor(
+                max_workers=limit or RD_AGENT_SETTINGS.get_max_parallel()
+            )
+        return self.pools[resource]
+
+    async def run_in_subproc(self, step_name: str, func: Callable, arg: Any) -> Any:
+        """Run `func(arg)` in the process pool of the resource of the step"""
+        resource = self.get_resource(step_name)
+        pool = self._pool(resource)
+        call = (func, arg, logger._tag, logger.storage.path, RD_Agent_TIMER_wrapper.timer, random.getstate())
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, _run_step_in_worker, *call)
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory); the next step starts a new pool
+            if self.pools.get(resource) is pool:
+                del self.pools[resource]
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def metrics(self) -> dict[str, dict[str, dict]]:
+        return {
+            "resources": {name: slot.metrics() for name, slot in self.resource_slots.items()},
+            "steps": {name: slot.metrics() for name, slot in self.step_slots.items()},
+        }
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        self.pools = {}
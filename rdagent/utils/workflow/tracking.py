@@ -80,6 +80,12 @@ class WorkflowTracker:
             float_like_datetime = self._datetime_to_float(latest_api_fail_time)
             mlflow.log_metric("lastest_api_fail_time", float_like_datetime)
 
+        # Log the queues and the utilisation of the step scheduler
+        for kind, slots in self.loop_base.scheduler.metrics().items():
+            for name, metrics in slots.items():
+                for key in ["running", "queue_depth", "mean_wait", "max_wait", "utilisation"]:
+                    mlflow.log_metric(f"scheduler.{kind}.{name}.{key}", metrics[key])
+
         # Log timer status if timer is started
         if self.loop_base.timer.started:
             remain_time = self.loop_base.timer.remain_time()
@@ -0,0 +1,123 @@
+import json
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from rdagent.log.storage import FileStorage, LogRecord
+from rdagent.log.ui.session_index import SessionIndex
+from rdagent.utils.workflow.loop import LoopTrace
+
+
+class Workspace:
+    def __init__(self, all_codes: str) -> None:
+        self.all_codes = all_codes
+
+
+class Experiment:
+    def __init__(self, code: str, score: float) -> None:
+        self.experiment_workspace = Workspace(code)
+        self.result = pd.DataFrame({"score": [score]}, index=["ensemble"])
+
+
+class DSTrace:
+    def __init__(self, sota_exp_to_submit: Experiment | None) -> None:
+        self.sota_exp_to_submit = sota_exp_to_submit
+
+
+class Session:
+    def __init__(self, loop_trace: dict[int, list[LoopTrace]]) -> None:
+        self.loop_trace = loop_trace
+
+
+@pytest.mark.offline
+class SessionIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp_dir.name) / "session"
+        self.index = SessionIndex(db_path=f"{self.tmp_dir.name}/index.db")
+        self.t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.loop_trace: dict[int, list[LoopTrace]] = {}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _log_loop(self, storage: FileStorage, li: int, submitted: Experiment) -> None:
+        t = self.t0 + timedelta(minutes=10 * li)
+        exp = Experiment(f"code {li}", 0.5 + li)
+        storage.log(exp, tag=f"Loop_{li}.running.123", timestamp=t)
+        grade = {"bronze_medal": li == 0, "above_median": True, "submission_exists": True}
+        mle_score = f"```json\n{json.dumps(grade)}\n```"
+        storage.log(mle_score, tag=f"Loop_{li}.running.mle_score.123", timestamp=t + timedelta(seconds=1))
+        storage.log(exp, tag=f"Loop_{li}.record.SOTA experiment.123", timestamp=t + timedelta(seconds=2))
+        storage.log(DSTrace(submitted), tag=f"Loop_{li}.record.trace.123", timestamp=t + timedelta(seconds=3))
+
+        self.loop_trace[li] = [LoopTrace(t, t + timedelta(seconds=s + 1), s) for s in range(3)]
+        checkpoint = self.log_path / "__session__" / str(li) / "2_record"
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        checkpoint.write_bytes(pickle.dumps(Session(self.loop_trace)))
+
+    def test_incremental_index(self) -> None:
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                self.log_path = Path(self.tmp_dir.name) / f"session_{indexed}"
+                self.loop_trace = {}
+                storage = FileStorage(self.log_path, indexed=indexed)
+                self._log_loop(storage, 0, Experiment("code 0", 0.5))
+
+                self.assertEqual(self.index.final_sota_score(self.log_path), 0.5)
+                self.assertEqual(self.index.sota_exp_stat(self.log_path), "bronze")
+                self.assertEqual(self.index.loop_times(self.log_path), self.loop_trace)
+                self.assertEqual(self.index.final_sota_record(self.log_path).load().result.iloc[0, 0], 0.5)
+
+                # nothing is unpickled while the session is unchanged
+                with mock.patch.object(LogRecord, "load", side_effect=AssertionError):
+                    self.assertEqual(self.index.sota_exp_stat(self.log_path), "bronze")
+                    self.assertEqual(self.index.loop_times(self.log_path), self.loop_trace)
+
+                # the new loop is indexed; the submitted experiment of the final trace is still the one of loop 0
+                self._log_loop(storage, 1, Experiment("code 0", 0.5))
+                self.assertEqual(self.index.final_sota_score(self.log_path), 1.5)
+                self.assertEqual(self.index.sota_exp_stat(self.log_path), "bronze")
+                self.assertEqual(sorted(self.index.loop_times(self.log_path)), [0, 1])
+
+                self._log_loop(storage, 2, Experiment("code 2", 2.5))
+                self.assertEqual(self.index.sota_exp_stat(self.log_path), "above_median")
+
+                # a session checked out at an earlier loop is indexed again
+                storage.truncate(self.t0 + timedelta(minutes=5))
+                for li in (1, 2):
+                    for path in (self.log_path / "__session__" / str(li)).iterdir():
+                        path.unlink()
+                    (self.log_path / "__session__" / str(li)).rmdir()
+                self.assertEqual(self.index.final_sota_score(self.log_path), 0.5)
+                self.assertEqual(self.index.sota_exp_stat(self.log_path), "bronze")
+
+    def test_late_records(self) -> None:
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                self.log_path = Path(self.tmp_dir.name) / f"late_{indexed}"
+                storage = FileStorage(self.log_path, indexed=indexed)
+                self._log_loop(storage, 0, Experiment("code 0", 0.5))
+                t = self.t0 + timedelta(minutes=10)
+                storage.log(DSTrace(Experiment("code 1", 1.5)), tag="Loop_1.record.trace.123", timestamp=t)
+                self.assertEqual(self.index.final_sota_score(self.log_path), 0.5)
+                self.assertIsNone(self.index.sota_exp_stat(self.log_path))
+
+                # the records of loop 1 logged by another process arrive after the newer trace is indexed
+                mle_score = '```json\n{"above_median": true, "submission_exists": true}\n```'
+                exp = Experiment("code 1", 1.5)
+                storage.log(exp, tag="Loop_1.running.456", timestamp=t - timedelta(seconds=3))
+                storage.log(mle_score, tag="Loop_1.running.mle_score.456", timestamp=t - timedelta(seconds=2))
+                storage.log(exp, tag="Loop_1.record.SOTA experiment.456", timestamp=t - timedelta(seconds=1))
+                self.assertEqual(self.index.final_sota_score(self.log_path), 1.5)
+                self.assertEqual(self.index.sota_exp_stat(self.log_path), "above_median")
+
+
+if __name__ == "__main__":
+    unittest.main()
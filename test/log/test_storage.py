@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rdagent.log.storage import FileStorage
+
+
+@pytest.mark.offline
+class FileStorageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _log_loops(self, storage: FileStorage) -> None:
+        for i in range(6):
+            storage.log({"i": i}, tag=f"Loop_{i // 2}.running.123", timestamp=self.t0 + timedelta(seconds=i))
+
+    def test_formats(self) -> None:
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                storage = FileStorage(f"{self.tmp_dir.name}/{indexed}", indexed=indexed)
+                self._log_loops(storage)
+                msgs = list(storage.iter_msg())
+                self.assertEqual([m.content["i"] for m in msgs], list(range(6)))
+                self.assertEqual(msgs[0].tag, "Loop_0.running")
+                self.assertEqual(msgs[0].pid_trace, "123")
+
+                records = storage.iter_records(tag="Loop_1")
+                self.assertEqual([r.loop_id for r in records], [1, 1])
+                self.assertEqual(records[-1].load(), {"i": 3})
+                records = storage.iter_records(start=self.t0 + timedelta(seconds=2), end=self.t0 + timedelta(seconds=4))
+                self.assertEqual([r.load()["i"] for r in records], [2, 3, 4])
+
+                storage.truncate(self.t0 + timedelta(seconds=2))
+                self.assertEqual([m.content["i"] for m in storage.iter_msg()], [0, 1, 2])
+                storage.log({"i": 9}, tag="Loop_3.running.123", timestamp=self.t0 + timedelta(seconds=9))
+                self.assertEqual([m.content["i"] for m in storage.iter_msg()], [0, 1, 2, 9])
+
+    def test_tail_records(self) -> None:
+        for indexed in (False, True):
+            with self.subTest(indexed=indexed):
+                storage = FileStorage(f"{self.tmp_dir.name}/{indexed}", indexed=indexed)
+                self._log_loops(storage)
+                records, position = storage.tail_records()
+                self.assertEqual([r.load()["i"] for r in records], list(range(6)))
+                self.assertEqual(storage.tail_records(json.loads(json.dumps(position)))[0], [])
+
+                # a record arrives later than a newer one (e.g. from a parallel loop in another process)
+                storage.log({"i": 6}, tag="Loop_3.running.123", timestamp=self.t0 + timedelta(seconds=10))
+                storage.log({"i": 7}, tag="Loop_2.running.456", timestamp=self.t0 + timedelta(seconds=5.995))
+                records, position = storage.tail_records(position)
+                self.assertEqual([r.load()["i"] for r in records], [7, 6])
+                storage.log({"i": 8}, tag="Loop_3.running.789", timestamp=self.t0 + timedelta(seconds=9.995))
+                records, position = storage.tail_records(position)
+                self.assertEqual([r.load()["i"] for r in records], [8])
+                self.assertEqual(storage.tail_records(position)[0], [])
+                self.assertEqual(len(storage.iter_records()), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
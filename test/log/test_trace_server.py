@@ -0,0 +1,100 @@
+import gzip
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from rdagent.log.server import app as server
+from rdagent.log.server.trace_index import TraceIndexRegistry
+from rdagent.log.storage import FileStorage
+from rdagent.log.ui.conf import UI_SETTING
+
+
+@pytest.mark.offline
+class TraceServerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.origin = UI_SETTING.trace_folder, UI_SETTING.trace_poll_interval, server.trace_indexes
+        UI_SETTING.trace_folder = self.tmp_dir.name
+        UI_SETTING.trace_poll_interval = 0
+        server.trace_indexes = TraceIndexRegistry(Path(self.tmp_dir.name) / "__index__")
+        self.client = server.app.test_client()
+
+    def tearDown(self) -> None:
+        UI_SETTING.trace_folder, UI_SETTING.trace_poll_interval, server.trace_indexes = self.origin
+        self.tmp_dir.cleanup()
+
+    def _page(self, trace_id: str, cursor: int, size: int) -> dict:
+        return self.client.get(f"/traces/{trace_id}/messages?cursor={cursor}&size={size}").json
+
+    def test_follow_log_folder(self) -> None:
+        t0 = datetime.now(timezone.utc)
+        (Path(self.tmp_dir.name) / "fin" / "t1" / "__session__").mkdir(parents=True)
+        storages = [FileStorage(Path(self.tmp_dir.name) / "fin" / "t1", indexed=indexed) for indexed in (False, True)]
+        for i in range(5):
+            storages[i % 2].log(
+                SimpleNamespace(experiment_setting=i), tag="scenario.123", timestamp=t0 + timedelta(seconds=i)
+            )
+
+        configs, cursor = [], 0
+        for _ in range(3):
+            page = self._page("fin/t1", cursor, 2)
+            configs += [m["content"]["config"] for m in page["messages"]]
+            cursor = page["next_cursor"]
+        self.assertEqual(configs, [0, 1, 2, 3, 4])
+        self.assertFalse(page["end"])
+
+        # the messages logged later are appended after the cursor
+        for i in range(5, 8):
+            storages[i % 2].log(
+                SimpleNamespace(experiment_setting=i), tag="scenario.123", timestamp=t0 + timedelta(seconds=i)
+            )
+        page = self._page("fin/t1", cursor, 100)
+        self.assertEqual([m["content"]["config"] for m in page["messages"]], [5, 6, 7])
+        # the legacy polling endpoint
+        msgs = self.client.post("/trace", json={"id": "fin/t1", "all": True}).json
+        self.assertEqual([m["content"]["config"] for m in msgs], list(range(8)))
+
+    def test_push_and_stream(self) -> None:
+        trace_id = str(Path(self.tmp_dir.name) / "ds" / "t2")
+        batch = [{"id": trace_id, "msg": {"tag": "research.hypothesis", "content": i}} for i in range(3)]
+        headers = {"Content-Encoding": "gzip", "X-RDAgent-Sender": "s", "X-RDAgent-Seq": "1"}
+        for _ in range(2):  # the second one is a duplicate
+            self.client.post("/receive", data=gzip.compress(json.dumps(batch).encode()), headers=headers)
+        server.trace_indexes.get(trace_id).end()
+
+        events = self.client.get("/traces/ds/t2/stream").get_data(as_text=True).strip().split("\n\n")
+        data = [json.loads(e.split("data: ")[1]) for e in events]
+        self.assertEqual([d.get("content") for d in data[:3]], [0, 1, 2])
+        self.assertEqual(data[3]["tag"], "END")
+        self.assertIn("event: end", events[-1])
+
+        # a reconnecting client resumes after the last event it got
+        last_id = events[1].split("\n")[0].split(": ")[1]
+        events = self.client.get("/traces/ds/t2/stream", headers={"Last-Event-ID": last_id}).get_data(as_text=True)
+        self.assertEqual(events.count("data: "), 3)  # 2, END and the end event
+
+    def test_not_a_trace(self) -> None:
+        with tempfile.TemporaryDirectory() as outside:
+            # a session outside the trace folder, and a log folder in it which is not a session
+            FileStorage(Path(outside) / "t3").log(SimpleNamespace(experiment_setting=0), tag="scenario.123")
+            (Path(outside) / "t3" / "__session__").mkdir()
+            FileStorage(Path(self.tmp_dir.name) / "fin" / "t4").log(
+                SimpleNamespace(experiment_setting=0), tag="scenario.123"
+            )
+            with mock.patch.object(FileStorage, "tail_records", side_effect=AssertionError) as tail_records:
+                for trace_id in [f"{outside}/t3", f"../{Path(outside).name}/t3", "fin/t4", "fin/missing", "."]:
+                    with self.subTest(trace_id=trace_id):
+                        self.assertEqual(self.client.post("/trace", json={"id": trace_id}).status_code, 404)
+                        self.assertEqual(self.client.get(f"/traces/{trace_id}/messages").status_code, 404)
+                        self.assertEqual(self.client.get(f"/traces/{trace_id}/stream").status_code, 404)
+            tail_records.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from rdagent.log.ui.storage import SENDER_HEADER, SEQ_HEADER, WebStorage, decode_batch
+
+
+class StubServer:
+    """A stand-in of the `/receive` endpoint of the log server"""
+
+    def __init__(self, port: int = 0) -> None:
+        self.msgs: list[dict] = []
+        self.batches = 0
+        self.last_seqs: dict[str, int] = {}
+        self.gate = threading.Event()
+        self.gate.set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                stub.gate.wait()
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                data = decode_batch(body, self.headers["Content-Encoding"])
+                sender, seq = self.headers[SENDER_HEADER], int(self.headers[SEQ_HEADER])
+                if seq > stub.last_seqs.get(sender, 0):
+                    stub.last_seqs[sender] = seq
+                    stub.msgs.extend(data)
+                    stub.batches += 1
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("localhost", port), Handler)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.mark.offline
+class WebStorageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = StubServer()
+        self.t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def _storage(self, **kwargs) -> WebStorage:
+        options = {"batch_interval": 0.05, "timeout": 1, "max_backoff": 0.2, "spill_path": self.tmp_dir.name}
+        return WebStorage(self.server.port, "trace", **{**options, **kwargs})
+
+    def _log(self, storage: WebStorage, start: int, end: int) -> None:
+        for i in range(start, end):
+            storage.log(SimpleNamespace(experiment_setting=i), tag="scenario", timestamp=self.t0 + timedelta(seconds=i))
+
+    def _received(self) -> list[int]:
+        return [m["msg"]["content"]["config"] for m in self.server.msgs]
+
+    def test_batches_in_order(self) -> None:
+        storage = self._storage(batch_size=32)
+        self._log(storage, 0, 200)
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(self._received(), list(range(200)))
+        self.assertLess(self.server.batches, 200 / 8)
+        self.assertEqual(len(list(storage.iter_msg())), 200)
+        storage.close()
+
+    def test_back_pressure(self) -> None:
+        storage = self._storage(queue_size=4, batch_size=2, timeout=10)
+        self.server.gate.clear()  # the server hangs, so the sender is stuck
+        producer = threading.Thread(target=self._log, args=(storage, 0, 20))
+        producer.start()
+        time.sleep(0.5)
+        # the logging waits for the queue instead of dropping the messages
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(storage.sender.queue.qsize(), 4)
+        self.server.gate.set()
+        producer.join(10)
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(self._received(), list(range(20)))
+        storage.close()
+
+    def test_outage(self) -> None:
+        storage = self._storage(batch_size=10)
+        self._log(storage, 0, 30)
+        self.assertTrue(storage.flush(timeout=10))
+
+        port = self.server.port
+        self.server.stop()
+        self._log(storage, 30, 80)
+        time.sleep(0.5)
+        # the batches are spilled to disk while the server is down
+        self.assertFalse(storage.flush(timeout=0.1))
+        self.assertTrue(list(Path(self.tmp_dir.name).glob("*/*.json.gz")))
+
+        self.server = StubServer(port)
+        self._log(storage, 80, 100)
+        self.assertTrue(storage.flush(timeout=10))
+        self.assertEqual(self._received(), list(range(30, 100)))
+        self.assertEqual(list(Path(self.tmp_dir.name).glob("*/*.json.gz")), [])
+        storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
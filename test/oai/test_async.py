@@ -0,0 +1,79 @@
+import asyncio
+import gc
+import time
+import unittest
+from typing import Any
+
+import pytest
+
+from rdagent.oai.backend.base import LLM_CONCURRENCY_LIMITER, APIBackend
+from rdagent.oai.llm_conf import LLM_SETTINGS
+
+
+class DummyBackend(APIBackend):
+    """A backend that sleeps instead of calling a real LLM, and records the peak concurrency"""
+
+    def __init__(self) -> None:
+        super().__init__(use_chat_cache=False, dump_chat_cache=False)
+        self.running = 0
+        self.peak = 0
+
+    def support_function_calling(self) -> bool:
+        return False
+
+    def _calculate_token_from_messages(self, messages: list[dict[str, Any]]) -> int:
+        return 0
+
+    def _create_embedding_inner_function(self, input_content_list: list[str], *args, **kwargs) -> list[list[float]]:
+        return [[float(len(c))] for c in input_content_list]
+
+    def _create_chat_completion_inner_function(
+        self, messages: list[dict[str, Any]], json_mode: bool = False, *args, **kwargs
+    ) -> tuple[str, str | None]:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        time.sleep(0.1)
+        self.running -= 1
+        return messages[-1]["content"], "stop"
+
+
+@pytest.mark.offline
+class AsyncBackendTest(unittest.TestCase):
+    def test_bounded_concurrency(self) -> None:
+        origin_value = LLM_SETTINGS.llm_max_concurrency
+        LLM_SETTINGS.llm_max_concurrency = 3
+        try:
+            backend = DummyBackend()
+
+            async def _main() -> list[str]:
+                return await asyncio.gather(
+                    *[backend.abuild_messages_and_create_chat_completion(user_prompt=f"q{i}") for i in range(9)]
+                )
+
+            start = time.time()
+            responses = asyncio.run(_main())
+            self.assertEqual(responses, [f"q{i}" for i in range(9)])
+            self.assertEqual(backend.peak, 3)
+            self.assertLess(time.time() - start, 0.9 * 0.8)  # faster than sequential calls
+        finally:
+            LLM_SETTINGS.llm_max_concurrency = origin_value
+
+    def test_semaphore_per_loop(self) -> None:
+        async def _semaphore() -> asyncio.Semaphore:
+            self.assertIs(LLM_CONCURRENCY_LIMITER.get_semaphore("m"), LLM_CONCURRENCY_LIMITER.get_semaphore("m"))
+            return LLM_CONCURRENCY_LIMITER.get_semaphore("m")
+
+        n_loops = len(LLM_CONCURRENCY_LIMITER._semaphores)
+        self.assertIsNot(asyncio.run(_semaphore()), asyncio.run(_semaphore()))
+        # the semaphores of a closed loop are not kept (nor given to a new loop with the same id)
+        gc.collect()
+        self.assertEqual(len(LLM_CONCURRENCY_LIMITER._semaphores), n_loops)
+
+    def test_embedding(self) -> None:
+        backend = DummyBackend()
+        self.assertEqual(asyncio.run(backend.acreate_embedding("abc")), [3.0])
+        self.assertEqual(asyncio.run(backend.acreate_embedding(["a", "ab"])), [[1.0], [2.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import multiprocessing as mp
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from rdagent.oai.backend.base import SQliteLazyCache
+from rdagent.oai.llm_conf import LLM_SETTINGS
+
+
+def _writer(cache_location: str, worker_id: int) -> None:
+    cache = SQliteLazyCache(cache_location=cache_location)
+    for i in range(50):
+        cache.chat_set(f"question {worker_id} {i}", f"answer {worker_id} {i}")
+    cache.flush()
+
+
+@pytest.mark.offline
+class CacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_location = str(Path(self.tmp_dir.name) / "prompt_cache.db")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_batched_write(self) -> None:
+        cache = SQliteLazyCache(cache_location=self.cache_location)
+        cache.chat_set("q", "a")
+        cache.embedding_set({"text": [0.1, 0.2]})
+        cache.message_set("conv", [{"role": "user", "content": "hi"}])
+        # pending writes are visible to the writing process
+        self.assertEqual(cache.chat_get("q"), "a")
+        self.assertEqual(cache.embedding_get("text"), [0.1, 0.2])
+        self.assertEqual(cache.message_get("conv"), [{"role": "user", "content": "hi"}])
+        cache.flush()
+        (n_entries,) = cache.conn.execute("SELECT COUNT(*) FROM chat_cache").fetchone()
+        self.assertEqual(n_entries, 1)
+
+    def test_multiprocess_write(self) -> None:
+        processes = [mp.Process(target=_writer, args=(self.cache_location, i)) for i in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        cache = SQliteLazyCache(cache_location=self.cache_location)
+        for worker_id in range(4):
+            self.assertEqual(cache.chat_get(f"question {worker_id} 49"), f"answer {worker_id} 49")
+
+    def test_eviction(self) -> None:
+        origin_value = LLM_SETTINGS.prompt_cache_max_entries
+        LLM_SETTINGS.prompt_cache_max_entries = 10
+        try:
+            cache = SQliteLazyCache(cache_location=self.cache_location)
+            for i in range(30):
+                cache.chat_set(f"q{i}", f"a{i}")
+            cache.flush()
+            cache._evict(cache.conn)
+            (n_entries,) = cache.conn.execute("SELECT COUNT(*) FROM chat_cache").fetchone()
+            self.assertEqual(n_entries, 10)
+            self.assertEqual(cache.chat_get("q29"), "a29")
+            self.assertIsNone(cache.chat_get("q0"))
+        finally:
+            LLM_SETTINGS.prompt_cache_max_entries = origin_value
+
+
+if __name__ == "__main__":
+    unittest.main()
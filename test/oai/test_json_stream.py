@@ -0,0 +1,86 @@
+import json
+import unittest
+from typing import Any, Dict
+
+import pytest
+from pydantic import ValidationError
+
+from rdagent.oai.backend.base import APIBackend, JSONStreamExtractor, feed_json_stream
+
+
+class StreamBackend(APIBackend):
+    """A backend streaming a fixed response in small chunks; it records how many chunks are read"""
+
+    def __init__(self, response: str) -> None:
+        super().__init__(use_chat_cache=False, dump_chat_cache=False)
+        self.response = response
+        self.n_read = 0
+
+    def support_function_calling(self) -> bool:
+        return False
+
+    def _calculate_token_from_messages(self, messages: list[dict[str, Any]]) -> int:
+        return 0
+
+    def _create_embedding_inner_function(self, input_content_list: list[str], *args, **kwargs) -> list[list[float]]:
+        return []
+
+    def _create_chat_completion_inner_function(
+        self, messages: list[dict[str, Any]], json_mode: bool = False, *args, **kwargs
+    ) -> tuple[str, str | None]:
+        content = ""
+        for i in range(0, len(self.response), 4):
+            chunk = self.response[i : i + 4]
+            self.n_read += 1
+            content += chunk
+            if feed_json_stream(chunk):
+                break
+        return content, "stop"
+
+
+@pytest.mark.offline
+class JSONStreamTest(unittest.TestCase):
+    def test_extract(self) -> None:
+        response = (
+            '<think>maybe {"a": 0}</think>Sure:\n```json\n{"a": "x}\\"", "b": [True, None], "c": 1.5e3}\n```\nDone.'
+        )
+        extractor = JSONStreamExtractor()
+        for i in range(0, len(response), 3):
+            if extractor.feed(response[i : i + 3]):
+                break
+        self.assertEqual(json.loads(extractor.result), {"a": 'x}"', "b": [True, None], "c": 1500.0})
+        self.assertLess(len(extractor.text), len(response))
+
+    def test_early_stop(self) -> None:
+        response = '{"reason": "ok", "final": true}' + " trailing text" * 100
+        backend = StreamBackend(response)
+        result = backend.build_messages_and_create_chat_completion(
+            user_prompt="q", json_mode=True, json_target_type=Dict[str, str | bool]
+        )
+        self.assertEqual(json.loads(result), {"reason": "ok", "final": True})
+        self.assertLess(backend.n_read, 10)
+
+        backend = StreamBackend(response)
+        with self.assertRaises(ValidationError):
+            backend._create_chat_completion_auto_continue(
+                messages=[{"role": "user", "content": "q"}], json_mode=True, json_target_type=Dict[str, int]
+            )
+        self.assertLess(backend.n_read, 10)  # the violation is found before the stream ends
+
+    def test_brackets_before_json(self) -> None:
+        # the brackets in the text before the fenced JSON are not the response
+        response = 'We score each item in [0, 1].\n```json\n{"score": 0.7, "reason": "ok"}\n```' + " more" * 100
+        backend = StreamBackend(response)
+        result = backend.build_messages_and_create_chat_completion(user_prompt="q", json_mode=True)
+        self.assertEqual(json.loads(result), {"score": 0.7, "reason": "ok"})
+        self.assertLess(backend.n_read, 30)
+
+        # without a fence, nothing is extracted from the stream; the full response is left to `JSONParser`
+        extractor = JSONStreamExtractor()
+        for chunk in ["We score each item ", "in [0, 1]. ", '{"score": 0.7}']:
+            self.assertFalse(extractor.feed(chunk))
+        self.assertIsNone(extractor.result)
+
+
+if __name__ == "__main__":
+    unittest.main()
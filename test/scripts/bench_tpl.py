@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of rendering the prompts with `T`.
+
+It renders the prompts of the data science proposal (`DSProposalV2ExpGen`) many times and reports the time per
+render, so the overhead of `T(...).r()` can be tracked:
+
+- cold: the template files are parsed and the templates are compiled for every render (no caches);
+- warm: the parsed files and the compiled templates are reused;
+- each of them with and without logging the renders (`LOG_SETTINGS.tpl_log_sample_rate`).
+
+Usage: python test/scripts/bench_tpl.py [--n 10000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from rdagent.log import rdagent_logger as logger
+from rdagent.log.conf import LOG_SETTINGS
+from rdagent.utils.agent import tpl
+from rdagent.utils.agent.tpl import T
+
+PROMPTS = "scenarios.data_science.proposal.exp_gen.prompts_v2"
+DESC = "A description of the competition, the data and the current solution. " * 20
+
+
+def render_proposal_prompts() -> int:
+    """Render the prompts of one proposal; return the total length of the prompts"""
+    prompts = [
+        T(f"{PROMPTS}:scenario_problem.system").r(problem_output_format=T(f"{PROMPTS}:output_format.problem").r()),
+        T(f"{PROMPTS}:scenario_problem.user").r(scenario_desc=DESC, sota_exp_desc=DESC),
+        T(f"{PROMPTS}:hypothesis_gen.system").r(
+            hypothesis_output_format=T(f"{PROMPTS}:output_format.hypothesis").r(pipeline=True, enable_idea_pool=False),
+            pipeline=True,
+            enable_idea_pool=False,
+            inject_diverse=False,
+        ),
+        T(f"{PROMPTS}:hypothesis_gen.user").r(
+            scenario_desc=DESC,
+            exp_and_feedback_list_desc=DESC,
+            sota_exp_desc=DESC,
+            problems=DESC,
+            enable_idea_pool=False,
+        ),
+    ]
+    return sum(len(p) for p in prompts)
+
+
+def bench(n: int, cached: bool, sample_rate: float) -> float:
+    LOG_SETTINGS.tpl_log_sample_rate = sample_rate
+    start = time.perf_counter()
+    for _ in range(n):
+        if not cached:
+            tpl.FILE_CACHE.clear()
+            tpl._compile.cache_clear()
+        render_proposal_prompts()
+    return (time.perf_counter() - start) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=10000, help="the number of rendered proposals")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logger.set_storages_path(Path(tmp))
+        render_proposal_prompts()
+        for cached in (False, True):
+            for sample_rate in (1.0, 0.0):
+                # the uncached renders are slow, so fewer of them are timed
+                n = args.n if cached else max(1, args.n // 50)
+                per_proposal = bench(n, cached, sample_rate)
+                print(
+                    f"{'warm' if cached else 'cold'} cache, log rate {sample_rate}: "
+                    f"{per_proposal * 1e6 / 6:8.1f} us/render ({n} proposals, 6 renders each)"
+                )
+
+
+if __name__ == "__main__":
+    main()
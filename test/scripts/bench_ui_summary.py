@@ -0,0 +1,152 @@
+"""
+Benchmark of the summary loaders of the UI (`rdagent/log/ui/utils.py`) on a synthetic log folder.
+
+It writes a log folder of many sessions (each with a few loops of running experiments, mle scores, SOTA
+experiments, traces and checkpoints), and reports the time of summarizing all the sessions:
+
+- scan: the loaders before the session index; they rglob the folders and unpickle the objects on every refresh;
+- cold: the first `get_summary_df` building the session index;
+- warm: the following refreshes reading the index;
+- incremental: a refresh after a new loop is logged in 10% of the sessions.
+
+Usage: PYTHONPATH=. python test/scripts/bench_ui_summary.py [--sessions 200] [--loops 10]
+"""
+
+import argparse
+import pickle
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from rdagent.log.storage import FileStorage
+from rdagent.log.ui import utils
+from rdagent.log.ui.conf import UI_SETTING
+from rdagent.log.utils import extract_json
+from rdagent.utils.workflow.loop import LoopTrace
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+MLE_SCORE = '```json\n{"bronze_medal": true, "above_median": true, "submission_exists": true}\n```'
+
+
+class Workspace:
+    def __init__(self, all_codes: str) -> None:
+        self.all_codes = all_codes
+        self.file_dict = {"main.py": all_codes, "data.bin": b"\0" * 200_000}
+
+
+class Experiment:
+    def __init__(self, code: str, score: float) -> None:
+        self.experiment_workspace = Workspace(code)
+        self.result = pd.DataFrame({"score": [score]}, index=["ensemble"])
+
+
+class DSTrace:
+    def __init__(self, hist: list[Experiment]) -> None:
+        self.hist = hist
+        self.sota_exp_to_submit = hist[-1]
+
+
+class Session:
+    def __init__(self, loop_trace: dict[int, list[LoopTrace]]) -> None:
+        self.loop_trace = loop_trace
+
+
+def log_loop(log_path: Path, li: int) -> None:
+    storage = FileStorage(log_path)
+    t = T0 + timedelta(minutes=10 * li)
+    exps = [Experiment(f"code {i}\n" + "x = 1\n" * 5000, 0.5 + i) for i in range(li + 1)]
+    storage.log(exps[-1], tag=f"Loop_{li}.running.123", timestamp=t)
+    storage.log(MLE_SCORE, tag=f"Loop_{li}.running.mle_score.123", timestamp=t + timedelta(seconds=1))
+    storage.log(exps[-1], tag=f"Loop_{li}.record.SOTA experiment.123", timestamp=t + timedelta(seconds=2))
+    storage.log(DSTrace(exps), tag=f"Loop_{li}.record.trace.123", timestamp=t + timedelta(seconds=3))
+    loop_trace = {i: [LoopTrace(T0, T0 + timedelta(seconds=s + 1), s) for s in range(5)] for i in range(li + 1)}
+    checkpoint = log_path / "__session__" / str(li) / "4_record"
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint.write_bytes(pickle.dumps(Session(loop_trace)))
+
+
+def make_log_folder(folder: Path, n_sessions: int, n_loops: int) -> None:
+    summary = {}
+    for k in range(n_sessions):
+        for li in range(n_loops):
+            log_loop(folder / f"session_{k}", li)
+        summary[f"session_{k}"] = {
+            "competition": "spaceship-titanic",
+            "loop_num": n_loops,
+            "success_loop_num": n_loops,
+            **{f"{name}_num": 1 for name in ["made_submission", "valid_submission", "above_median", "get_medal"]},
+            **{f"{name}_num": 0 for name in ["bronze", "silver", "gold"]},
+            "sota_exp_score": 0.5,
+            "sota_exp_stat": "bronze",
+        }
+    pd.to_pickle(summary, folder / "summary.pkl")
+
+
+def loop_id(path: Path) -> int:
+    return int(re.match(r".*Loop_(\d+).*", str(path))[1])
+
+
+def scan_session(log_path: Path) -> tuple:
+    """The summary of a session by the loaders before the session index"""
+    sota_score = None
+    if sota_exp_paths := list(log_path.rglob("**/SOTA experiment/**/*.pkl")):
+        with max(sota_exp_paths, key=loop_id).open("rb") as f:
+            sota_score = pickle.load(f).result.loc["ensemble"].iloc[0]
+
+    stat = None
+    with max(log_path.rglob("**/trace/**/*.pkl"), key=loop_id).open("rb") as f:
+        sota_codes = pickle.load(f).sota_exp_to_submit.experiment_workspace.all_codes
+    for exp_path in sorted(log_path.rglob("*/running/*/*.pkl"), key=loop_id, reverse=True):
+        with exp_path.open("rb") as f:
+            if pickle.load(f).experiment_workspace.all_codes == sota_codes:
+                with next(log_path.rglob(f"Loop_{loop_id(exp_path)}/running/mle_score/**/*.pkl")).open("rb") as f:
+                    stat = extract_json(pickle.load(f))
+                break
+
+    session_path = log_path / "__session__"
+    max_li = max(int(p.name) for p in session_path.iterdir())
+    with next((session_path / str(max_li)).glob("*_*")).open("rb") as f:
+        times = pickle.load(f).loop_trace
+    return sota_score, stat, times
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--loops", type=int, default=10)
+    parser.add_argument("--refreshes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "log"
+        start = time.perf_counter()
+        make_log_folder(folder, args.sessions, args.loops)
+        print(f"{args.sessions} sessions x {args.loops} loops written in {time.perf_counter() - start:.1f}s")
+        UI_SETTING.session_index_path = f"{tmp}/ui_session_index.db"
+        sessions = sorted(p for p in folder.iterdir() if p.is_dir())
+
+        scan = timed(lambda: [scan_session(p) for p in sessions])
+        cold = timed(lambda: utils.get_summary_df([str(folder)]))
+        warm = min(timed(lambda: utils.get_summary_df([str(folder)])) for _ in range(args.refreshes))
+        for p in sessions[::10]:
+            log_loop(p, args.loops)
+        incremental = timed(lambda: utils.get_summary_df([str(folder)]))
+
+        print(f"scan (per refresh): {scan:8.3f}s")
+        print(f"index cold:         {cold:8.3f}s")
+        print(f"index warm:         {warm:8.3f}s")
+        print(f"index incremental:  {incremental:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
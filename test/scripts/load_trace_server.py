@@ -0,0 +1,109 @@
+"""
+Load test of the trace server.
+
+It pushes a synthetic trace of many messages to `/receive` and reads it back by the cursor-based pages and the
+message stream, reporting the latency of each request and the memory of the server process while the cursor
+moves through the trace; both should stay flat as the trace grows.
+
+Usage: python test/scripts/load_trace_server.py [--messages 100000] [--page-size 500]
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from rdagent.log.server import app as server
+from rdagent.log.server.trace_index import TraceIndexRegistry
+from rdagent.log.ui.conf import UI_SETTING
+
+
+def synthetic_message(trace_id: str, i: int) -> dict:
+    return {
+        "id": trace_id,
+        "msg": {
+            "tag": "evolving.codes",
+            "timestamp": f"2025-01-01T00:00:00.{i % 1000000:06d}+00:00",
+            "loop_id": str(i // 1000),
+            "evo_id": str(i % 10),
+            "content": [
+                {"evo_id": str(i % 10), "target_task_name": f"task_{i}", "workspace": {"a.py": "x = 1\n" * 20}}
+            ],
+        },
+    }
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name}: {len(latencies)} requests, p50 {statistics.median(latencies) * 1e3:.2f} ms, "
+        f"p99 {p99 * 1e3:.2f} ms, max {latencies[-1] * 1e3:.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        UI_SETTING.trace_folder = tmp
+        UI_SETTING.trace_max_page_size = max(UI_SETTING.trace_max_page_size, args.page_size)
+        server.trace_indexes = TraceIndexRegistry(Path(tmp) / "__index__")
+        client = server.app.test_client()
+        trace_id = str(Path(tmp) / "ds" / "load")
+
+        start = time.perf_counter()
+        latencies = []
+        for seq, batch_start in enumerate(range(0, args.messages, 1000), start=1):
+            batch = [synthetic_message(trace_id, i) for i in range(batch_start, min(batch_start + 1000, args.messages))]
+            body = gzip.compress(json.dumps(batch).encode())
+            headers = {"Content-Encoding": "gzip", "X-RDAgent-Sender": "load", "X-RDAgent-Seq": str(seq)}
+            t = time.perf_counter()
+            client.post("/receive", data=body, headers=headers)
+            latencies.append(time.perf_counter() - t)
+        print(f"pushed {args.messages} messages in {time.perf_counter() - start:.1f} s")
+        report("receive (1000 messages per batch)", latencies)
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        cursor, n_read, latencies, memory = 0, 0, [], []
+        while True:
+            t = time.perf_counter()
+            page = client.get(f"/traces/ds/load/messages?cursor={cursor}&size={args.page_size}").json
+            latencies.append(time.perf_counter() - t)
+            memory.append(tracemalloc.get_traced_memory()[0] - baseline)
+            if not page["messages"]:
+                break
+            n_read += len(page["messages"])
+            cursor = page["next_cursor"]
+        assert n_read == args.messages, n_read
+        report(f"pages of {args.page_size} messages", latencies)
+        quarters = [memory[int(len(memory) * q)] for q in (0.0, 0.25, 0.5, 0.75)] + [memory[-1]]
+        print("retained memory at 0/25/50/75/100% of the trace: " + ", ".join(f"{m / 1024:.0f} KiB" for m in quarters))
+        print(f"peak memory while paging: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB")
+
+        server.trace_indexes.get(trace_id).end()
+        for position in (0, cursor // 2):
+            t = time.perf_counter()
+            response = client.get(f"/traces/ds/load/stream?cursor={position}")
+            first = next(response.response)
+            first_latency = time.perf_counter() - t
+            n_events = 1 + sum(1 for _ in response.response)
+            print(
+                f"stream from cursor {position}: first event in {first_latency * 1e3:.2f} ms, "
+                f"{n_events} events in {time.perf_counter() - t:.1f} s"
+            )
+            assert first.startswith(b"id: ")
+            response.close()
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.cs_stats import mean_ic_matrix, per_date_ic
+
+
+@pytest.mark.offline
+class CrossSectionalStatsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        dates = pd.date_range("2020-01-01", periods=30)
+        index = pd.MultiIndex.from_product([dates, [f"SH{i:06d}" for i in range(40)]], names=["datetime", "instrument"])
+        # rounded values to have ties in the ranks
+        source = pd.Series(rng.normal(size=len(index)).round(1), index=index)
+        target = source + rng.normal(size=len(index))
+        source.iloc[::5] = np.nan
+        target.iloc[::7] = np.nan
+        source.loc[dates[3]] = 1.0  # a constant date has no correlation
+        target.loc[dates[4]] = np.nan  # so does a date without valid rows
+        self.df = pd.concat([source, target], axis=1, keys=["source", "gt"]).sample(frac=1, random_state=0)
+
+    def test_per_date_ic(self) -> None:
+        ic, ric = per_date_ic(self.df["source"], self.df["gt"])
+        groups = self.df.groupby("datetime")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # the constant dates
+            expected_ic = groups.apply(lambda df: df["source"].corr(df["gt"]))
+            expected_ric = groups.apply(lambda df: df["source"].corr(df["gt"], method="spearman"))
+        pd.testing.assert_series_equal(ic, expected_ic, check_names=False)
+        pd.testing.assert_series_equal(ric, expected_ric, check_names=False)
+        self.assertTrue(np.isnan(ic.iloc[3]) and np.isnan(ic.iloc[4]))
+
+    def test_mean_ic_matrix(self) -> None:
+        left, right = self.df[["source"]], self.df[["gt", "source"]]
+        ic = mean_ic_matrix(left, right)
+        self.assertEqual(ic.shape, (1, 2))
+        self.assertAlmostEqual(ic.iloc[0, 0], per_date_ic(self.df["source"], self.df["gt"])[0].mean())
+        self.assertAlmostEqual(ic.iloc[0, 1], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.eva_utils import (
+    FactorCorrelationEvaluator,
+    FactorEqualValueRatioEvaluator,
+    FactorEvalContext,
+    FactorIndexEvaluator,
+    FactorInfEvaluator,
+    FactorMissingValuesEvaluator,
+    FactorRowCountEvaluator,
+)
+
+
+class DummyWorkspace:
+    """A workspace returning a fixed factor value and counting the executions"""
+
+    def __init__(self, value: pd.DataFrame) -> None:
+        self.value = value
+        self.n_execute = 0
+
+    def execute(self) -> tuple[str, pd.DataFrame]:
+        self.n_execute += 1
+        return "", self.value.sample(frac=1, random_state=0)
+
+
+@pytest.mark.offline
+class FactorEvalContextTest(unittest.TestCase):
+    def setUp(self) -> None:
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=20), [f"SH{i:06d}" for i in range(30)]],
+            names=["datetime", "instrument"],
+        )
+        self.gt_value = pd.DataFrame({"factor": np.random.default_rng(0).normal(size=len(index))}, index=index)
+
+    def test_shared_context(self) -> None:
+        gt, gen = DummyWorkspace(self.gt_value), DummyWorkspace(self.gt_value.iloc[:-30])
+        context = FactorEvalContext(gen, gt)
+        self.assertTrue(context.gen_df.index.is_monotonic_increasing)
+        self.assertEqual(list(context.aligned_df.columns), ["source", "gt"])
+        self.assertEqual(context.aligned_df["source"].isna().sum(), 30)
+        self.assertEqual(len(context.date_segments.dates), 20)
+        self.assertEqual((gen.n_execute, gt.n_execute), (1, 1))
+
+    def test_checks_share_context(self) -> None:
+        gt, gen = DummyWorkspace(self.gt_value), DummyWorkspace(self.gt_value)
+        context = FactorEvalContext(gen, gt)
+        checks = [
+            FactorInfEvaluator(),
+            FactorRowCountEvaluator(),
+            FactorIndexEvaluator(),
+            FactorMissingValuesEvaluator(),
+            FactorEqualValueRatioEvaluator(),
+            FactorCorrelationEvaluator(hard_check=True),
+        ]
+        results = [check.evaluate(gen, gt, eval_context=context)[1] for check in checks]
+        self.assertEqual(results, [True, 1.0, 1.0, True, 1.0, True])
+        self.assertEqual((gen.n_execute, gt.n_execute), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.executor import FactorExecutorPool
+
+FACTOR_CODE = """
+import pandas as pd
+
+df = pd.read_hdf("daily_pv.h5", key="data")
+assert "tmp" not in df.columns  # the preloaded data is not shared with the previous task
+df["tmp"] = 1
+print("computing")
+df[["$close"]].rename(columns={"$close": "factor"}).to_hdf("result.h5", key="data")
+"""
+
+# the global state left by a task is not seen by the next one
+PATCHING_CODE = """
+import os
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+
+pd.set_option("display.max_rows", 3)
+random.seed(0)
+np.random.seed(0)
+np.seterr(all="raise")
+warnings.simplefilter("error")
+os.environ["FACTOR_PATCHED"] = "1"
+pd.DataFrame.patched = True
+pd.read_csv = None
+"""
+
+CHECKING_CODE = """
+import os
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+
+assert pd.get_option("display.max_rows") == 60
+random.seed(0), np.random.seed(0)
+expected = random.random(), np.random.rand()
+random.seed(), np.random.seed()
+assert (random.random(), np.random.rand()) != expected
+assert np.geterr()["divide"] == "warn"
+assert not any(action == "error" and category is Warning for action, _, category, _, _ in warnings.filters)
+assert "FACTOR_PATCHED" not in os.environ
+assert not hasattr(pd.DataFrame, "patched") and pd.read_csv is not None
+pd.read_hdf("daily_pv.h5", key="data").to_hdf("result.h5", key="data")
+"""
+
+
+@pytest.mark.offline
+class FactorExecutorPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.workspace = Path(self.tmp.name) / "workspace"
+        self.workspace.mkdir()
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=10), ["SH600000", "SH600001"]], names=["datetime", "instrument"]
+        )
+        self.pv = pd.DataFrame({"$close": np.arange(len(index), dtype=float)}, index=index)
+        # the source data is linked into the workspace
+        self.pv.to_hdf(Path(self.tmp.name) / "daily_pv.h5", key="data")
+        (self.workspace / "daily_pv.h5").symlink_to(Path(self.tmp.name) / "daily_pv.h5")
+        self.pool = FactorExecutorPool(size=1)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def _run(self, code: str, timeout: float = 60) -> pd.DataFrame | None:
+        (self.workspace / "factor.py").write_text(code)
+        return self.pool.run(self.workspace / "factor.py", cwd=self.workspace, timeout=timeout)
+
+    def test_run(self) -> None:
+        for _ in range(2):  # the second task reuses the warm worker
+            value = self._run(FACTOR_CODE)
+            pd.testing.assert_frame_equal(value, self.pv.rename(columns={"$close": "factor"}))
+        self.assertFalse((self.workspace / "result.h5").exists())
+        # the next workers preload the data read by the tasks
+        self.assertEqual(list(self.pool.preload), [(str(Path(self.tmp.name, "daily_pv.h5").resolve()), "data")])
+
+    def test_reset_state(self) -> None:
+        self._run(PATCHING_CODE)
+        pd.testing.assert_frame_equal(self._run(CHECKING_CODE), self.pv)
+
+    def test_error_and_timeout(self) -> None:
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self._run("print('before')\nraise ValueError('wrong factor')")
+        output = cm.exception.output.decode()
+        self.assertIn("before", output)
+        self.assertIn('factor.py", line 2', output)
+        self.assertIn("ValueError: wrong factor", output)
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self._run("import time\ntime.sleep(30)", timeout=1)
+        # the worker of the timeout task is replaced
+        self.assertEqual(len(self._run(FACTOR_CODE)), len(self.pv))
+
+
+if __name__ == "__main__":
+    unittest.main()
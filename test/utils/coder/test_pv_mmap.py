@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.pv_loader import load_pv
+from rdagent.components.coder.factor_coder.pv_mmap import convert_h5_to_mmap
+
+
+def make_frames() -> dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-01", periods=20)
+    instruments = ["SH600000", "SH600001", "SZ000001"]
+    pv_index = pd.MultiIndex.from_product([dates, instruments], names=["datetime", "instrument"])
+    pv = pd.DataFrame(
+        {
+            "$open": rng.normal(size=len(pv_index)).astype(np.float32),
+            "$close": rng.normal(size=len(pv_index)),
+            "$volume": rng.integers(0, 1 << 40, size=len(pv_index)),
+            "$limit": rng.random(len(pv_index)) < 0.1,
+        },
+        index=pv_index,
+    )
+    pv.iloc[::7, 1] = np.nan
+
+    object_index = pd.MultiIndex.from_arrays(
+        [dates.repeat(2), pd.Index(["a", "b"] * 20, dtype=object)], names=["datetime", "instrument"]
+    )
+    objects = pd.DataFrame({"$close": np.arange(40.0)}, index=object_index)
+    tz = pd.DataFrame({"$close": np.arange(20.0)}, index=dates.tz_localize("Asia/Shanghai").rename("datetime"))
+
+    single = pd.DataFrame({"$close": np.arange(5.0), "$volume": np.arange(5)}, index=pd.Index([3, 1, 4, 1, 5]))
+    return {"pv": pv, "objects": objects, "tz": tz, "single": single}
+
+
+@pytest.mark.offline
+class PVMmapTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self) -> None:
+        for name, df in make_frames().items():
+            with self.subTest(name=name):
+                df.to_hdf(self.folder / f"{name}.h5", key="data")
+                self.assertIsNotNone(convert_h5_to_mmap(self.folder / f"{name}.h5"))
+                expected = pd.read_hdf(self.folder / f"{name}.h5", key="data")
+                pd.testing.assert_frame_equal(load_pv(name, folder=str(self.folder)), expected)
+                columns = list(expected.columns[::-1])
+                pd.testing.assert_frame_equal(load_pv(name, columns, folder=str(self.folder)), expected[columns])
+
+    def test_not_restorable(self) -> None:
+        # mixed objects can't be stored without pickle; the data is loaded from HDF5
+        df = pd.DataFrame({"$close": [1.0, 2.0]}, index=pd.Index(["a", 1], dtype=object))
+        df.to_hdf(self.folder / "mixed.h5", key="data")
+        self.assertIsNone(convert_h5_to_mmap(self.folder / "mixed.h5"))
+        pd.testing.assert_frame_equal(load_pv("mixed", folder=str(self.folder)), df)
+
+
+if __name__ == "__main__":
+    unittest.main()
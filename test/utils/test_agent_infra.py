@@ -1,8 +1,13 @@
+import os
+import tempfile
 import unittest
+from pathlib import Path
+
+import pytest
 
 from rdagent.oai.llm_utils import APIBackend
 from rdagent.utils.agent.ret import PythonAgentOut
-from rdagent.utils.agent.tpl import T
+from rdagent.utils.agent.tpl import T, load_content
 
 
 class TestAgentInfra(unittest.TestCase):
@@ -31,5 +36,30 @@ class TestAgentInfra(unittest.TestCase):
         print(parent)
 
 
+@pytest.mark.offline
+class TestTemplate(unittest.TestCase):
+    def test_cached_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            prompts = Path(tmp) / "prompts.yaml"
+            prompts.write_text("a:\n  b: 'hello {{ name }}'\n  c: [1, 2]\n")
+            self.assertEqual(load_content(".prompts:a.b", caller_dir=Path(tmp)), "hello {{ name }}")
+            # the callers cannot modify the cached content
+            load_content(".prompts:a.c", caller_dir=Path(tmp)).append(3)
+            self.assertEqual(load_content(".prompts:a.c", caller_dir=Path(tmp)), [1, 2])
+
+            # the modified file is loaded again
+            prompts.write_text("a:\n  b: 'bye {{ name }}'\n")
+            os.utime(prompts, ns=(0, prompts.stat().st_mtime_ns + 10**9))
+            self.assertEqual(load_content(".prompts:a.b", caller_dir=Path(tmp)), "bye {{ name }}")
+            with self.assertRaises(FileNotFoundError):
+                load_content(".prompts:a.c", caller_dir=Path(tmp))
+
+    def test_render(self):
+        parent = T("components.coder.data_science.raw_data_loader.prompts:spec.user.data_loader")
+        child = T("scenarios.data_science.share:component_spec.DataLoadSpec").r()
+        for _ in range(2):  # the second render uses the compiled templates
+            self.assertIn(child, parent.r(latest_spec=None))
+
+
 if __name__ == "__main__":
     unittest.main()
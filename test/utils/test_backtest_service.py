@@ -0,0 +1,73 @@
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from rdagent.scenarios.qlib.experiment import backtest_worker
+from rdagent.scenarios.qlib.experiment.backtest_service import BacktestService
+from rdagent.utils.env import LocalConf, LocalEnv
+
+
+def _fake_qrun(job: dict) -> None:
+    """Stand for the qlib workflow: it runs in the workspace with the env of the job"""
+    import os
+
+    if job["config"] == "slow.yaml":
+        time.sleep(60)
+    if job["config"] == "fail.yaml":
+        raise ValueError("bad config")
+    Path("qlib_res.csv").write_text(f"{job['config']},{os.environ['SEED']}")
+    print(f"done {job['config']}")
+
+
+class ThreadedBacktestService(BacktestService):
+    def _launch(self) -> None:
+        threading.Thread(
+            target=backtest_worker.serve,
+            args=(self.root, _fake_qrun),
+            kwargs={"workers": self.workers, "idle_timeout": self.idle_timeout, "poll_interval": 0.05},
+            daemon=True,
+        ).start()
+
+
+@pytest.mark.offline
+class BacktestServiceTest(unittest.TestCase):
+    def test_run_backtests(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            service = ThreadedBacktestService(LocalEnv(LocalConf(default_entry="")), tmp, workers=2, idle_timeout=1)
+            service.POLL_INTERVAL = 0.05
+            workspaces = [Path(tmp) / f"ws_{i}" for i in range(4)]
+            for ws in workspaces:
+                ws.mkdir()
+
+            with ThreadPoolExecutor(4) as pool:
+                results = list(
+                    pool.map(lambda i: service.run(workspaces[i], f"conf_{i}.yaml", {"SEED": i}, timeout=30), range(4))
+                )
+            for i, (ws, result) in enumerate(zip(workspaces, results)):
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn(f"done conf_{i}.yaml", result.stdout)
+                self.assertEqual((ws / "qlib_res.csv").read_text(), f"conf_{i}.yaml,{i}")
+
+            result = service.run(workspaces[0], "fail.yaml", timeout=30)
+            self.assertNotEqual(result.exit_code, 0)
+            self.assertIn("ValueError: bad config", result.stdout)
+
+            result = service.run(workspaces[0], "slow.yaml", timeout=1)
+            self.assertNotEqual(result.exit_code, 0)
+            self.assertIn("The running time exceeds 1 seconds", result.stdout)
+
+            # the worker exits when it is idle; the next backtest starts it again
+            time.sleep(2)
+            self.assertFalse(service.is_alive())
+            self.assertEqual(service.run(workspaces[1], "conf_1.yaml", {"SEED": 5}).exit_code, 0)
+            self.assertEqual((workspaces[1] / "qlib_res.csv").read_text(), "conf_1.yaml,5")
+            self.assertEqual(list((service.root / "results").iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("qlib")
+
+from qlib.contrib.data.handler import Alpha158
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.loader import QlibDataLoader
+
+# the handler is a module of the qlib workspace template, not a package of rdagent
+TEMPLATE_FOLDER = Path(__file__).resolve().parents[2] / "rdagent/scenarios/qlib/experiment/factor_template"
+spec = importlib.util.spec_from_file_location("cached_handler", TEMPLATE_FOLDER / "cached_handler.py")
+cached_handler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cached_handler)
+
+HANDLER_KWARGS = {
+    "instruments": "all",
+    "start_time": "2015-01-01",
+    "end_time": "2015-03-31",
+    "fit_start_time": "2015-01-01",
+    "fit_end_time": "2015-02-15",
+    "infer_processors": [
+        {"class": "RobustZScoreNorm", "kwargs": {"fields_group": "feature", "clip_outlier": True}},
+        {"class": "Fillna", "kwargs": {"fields_group": "feature"}},
+    ],
+    "learn_processors": [{"class": "DropnaLabel"}, {"class": "CSZScoreNorm", "kwargs": {"fields_group": "label"}}],
+}
+
+
+def make_frame(columns: list[tuple[str, str]], seed: int) -> pd.DataFrame:
+    index = pd.MultiIndex.from_product(
+        [pd.bdate_range("2015-01-01", "2015-03-31"), [f"ETF{i}" for i in range(5)]], names=["datetime", "instrument"]
+    )
+    rng = np.random.default_rng(seed)
+    values = rng.standard_t(3, size=(len(index), len(columns)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=index, columns=pd.MultiIndex.from_tuples(columns))
+
+
+@pytest.mark.offline
+class CachedAlpha158Test(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp_dir.name) / "cache"
+        self.base = make_frame([("feature", "KMID"), ("feature", "KLEN"), ("label", "LABEL0")], seed=0)
+        factors = make_frame([("feature", "momentum"), ("feature", "volatility")], seed=1)
+        self.factor_path = Path(self.tmp_dir.name) / "combined_factors_df.parquet"
+        factors.droplevel(0, axis=1).to_parquet(self.factor_path)
+        # the reference is Alpha158 processing the factors together with its features
+        self.combined = pd.concat([self.base.loc[:, ["feature"]], factors, self.base.loc[:, ["label"]]], axis=1)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def cached_handler(self, data_version: str = "v1", **kwargs) -> DataHandlerLP:
+        with mock.patch.object(cached_handler, "get_qlib_data_version", return_value=data_version):
+            return cached_handler.CachedAlpha158(
+                factor_path=str(self.factor_path), cache_dir=str(self.cache_dir), **HANDLER_KWARGS, **kwargs
+            )
+
+    def assert_same_data(self, handler: DataHandlerLP, reference: DataHandlerLP) -> None:
+        for data_key in (DataHandlerLP.DK_I, DataHandlerLP.DK_L):
+            pd.testing.assert_frame_equal(handler.fetch(data_key=data_key), reference.fetch(data_key=data_key))
+
+    def test_same_as_alpha158(self) -> None:
+        with mock.patch.object(QlibDataLoader, "load", return_value=self.combined):
+            reference = Alpha158(**HANDLER_KWARGS)
+
+        # the cache is built by the first handler
+        with mock.patch.object(QlibDataLoader, "load", return_value=self.base) as load:
+            self.assert_same_data(self.cached_handler(), reference)
+        load.assert_called_once()
+        self.assertEqual(len(list(self.cache_dir.glob("*/processors.pkl"))), 1)
+
+        # and loaded by the next ones without loading the qlib data
+        with mock.patch.object(QlibDataLoader, "load", side_effect=AssertionError):
+            self.assert_same_data(self.cached_handler(), reference)
+
+        # the cache is built again for a new version of the data or another config of the handler
+        with mock.patch.object(QlibDataLoader, "load", return_value=self.base) as load:
+            self.assert_same_data(self.cached_handler(data_version="v2"), reference)
+            self.cached_handler(freq="day", filter_pipe=[])
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(len(list(self.cache_dir.glob("*/processors.pkl"))), 3)
+
+    def test_prune(self) -> None:
+        with mock.patch.object(QlibDataLoader, "load", return_value=self.base):
+            self.cached_handler(data_version="v1")
+            (old,) = self.cache_dir.glob("*/processors.pkl")
+            self.cached_handler(data_version="v2")
+        (recent,) = set(self.cache_dir.glob("*/processors.pkl")) - {old}
+        # the caches unused for too long are removed
+        os.utime(old.parent, (0, 0))
+        with mock.patch.object(QlibDataLoader, "load", side_effect=AssertionError):
+            self.cached_handler(data_version="v2")
+        self.assertEqual(list(self.cache_dir.glob("*/processors.pkl")), [recent])
+
+        # and the least recently used ones beyond the size bound, but never the one in use
+        with (
+            mock.patch.object(QlibDataLoader, "load", return_value=self.base),
+            mock.patch.object(cached_handler, "MAX_CACHE_BYTES", 0),
+        ):
+            self.cached_handler(data_version="v3")
+        self.assertEqual(len(list(self.cache_dir.glob("*/processors.pkl"))), 1)
+        self.assertNotIn(recent, list(self.cache_dir.glob("*/processors.pkl")))
+
+    def test_without_pyarrow(self) -> None:
+        with mock.patch.object(QlibDataLoader, "load", return_value=self.combined):
+            reference = Alpha158(**HANDLER_KWARGS)
+        with (
+            mock.patch.object(QlibDataLoader, "load", return_value=self.base),
+            mock.patch.object(cached_handler, "CACHE_SUPPORTED", False),
+        ):
+            self.assert_same_data(self.cached_handler(), reference)
+        self.assertFalse(self.cache_dir.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import itertools
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import docker
+import pytest
+
+from rdagent.utils import env as env_module
+from rdagent.utils.env import DockerConf, DockerEnv
+
+
+class FakeContainer:
+    def __init__(self, container_id: str, command: str) -> None:
+        self.id = self.name = container_id
+        self.command = command
+        self.stopped = self.removed = False
+
+    def wait(self) -> dict:
+        return {"StatusCode": 0}
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    def remove(self) -> None:
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self) -> None:
+        self.created: list[FakeContainer] = []
+        self.ids = itertools.count()
+        self.no_gpu = False
+
+    def run(self, image: str, command: str, **kwargs) -> FakeContainer:
+        if command == "nvidia-smi" and self.no_gpu:
+            raise docker.errors.APIError("could not select device driver")
+        self.created.append(FakeContainer(f"container{next(self.ids)}", command))
+        return self.created[-1]
+
+
+class FakeAPI:
+    """`exec` in a container; the output is streamed in chunks not aligned to the lines"""
+
+    def __init__(self) -> None:
+        self.execs: dict[str, str] = {}
+        self.commands: list[str] = []
+        self.fail_next = False
+
+    def exec_create(self, container_id: str, cmd: list[str], environment: dict, workdir: str) -> dict:
+        exec_id = f"exec{len(self.execs)}"
+        self.execs[exec_id] = container_id
+        self.commands.append(cmd[-1])
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id: str, stream: bool):
+        if self.fail_next:
+            self.fail_next = False
+            raise docker.errors.APIError("the container is not running")
+        yield from [f"run in {self.execs[exec_id]}\nsec".encode(), b"ond line\nlast"]
+
+    def exec_inspect(self, exec_id: str) -> dict:
+        return {"ExitCode": 0}
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.containers = FakeContainers()
+        self.api = FakeAPI()
+        self.images = mock.Mock()
+
+    def created(self, command: str) -> list[FakeContainer]:
+        return [c for c in self.containers.created if c.command == command]
+
+
+@pytest.mark.offline
+class DockerContainerPoolTest(unittest.TestCase):
+    POOL_COMMAND = "while true; do sleep 3600; done"
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = FakeClient()
+        self.patches = [
+            mock.patch.object(docker, "from_env", return_value=self.client),
+            mock.patch.dict(env_module._CONTAINER_POOLS, clear=True),
+            mock.patch.dict(env_module._GPU_PROBE_CACHE, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+        conf = DockerConf(image="fake:latest", mount_path="/workspace", default_entry="python main.py", pool_size=1)
+        conf.pool_max_uses = 3
+        self.env = DockerEnv(conf=conf)
+
+    def tearDown(self) -> None:
+        env_module._close_container_pools()
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def run_in(self, workspace: str) -> str:
+        (Path(self.tmp_dir.name) / workspace).mkdir(parents=True, exist_ok=True)
+        output, exit_code = self.env._run("python main.py", local_path=str(Path(self.tmp_dir.name) / workspace))
+        self.assertEqual(exit_code, 0)
+        return output
+
+    def test_reuse(self) -> None:
+        outputs = [self.run_in(f"ws{i}") for i in range(4)]
+        self.assertEqual(outputs[0], "run in container1\nsecond line\nlast\n")
+        # the container is reused for `pool_max_uses` runs, then replaced
+        pooled = self.client.created(self.POOL_COMMAND)
+        self.assertEqual([c.id for c in pooled], ["container1", "container2"])
+        self.assertEqual(outputs[1:], [outputs[0]] * 2 + ["run in container2\nsecond line\nlast\n"])
+        self.assertTrue(pooled[0].stopped and pooled[0].removed)
+        self.assertFalse(pooled[1].stopped)
+        # the cache volume nested in the mount path is linked into the workspace of each run
+        self.assertIn("ln -s /rdagent_pool/ws3 /workspace", self.client.api.commands[3])
+        self.assertIn("ln -sfn /rdagent_pool_volumes/0 /workspace/workspace_cache", self.client.api.commands[3])
+        # and turned back into the mount point after the entry, since the workspace is on the host
+        unlink = "[ -L {0} ] && rm -f {0} && mkdir -p {0};".format("/workspace/workspace_cache")
+        self.assertIn(unlink, self.client.api.commands[3])
+
+    def test_unlink_volumes(self) -> None:
+        # the link left in the workspace by a run killed in the container
+        workspace = Path(self.tmp_dir.name) / "ws"
+        workspace.mkdir()
+        (workspace / "workspace_cache").symlink_to("/rdagent_pool_volumes/0")
+        self.run_in("ws")
+        self.assertFalse((workspace / "workspace_cache").is_symlink())
+        self.assertTrue((workspace / "workspace_cache").is_dir())
+
+    def test_restart_unhealthy(self) -> None:
+        self.run_in("ws")
+        self.client.api.fail_next = True
+        with self.assertRaises(RuntimeError):
+            self.run_in("ws")
+        # the failed container is removed and the next run gets a new one
+        pooled = self.client.created(self.POOL_COMMAND)
+        self.assertTrue(pooled[0].removed)
+        self.assertEqual(self.run_in("ws"), "run in container2\nsecond line\nlast\n")
+        self.assertEqual(len(self.client.created(self.POOL_COMMAND)), 2)
+
+    def test_gpu_probe_cache(self) -> None:
+        # another workspace root is another pool, but the image is probed once
+        self.run_in("a/ws")
+        self.run_in("b/ws")
+        self.assertEqual(len(self.client.created(self.POOL_COMMAND)), 2)
+        self.assertEqual(len(self.client.created("nvidia-smi")), 1)
+        self.assertTrue(env_module._GPU_PROBE_CACHE["fake:latest"])
+
+    def test_gpu_probe_failure(self) -> None:
+        # a failed probe is not cached, so it is done again by the next pool
+        self.client.containers.no_gpu = True
+        self.run_in("a/ws")
+        self.client.containers.no_gpu = False
+        self.run_in("b/ws")
+        self.assertEqual(len(self.client.created("nvidia-smi")), 1)
+        self.assertTrue(env_module._GPU_PROBE_CACHE["fake:latest"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.config import FACTOR_COSTEER_SETTINGS
+from rdagent.scenarios.qlib.developer.factor_store import FactorValueStore
+
+
+class Implementation:
+    def __init__(self, code_hash: str | None) -> None:
+        self.code_hash = code_hash
+
+    def hash_func(self, data_type: str) -> str | None:
+        return self.code_hash
+
+
+def make_factor(name: str, seed: int) -> pd.DataFrame:
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2020-01-01", periods=50), ["ETF0", "ETF1", "ETF2"]], names=["datetime", "instrument"]
+    )
+    return pd.DataFrame({name: np.random.default_rng(seed).normal(size=len(index))}, index=index)
+
+
+@pytest.mark.offline
+class FactorValueStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = FactorValueStore(Path(self.tmp_dir.name) / "store")
+        self.factors = {f"key{i}": make_factor(f"factor{i}", i) for i in range(4)}
+        for key, df in self.factors.items():
+            self.store.put(key, df, factor_name=df.columns[0])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def expected(self, keys: list[str]) -> pd.DataFrame:
+        return pd.concat([self.factors[key] for key in keys], axis=1)
+
+    def matrices(self) -> set[Path]:
+        return set((self.store.store_path / "matrices").glob("*.parquet"))
+
+    def test_put_get(self) -> None:
+        self.assertTrue(self.store.contains("key0"))
+        self.assertFalse(self.store.contains("missing"))
+        pd.testing.assert_frame_equal(self.store.get("key1"), self.factors["key1"])
+        manifest = json.loads(self.store.manifest_path.read_text())
+        self.assertEqual(sorted(manifest), sorted(self.factors))
+        self.assertEqual(manifest["key2"]["columns"], ["factor2"])
+        self.assertEqual(manifest["key2"]["rows"], 150)
+
+    def test_assemble_prefix(self) -> None:
+        pd.testing.assert_frame_equal(self.store.assemble(["key0", "key1"]), self.expected(["key0", "key1"]))
+        # the matrix of the leading keys is reused, only the new factors are read
+        with mock.patch.object(self.store, "get", wraps=self.store.get) as get:
+            keys = ["key0", "key1", "key2", "key3"]
+            pd.testing.assert_frame_equal(self.store.assemble(keys), self.expected(keys))
+            self.assertEqual([c.args[0] for c in get.call_args_list], ["key2", "key3"])
+            pd.testing.assert_frame_equal(self.store.assemble(keys), self.expected(keys))
+            self.assertEqual(get.call_count, 2)
+
+    def test_evict_matrices(self) -> None:
+        self.store.assemble(["key0", "key1"])
+        (first,) = self.matrices()
+        self.store.max_matrix_bytes = 2 * first.stat().st_size
+        self.store.assemble(["key2", "key3"])
+        (second,) = self.matrices() - {first}
+        # the least recently used matrix is evicted beyond the size limit
+        self.store.assemble(["key0", "key1"])
+        self.store.assemble(["key1", "key2"])
+        self.assertNotIn(second, self.matrices())
+        self.assertIn(first, self.matrices())
+        self.assertEqual(len(self.matrices()), 2)
+
+        # an evicted matrix is assembled again
+        pd.testing.assert_frame_equal(self.store.assemble(["key2", "key3"]), self.expected(["key2", "key3"]))
+        self.store.max_matrix_bytes = 0
+        self.store.assemble(["key0", "key3"])
+        self.assertEqual(len(self.matrices()), 1)
+
+    def test_data_version(self) -> None:
+        data_folder = Path(self.tmp_dir.name) / "data"
+        data_folder.mkdir()
+        (data_folder / "daily_pv.h5").write_bytes(b"v1")
+        with mock.patch.object(FACTOR_COSTEER_SETTINGS, "data_folder", str(data_folder)):
+            key = FactorValueStore(self.store.store_path).get_key(Implementation("code"))
+            self.assertEqual(FactorValueStore(self.store.store_path).get_key(Implementation("code")), key)
+            self.assertNotEqual(FactorValueStore(self.store.store_path).get_key(Implementation("other")), key)
+            self.assertIsNone(self.store.get_key(Implementation(None)))
+
+            # the factors stored for the previous data are not found for the new data
+            (data_folder / "daily_pv.h5").write_bytes(b"v2 data")
+            self.assertNotEqual(FactorValueStore(self.store.store_path).get_key(Implementation("code")), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import pytest
+
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.log import rdagent_logger as logger
+from rdagent.utils.workflow import LoopBase, LoopMeta
+from rdagent.utils.workflow.loop import CheckpointHistory
+from rdagent.utils.workflow.scheduler import PrioritySemaphore, StepScheduler
+
+
+def _step_in_subproc(prev_out: dict[str, Any]) -> tuple[int, str]:
+    import os
+
+    return os.getpid(), logger._tag
+
+
+class Exp:
+    def __init__(self, li: int) -> None:
+        self.li = li
+        self.file_dict = {"main.py": "x" * 10_000}
+
+
+class Trace:
+    def __init__(self) -> None:
+        self.hist: list[tuple[Exp, bool]] = []
+
+
+class ToyLoop(LoopBase, metaclass=LoopMeta):
+    def __init__(self, session_folder: Path) -> None:
+        super().__init__()
+        self.session_folder = session_folder
+        self.trace = Trace()
+        self.n_proposed = 0
+
+    def propose(self, prev_out: dict[str, Any]) -> Exp:
+        self.n_proposed += 1
+        return Exp(self.n_proposed - 1)
+
+    def record(self, prev_out: dict[str, Any]) -> None:
+        self.trace.hist.append((prev_out["propose"], True))
+
+
+@pytest.mark.offline
+class LoopCheckpointTest(unittest.TestCase):
+    def test_delta_checkpoint(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            session_folder = Path(tmp_dir) / "__session__"
+            loop = ToyLoop(session_folder)
+            asyncio.run(loop.run(loop_n=5))
+
+            # each history object is saved once: 5 entries + 5 experiments (the decisions are atomic values)
+            self.assertEqual(len(list((session_folder / CheckpointHistory.FOLDER).iterdir())), 10)
+            # the checkpoints don't grow with the history
+            first, last = session_folder / "0" / "1_record", session_folder / "4" / "1_record"
+            self.assertLess(last.stat().st_size, first.stat().st_size + 2_000)
+
+            session = LoopBase.read(last)
+            self.assertEqual([exp.li for exp, _ in session.trace.hist], list(range(5)))
+            # the shared references are kept
+            self.assertIs(session.trace.hist[3][0], session.loop_prev_out[3]["propose"])
+
+            session = LoopBase.read(session_folder / "2" / "0_propose")
+            self.assertEqual(session.loop_prev_out[2]["propose"].li, 2)
+
+            # the checkpoints of a session checked out to another folder are complete
+            checkout_folder = Path(tmp_dir) / "checkout"
+            storage_path = logger.storage.path
+            try:
+                session = ToyLoop.load(session_folder / "4" / "1_record", checkout=checkout_folder, replace_timer=False)
+            finally:
+                logger.set_storages_path(storage_path)
+            session.dump(session.session_folder / "5" / "0_propose")
+            session = LoopBase.read(checkout_folder / "__session__" / "5" / "0_propose")
+            self.assertEqual([exp.li for exp, _ in session.trace.hist], list(range(5)))
+
+    def test_mutated_history(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            session_folder = Path(tmp_dir) / "__session__"
+            loop = ToyLoop(session_folder)
+            asyncio.run(loop.run(loop_n=2))
+            # e.g. a runner sets the result of a based experiment taken from the history
+            loop.trace.hist[0][0].result = 0.5
+            loop.dump(session_folder / "2" / "0_propose")
+
+            session = LoopBase.read(session_folder / "2" / "0_propose")
+            self.assertEqual(session.trace.hist[0][0].result, 0.5)
+            self.assertIs(session.trace.hist[0][0], session.loop_prev_out[0]["propose"])
+            # the earlier checkpoints keep the experiment of their time
+            session = LoopBase.read(session_folder / "1" / "1_record")
+            self.assertFalse(hasattr(session.trace.hist[0][0], "result"))
+            # only the changed object is saved again
+            self.assertEqual(len(list((session_folder / CheckpointHistory.FOLDER).iterdir())), 4 + 1)
+
+    def test_withdraw_loop(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            loop = ToyLoop(Path(tmp_dir) / "__session__")
+            asyncio.run(loop.run(loop_n=3))
+            scheduler = loop.scheduler
+            storage_path = logger.storage.path
+            try:
+                loop.withdraw_loop(2)
+            finally:
+                logger.set_storages_path(storage_path)
+            # the state is the one at the first step of loop 1, but the slots and the pools of the running steps
+            # are kept
+            checkpoint = LoopBase.read(loop.session_folder / "1" / "0_propose")
+            self.assertEqual([exp.li for exp, _ in loop.trace.hist], [exp.li for exp, _ in checkpoint.trace.hist])
+            self.assertEqual(loop.n_proposed, 2)
+            self.assertIs(loop.scheduler, scheduler)
+
+
+class LLMLoop(LoopBase, metaclass=LoopMeta):
+    """The last step is bound to the LLM like `feedback`"""
+
+    def __init__(self, session_folder: Path) -> None:
+        super().__init__()
+        self.session_folder = session_folder
+        self.running = self.peak = 0
+
+    def propose(self, prev_out: dict[str, Any]) -> None:
+        pass
+
+    async def feedback(self, prev_out: dict[str, Any]) -> None:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+
+
+@pytest.mark.offline
+class StepSchedulerTest(unittest.TestCase):
+    def test_last_step_resource(self) -> None:
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            mock.patch.object(RD_AGENT_SETTINGS, "step_semaphore", 3),
+            mock.patch.object(RD_AGENT_SETTINGS, "step_resource_limit", {"llm": 1}),
+        ):
+            loop = LLMLoop(Path(tmp_dir) / "__session__")
+            asyncio.run(loop.run(loop_n=3))
+        self.assertEqual(loop.peak, 1)
+
+    def test_priority(self) -> None:
+        async def main() -> tuple[list[int], dict]:
+            slots = PrioritySemaphore(1)
+            order: list[int] = []
+
+            async def step(priority: int) -> None:
+                await slots.acquire((priority,))
+                order.append(priority)
+                await asyncio.sleep(0.01)
+                slots.release()
+
+            await slots.acquire()
+            tasks = [asyncio.create_task(step(p)) for p in [3, 1, 2]]
+            await asyncio.sleep(0.01)
+            metrics = slots.metrics()
+            slots.release()
+            await asyncio.gather(*tasks)
+            return order, metrics
+
+        order, metrics = asyncio.run(main())
+        self.assertEqual(order, [1, 2, 3])
+        self.assertEqual((metrics["running"], metrics["queue_depth"]), (1, 3))
+
+    def test_persistent_pool(self) -> None:
+        async def main(scheduler: StepScheduler) -> list[tuple[int, str]]:
+            results = []
+            for li in range(2):
+                with logger.tag(f"Loop_{li}.coding"):
+                    async with scheduler.slot("coding"):
+                        results.append(await scheduler.run_in_subproc("coding", _step_in_subproc, {}))
+            return results
+
+        scheduler = StepScheduler()
+        try:
+            (pid_0, tag_0), (pid_1, tag_1) = asyncio.run(main(scheduler))
+        finally:
+            scheduler.close()
+        # the worker is reused, and it runs each step with the tag of the caller
+        self.assertEqual(pid_0, pid_1)
+        self.assertEqual((tag_0, tag_1), ("Loop_0.coding", "Loop_1.coding"))
+        self.assertEqual(scheduler.metrics()["resources"]["cpu"]["acquired"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
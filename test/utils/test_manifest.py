@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from rdagent.core.conf import RD_AGENT_SETTINGS
+from rdagent.core.experiment import FBWorkspace
+from rdagent.utils.env import LocalConf, LocalEnv
+from rdagent.utils.manifest import WorkspaceManifest
+
+MAIN_CODE = """
+from pathlib import Path
+
+with open("../runs.log", "a") as f:
+    f.write("run\\n")
+Path("output.txt").write_text(Path("input/data.csv").read_text().upper() + Path("params.txt").read_text())
+Path("to_delete.txt").unlink()
+Path("out").mkdir()
+Path("out/x.txt").write_text("x")
+"""
+
+
+@pytest.mark.offline
+class CachedRunTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.workspace = self.root / "workspace"
+        (self.root / "data").mkdir()
+        (self.root / "data" / "data.csv").write_text("a,b\n")
+        self.patch = mock.patch.object(RD_AGENT_SETTINGS, "pickle_cache_folder_path_str", str(self.root / "cache"))
+        self.patch.start()
+        self.env = LocalEnv(conf=LocalConf(default_entry=f"{sys.executable} main.py"))
+        self.prepare_workspace()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        self.tmp_dir.cleanup()
+
+    def prepare_workspace(self, main_code: str = MAIN_CODE, params: str = "1") -> None:
+        """The workspace before running, like injecting the files of an experiment again"""
+        self.workspace.mkdir(exist_ok=True)
+        for name in ("output.txt", "out/x.txt", "out"):
+            path = self.workspace / name
+            if path.is_dir():
+                path.rmdir()
+            elif path.exists():
+                path.unlink()
+        (self.workspace / "main.py").write_text(main_code)
+        (self.workspace / "params.txt").write_text(params)
+        (self.workspace / "to_delete.txt").write_text("tmp")
+        if not (self.workspace / "input").exists():
+            (self.workspace / "input").symlink_to(self.root / "data")
+
+    def cached_run(self) -> int:
+        """Run the workspace with the cache and return the number of the actual runs so far"""
+        self.assertEqual(self.env.cached_run(local_path=str(self.workspace)).exit_code, 0)
+        return len((self.root / "runs.log").read_text().splitlines())
+
+    def assert_ran(self, params: str = "1") -> None:
+        self.assertEqual((self.workspace / "output.txt").read_text(), "A,B\n" + params)
+        self.assertEqual((self.workspace / "out" / "x.txt").read_text(), "x")
+        self.assertFalse((self.workspace / "to_delete.txt").exists())
+        self.assertTrue((self.workspace / "input").is_symlink())
+
+    def test_restore(self) -> None:
+        self.assertEqual(self.cached_run(), 1)
+        self.assert_ran()
+        # the linked data is not copied into the cache
+        (zip_path,) = (self.root / "cache" / "utils.env.run").glob("*.zip")
+        self.assertFalse(any(name.startswith("input") for name in zipfile.ZipFile(zip_path).namelist()))
+
+        self.prepare_workspace()
+        self.assertEqual(self.cached_run(), 1)
+        self.assert_ran()
+        self.assertEqual((self.root / "data" / "data.csv").read_text(), "a,b\n")
+
+    def test_invalidation(self) -> None:
+        self.assertEqual(self.cached_run(), 1)
+        # the code is part of the key
+        self.prepare_workspace(main_code=MAIN_CODE + "\n# changed\n")
+        self.assertEqual(self.cached_run(), 2)
+        # the other files are only identified by their names
+        self.prepare_workspace(main_code=MAIN_CODE + "\n# changed\n", params="2")
+        self.assertEqual(self.cached_run(), 2)
+        self.assert_ran(params="1")
+        (self.workspace / "extra.txt").write_text("new file")
+        self.prepare_workspace(main_code=MAIN_CODE + "\n# changed\n", params="2")
+        self.assertEqual(self.cached_run(), 3)
+        self.assert_ran(params="2")
+
+    def test_no_manifest_without_cached_run(self) -> None:
+        workspace = FBWorkspace()
+        workspace.workspace_path = self.workspace
+        workspace.inject_files(**{"main.py": MAIN_CODE, "sub/code.py": "x = 1"})
+        self.assertFalse((self.root / "cache").exists())
+
+    def test_same_stat_edit(self) -> None:
+        manifest = WorkspaceManifest(self.workspace)
+        manifest.refresh()
+        fingerprint = manifest.fingerprint()
+        # an edit keeping the size and the mtime (e.g. within the timestamp granularity of the file system)
+        main = self.workspace / "main.py"
+        st = main.stat()
+        main.write_text(MAIN_CODE.replace("run", "RUN"))
+        os.utime(main, ns=(st.st_atime_ns, st.st_mtime_ns))
+        # the code is always hashed again
+        manifest = WorkspaceManifest(self.workspace)
+        manifest.refresh()
+        self.assertNotEqual(manifest.fingerprint(), fingerprint)
+        # the other files are hashed again if they are modified in the same tick as the manifest was saved
+        params = self.workspace / "params.txt"
+        old_hash = manifest.entries["params.txt"]["hash"]
+        params.write_text("3")
+        os.utime(params, ns=(manifest.saved_mtime_ns, manifest.saved_mtime_ns))
+        manifest.refresh()
+        self.assertNotEqual(manifest.entries["params.txt"]["hash"], old_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,20 @@
+import os
+import random
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
-from rdagent.core.utils import SingletonBaseClass
+from rdagent.core.conf import RD_AGENT_SETTINGS, ExtendedBaseSettings
+from rdagent.core.utils import (
+    LLM_CACHE_SEED_GEN,
+    SingletonBaseClass,
+    _split_shared_context,
+    cache_with_pickle,
+    multiprocessing_wrapper,
+)
 
 
 class A(SingletonBaseClass):
@@ -17,6 +29,27 @@ class A(SingletonBaseClass):
         return self.__str__()
 
 
+class Evaluator:
+    def __init__(self) -> None:
+        self.knowledge = list(range(1000))
+        self.n_calls = 0
+
+    def evaluate(self, task: int, knowledge: dict) -> tuple:
+        self.n_calls += 1
+        return task + len(self.knowledge), knowledge["name"], self.n_calls, random.randint(0, 10000), os.getpid()
+
+
+class ValueSettings(ExtendedBaseSettings):
+    value: int = 0
+
+
+VALUE_SETTINGS = ValueSettings()
+
+
+def get_value(_: int) -> int:
+    return VALUE_SETTINGS.value
+
+
 @pytest.mark.offline
 class MiscTest(unittest.TestCase):
     def test_singleton(self):
@@ -69,6 +102,58 @@ class MiscTest(unittest.TestCase):
         # print(id(a3), id(a3_pkl))  # not the same object
         # print(a1.kwargs)  # a1 will be changed.
 
+    def test_cache_with_pickle_concurrent(self):
+        calls = []
+
+        @cache_with_pickle(lambda x: str(x), force=True)
+        def slow_square(x):
+            calls.append(x)
+            time.sleep(0.2)
+            return x * x
+
+        origin_path = RD_AGENT_SETTINGS.pickle_cache_folder_path_str
+        with tempfile.TemporaryDirectory() as tmp:
+            RD_AGENT_SETTINGS.pickle_cache_folder_path_str = tmp
+            try:
+                with ThreadPoolExecutor(4) as executor:
+                    results = list(executor.map(slow_square, [3, 3, 3, 4]))
+            finally:
+                RD_AGENT_SETTINGS.pickle_cache_folder_path_str = origin_path
+        self.assertEqual(results, [9, 9, 9, 16])
+        # the callers waiting for the lock load the result of the first one
+        self.assertEqual(sorted(calls), [3, 4])
+
+    def test_multiprocessing_wrapper_reused_pool(self):
+        evaluator, knowledge = Evaluator(), {"name": "k"}
+        func_calls = [(evaluator.evaluate, (i, knowledge)) for i in range(6)]
+
+        shared, tasks = _split_shared_context(func_calls)
+        self.assertEqual(len(shared), 2)
+        self.assertIs(shared[0], evaluator)
+        self.assertIs(shared[1], knowledge)
+        self.assertTrue(all(len(task) < 200 for task in tasks))  # only the deltas
+
+        results = []
+        for _ in range(2):
+            LLM_CACHE_SEED_GEN.set_seed(7)
+            results.append(multiprocessing_wrapper(func_calls, n=2))
+        # the same seeds (and results) for the same start seed, whichever worker runs the tasks
+        self.assertEqual([r[:4] for r in results[0]], [r[:4] for r in results[1]])
+        self.assertEqual([r[:3] for r in results[0]], [(1000 + i, "k", 1) for i in range(6)])
+        # the workers are reused by the second call
+        self.assertLessEqual(len({r[4] for rs in results for r in rs}), 2)
+        self.assertNotIn(os.getpid(), {r[4] for rs in results for r in rs})
+
+    def test_reused_pool_settings_changed(self):
+        func_calls = [(get_value, (i,)) for i in range(4)]
+        self.assertEqual(multiprocessing_wrapper(func_calls, n=2), [0] * 4)
+        VALUE_SETTINGS.value = 3
+        try:
+            # the workers forked before the change are not reused
+            self.assertEqual(multiprocessing_wrapper(func_calls, n=2), [3] * 4)
+        finally:
+            VALUE_SETTINGS.value = 0
+
 
 if __name__ == "__main__":
     unittest.main()
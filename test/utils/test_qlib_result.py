@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+
+from rdagent.scenarios.qlib.experiment.qlib_result import dump_latest_result
+
+
+def _write_run(exp_path: Path, run_id: str, end_time: int | None, ic_lines: list[str], ret: float) -> None:
+    run_path = exp_path / run_id
+    (run_path / "metrics").mkdir(parents=True)
+    (run_path / "artifacts" / "portfolio_analysis").mkdir(parents=True)
+    meta = {"run_id": run_id, "end_time": end_time, "lifecycle_stage": "active", "status": 3}
+    (run_path / "meta.yaml").write_text(yaml.safe_dump(meta))
+    (run_path / "metrics" / "IC").write_text("\n".join(ic_lines))
+    pd.DataFrame({"return": [ret]}).to_pickle(run_path / "artifacts" / "portfolio_analysis" / "report_normal_1day.pkl")
+
+
+@pytest.mark.offline
+class QlibResultTest(unittest.TestCase):
+    def test_dump_latest_result(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            workspace = Path(tmp)
+            self.assertFalse(dump_latest_result(workspace))
+
+            exp_path = workspace / "mlruns" / "1"
+            exp_path.mkdir(parents=True)
+            (exp_path / "meta.yaml").write_text(yaml.safe_dump({"name": "workflow", "lifecycle_stage": "active"}))
+            _write_run(exp_path, "old", 1000, ["1 0.1 0"], 0.01)
+            # the value of the largest step is the value of the metric
+            _write_run(exp_path, "latest", 2000, ["5 0.3 1", "9 0.2 0"], 0.02)
+            _write_run(exp_path, "running", None, ["1 0.9 0"], 0.03)
+
+            self.assertTrue(dump_latest_result(workspace))
+            self.assertEqual(pd.read_csv(workspace / "qlib_res.csv", index_col=0).iloc[:, 0].to_dict(), {"IC": 0.3})
+            self.assertEqual(pd.read_pickle(workspace / "ret.pkl")["return"].iloc[0], 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
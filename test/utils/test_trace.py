@@ -0,0 +1,129 @@
+import pickle
+import random
+import unittest
+
+import pytest
+
+from rdagent.core.proposal import Trace
+from rdagent.scenarios.data_science.proposal.exp_gen.base import DSTrace
+
+
+class Exp:
+    def __init__(self, i: int) -> None:
+        self.i = i
+
+
+# the implementations before the trace is indexed; the indexed answers are checked against them
+def naive_exp2idx(trace: Trace, exp):
+    if isinstance(exp, list):
+        exp_to_index = {_exp: i for i, (_exp, _) in enumerate(trace.hist)}
+        return [exp_to_index[_exp] for _exp in exp]
+    for i, (_exp, _) in enumerate(trace.hist):
+        if _exp == exp:
+            return i
+    return None
+
+
+def naive_get_parents(trace: Trace, child_idx: int) -> list[int]:
+    if trace.is_selection_new_tree((child_idx,)):
+        return []
+    ancestors: list[int] = []
+    curr = child_idx
+    while True:
+        ancestors.insert(0, curr)
+        parent_tuple = trace.dag_parent[curr]
+        if not parent_tuple or parent_tuple[0] == curr:
+            break
+        curr = parent_tuple[0]
+    return ancestors
+
+
+def naive_get_leaves(trace: DSTrace) -> list[int]:
+    parent_indices = set(idx for parents in trace.dag_parent for idx in parents)
+    return sorted(set(range(len(trace.hist))) - parent_indices)
+
+
+def naive_get_children(trace: Trace, parent_idx: int) -> list[int]:
+    return [i for i, parents in enumerate(trace.dag_parent) if parent_idx in parents]
+
+
+def random_parents(rng: random.Random, i: int, shape: str) -> tuple[int, ...]:
+    if i == 0 or rng.random() < {"forest": 0.05, "wide": 0.001, "deep": 0.0001}[shape]:
+        return ()
+    if rng.random() < 0.001:
+        return (i,)  # a node pointing to itself is a root as well
+    if shape == "deep" and rng.random() < 0.95:
+        first = i - 1
+    else:
+        first = rng.randrange(i)
+    # a merged node has more than one parent
+    return (first, rng.randrange(i)) if rng.random() < 0.1 else (first,)
+
+
+@pytest.mark.offline
+class TraceIndexTest(unittest.TestCase):
+    N_NODES = 10_000
+    N_CHECKS = 10
+    N_QUERIES = 100
+
+    def assert_same_answers(self, trace: DSTrace, rng: random.Random) -> None:
+        n = len(trace.hist)
+        self.assertEqual(trace.get_leaves(), naive_get_leaves(trace))
+        self.assertEqual(trace.sub_trace_count, len(naive_get_leaves(trace)))
+        self.assertEqual(trace.get_parents(-1), naive_get_parents(trace, -1))
+        for _ in range(self.N_QUERIES):
+            i, j = rng.randrange(n), rng.randrange(n)
+            self.assertEqual(trace.get_parents(i), naive_get_parents(trace, i))
+            self.assertEqual(trace.get_children(i), naive_get_children(trace, i))
+            ancestor = rng.choice(naive_get_parents(trace, i))
+            self.assertTrue(trace.is_parent(ancestor, i))
+            self.assertEqual(trace.is_parent(j, i), j in naive_get_parents(trace, i))
+            self.assertEqual(trace.exp2idx(trace.hist[i][0]), naive_exp2idx(trace, trace.hist[i][0]))
+        exps = [trace.hist[rng.randrange(n)][0] for _ in range(self.N_QUERIES)]
+        self.assertEqual(trace.exp2idx(exps), naive_exp2idx(trace, exps))
+        self.assertIsNone(trace.exp2idx(Exp(-1)))
+
+    def test_random_dags(self) -> None:
+        for seed, shape in enumerate(["wide", "deep", "forest"]):
+            with self.subTest(shape=shape):
+                rng = random.Random(seed)
+                trace = DSTrace(scen=None)
+                exps: list[Exp] = []
+                for i in range(self.N_NODES):
+                    # an experiment is appended again now and then
+                    exp = rng.choice(exps) if exps and rng.random() < 0.01 else Exp(i)
+                    exps.append(exp)
+                    trace.dag_parent.append(random_parents(rng, i, shape))
+                    trace.hist.append((exp, None))
+                    if (i + 1) % (self.N_NODES // self.N_CHECKS) == 0:
+                        self.assert_same_answers(trace, rng)
+
+                # the indexes are rebuilt when the nodes are changed in other ways than appending
+                trace.hist.insert(0, (Exp(-2), None))
+                trace.dag_parent.insert(0, ())
+                self.assert_same_answers(trace, rng)
+                trace.hist, trace.dag_parent = trace.hist[:100], trace.dag_parent[:100]
+                self.assert_same_answers(trace, rng)
+
+                loaded = pickle.loads(pickle.dumps(trace))
+                self.assertNotIn("_index", loaded.__dict__)
+                self.assertEqual(loaded.get_leaves(), trace.get_leaves())
+                self.assert_same_answers(loaded, rng)
+
+    def test_sync_dag_parent_and_hist(self) -> None:
+        trace = DSTrace(scen=None)
+        for selection in [(-1,), (-1,), (0,), (), (-1,), (1,)]:
+            trace.set_current_selection(selection)
+            trace.sync_dag_parent_and_hist()
+            trace.hist.append((Exp(len(trace.hist)), None))
+        self.assertEqual(trace.dag_parent, [(), (0,), (0,), (), (3,), (1,)])
+        self.assertEqual(trace.get_leaves(), [2, 4, 5])
+        self.assertEqual(trace.get_children(0), [1, 2])
+        self.assertEqual(trace.get_parents(5), [0, 1, 5])
+        self.assertEqual(trace.get_parents(-1), [0, 1, -1])
+        self.assertEqual([trace.is_parent(i, 4) for i in range(6)], [False, False, False, True, True, False])
+        self.assertEqual(trace.exp2idx(trace.hist[3][0]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
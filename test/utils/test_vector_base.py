@@ -0,0 +1,90 @@
+import hashlib
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial.distance import cosine
+
+from rdagent.components.knowledge_management.vector_base import Document, PDVectorBase
+
+
+def fake_embedding(input_content: str | list[str]) -> list[float] | list[list[float]]:
+    if isinstance(input_content, list):
+        return [fake_embedding(c) for c in input_content]
+    seed = int(hashlib.md5(input_content.encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).normal(size=16).tolist()
+
+
+def reference_search(
+    vector_df: pd.DataFrame, content: str, topk_k: int | None, similarity_threshold: float, constraint_labels: list
+) -> tuple[list[str], list[float]]:
+    """The previous search: the cosine similarity of each document to the query"""
+    filtered_df = vector_df if constraint_labels is None else vector_df[vector_df["label"].isin(constraint_labels)]
+    similarities = filtered_df["embedding"].apply(lambda x: 1 - cosine(x, fake_embedding(content))).astype(float)
+    similarities = similarities[similarities > similarity_threshold]
+    similarities = similarities.nlargest(len(similarities) if topk_k is None else topk_k)
+    return filtered_df.loc[similarities.index, "trunk"].to_list(), similarities.to_list()
+
+
+@pytest.mark.offline
+class PDVectorBaseTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patch = mock.patch("rdagent.components.knowledge_management.vector_base.APIBackend")
+        self.patch.start().return_value.create_embedding.side_effect = fake_embedding
+        self.path = Path(self.tmp_dir.name) / "vector_base.pkl"
+        self.vector_base = PDVectorBase(path=self.path)
+        documents = [Document(content=f"document {i}", label="abc"[i % 3]) for i in range(100)]
+        for document in documents[:10]:
+            document.split_into_trunk(size=4)
+        self.vector_base.add(documents)
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        self.tmp_dir.cleanup()
+
+    def assert_same_search(self, vector_base: PDVectorBase) -> None:
+        for topk_k, similarity_threshold, constraint_labels in [
+            (None, 0, None),
+            (5, 0, None),
+            (10, 0.2, ["a", "c"]),
+            (3, -1, ["b", "missing"]),
+            (5, 0, ["missing"]),
+        ]:
+            for query in ["query 0", "query 1"]:
+                with self.subTest(query=query, topk_k=topk_k, constraint_labels=constraint_labels):
+                    docs, similarities = vector_base.search(query, topk_k, similarity_threshold, constraint_labels)
+                    trunks, expected = reference_search(
+                        self.vector_base.vector_df, query, topk_k, similarity_threshold, constraint_labels
+                    )
+                    self.assertEqual([doc.trunk for doc in docs], trunks)
+                    np.testing.assert_allclose(similarities, expected, atol=1e-5)
+
+    def test_search(self) -> None:
+        self.assertEqual(self.vector_base.shape()[0], 100 + 10 * 3)
+        self.assert_same_search(self.vector_base)
+
+    def test_dump_load(self) -> None:
+        vector_df = self.vector_base.vector_df
+        self.vector_base.dump()
+        # the DataFrame is derived from the documents; it is not dumped with them
+        with self.path.open("rb") as f:
+            self.assertIsNone(pickle.load(f)["_vector_df"])
+        self.assertIs(self.vector_base.vector_df, vector_df)
+
+        loaded = PDVectorBase(path=self.path)
+        pd.testing.assert_frame_equal(loaded.vector_df, vector_df)
+        self.assert_same_search(loaded)
+        # the documents added after loading are searched too
+        loaded.add(Document(content="query 0", label="a"))
+        docs, similarities = loaded.search("query 0", topk_k=1)
+        self.assertEqual((docs[0].content, round(similarities[0], 5)), ("query 0", 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()